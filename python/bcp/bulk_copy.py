@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Bulk Copy - Streaming INSERT BULK with batch commits and pipelined sends
+
+A SqlBulkCopy-like API on top of bulk_encoder.py and tds_client.py that
+consumes an iterator of rows or column chunks instead of a materialized
+table:
+
+- Rows are encoded a chunk at a time and cut into fixed-size TDS packets
+  as they are produced, so memory is bounded by the chunk size and the
+  send queue depth, not by the number of rows.
+- batch_size works like SqlBulkCopy.BatchSize: every batch is its own
+  INSERT BULK + BULK_LOAD message and is committed when the server
+  answers. batch_size=0 sends everything as one batch.
+- Packets are written into pooled buffers (packet_pool.py) that the
+  sender releases after each send, so no per-packet objects are allocated.
+- A sender thread drains a bounded queue of packets while the caller's
+  thread encodes the next chunk. socket.sendall releases the GIL, so
+  encoding and sending overlap.
+
+The sweep benchmark loads the BulkCopyPerfTest1M dataset once per batch
+size, each run in a fresh process so that peak RSS is per run.
+
+Usage:
+    python bulk_copy.py --rows 1000000 --batch-size 10000
+    python bulk_copy.py --sweep --rows 1000000 --batch-sizes 0 1000 10000 100000
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import subprocess
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Sequence
+
+from bulk_encoder import BulkColumn, BulkLoadEncoder, BulkEncodeError
+from packet_pool import PacketPool, PacketWriter
+from tds_client import TdsClient, TdsClientError
+from type_coercion import ColumnConverter, compile_converters
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+DEFAULT_CHUNK_ROWS = 10_000
+DEFAULT_QUEUE_DEPTH = 16
+
+_STOP = object()
+
+
+class BulkCopyError(Exception):
+    """Raised when a bulk copy fails part-way; rows_committed says how far it got"""
+
+    def __init__(self, message: str, rows_committed: int):
+        super().__init__(message)
+        self.rows_committed = rows_committed
+
+
+class PacketSender:
+    """
+    Sends packets from a bounded queue on a background thread
+
+    With depth 0 packets are sent inline on the caller's thread, which is
+    the baseline the pipelined mode is measured against.
+    """
+
+    def __init__(self, client: TdsClient, pool: PacketPool, depth: int = DEFAULT_QUEUE_DEPTH):
+        self.client = client
+        self.pool = pool
+        self.depth = depth
+        self.error: Optional[BaseException] = None
+        self.send_time = 0.0
+        self.wait_time = 0.0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if depth > 0:
+            self._queue = queue.Queue(maxsize=depth)
+            self._thread = threading.Thread(target=self._run, name='bulk-sender', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        get = self._queue.get
+        send = self.client.send_packet
+        release = self.pool.release
+        while True:
+            packet = get()
+            try:
+                if packet is _STOP:
+                    return
+                buf, length = packet
+                if self.error is None:
+                    start = time.perf_counter()
+                    send(memoryview(buf)[:length])
+                    self.send_time += time.perf_counter() - start
+                release(buf)
+            except BaseException as e:     # surfaced to the producer on its next put/flush
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+    def _check(self):
+        if self.error is not None:
+            raise TdsClientError(f"Send failed: {self.error}")
+
+    def put(self, buf: bytearray, length: int):
+        """Queue (or send) one pooled packet; blocks while the queue is full"""
+        self._check()
+        if self._queue is None:
+            start = time.perf_counter()
+            try:
+                self.client.send_packet(memoryview(buf)[:length])
+            except OSError as e:        # reported like a failure on the sender thread
+                raise TdsClientError(f"Send failed: {e}") from e
+            finally:
+                self.pool.release(buf)
+            self.send_time += time.perf_counter() - start
+            return
+        try:
+            self._queue.put_nowait((buf, length))
+        except queue.Full:
+            start = time.perf_counter()
+            self._queue.put((buf, length))
+            self.wait_time += time.perf_counter() - start
+
+    def flush(self):
+        """Wait until every queued packet is on the socket"""
+        if self._queue is not None:
+            self._queue.join()
+        self._check()
+
+    def close(self):
+        if self._queue is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._queue = None
+
+
+class BulkCopy:
+    """
+    Streaming bulk copy into one table
+
+    Args:
+        client: Connected TdsClient
+        table: Destination table name
+        columns: Destination columns in row order
+        batch_size: Rows per INSERT BULK batch, 0 for a single batch
+        chunk_rows: Rows encoded per step (bounds memory)
+        queue_depth: Packets in flight to the sender thread, 0 to send inline
+        coerce: Convert values with type_coercion before encoding
+    """
+
+    def __init__(self, client: TdsClient, table: str, columns: Sequence[BulkColumn], batch_size: int = 0,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS, queue_depth: int = DEFAULT_QUEUE_DEPTH,
+                 coerce: bool = True):
+        if batch_size < 0 or chunk_rows < 1:
+            raise ValueError("batch_size must be >= 0 and chunk_rows >= 1")
+        self.client = client
+        self.table = table
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.chunk_rows = chunk_rows
+        self.queue_depth = queue_depth
+        self.coerce = coerce
+        self.encoder = BulkLoadEncoder(self.columns)
+        self._converters: Optional[List[ColumnConverter]] = None
+        self._pool: Optional[PacketPool] = None
+
+        # Statistics
+        self.rows_copied = 0
+        self.batches = 0
+        self.packets = 0
+        self.bytes_sent = 0
+        self.encode_time = 0.0
+        self.send_time = 0.0
+        self.queue_wait_time = 0.0
+        self.elapsed = 0.0
+
+    def _prepare(self, column_data: Sequence[Sequence[Any]]) -> Sequence[Sequence[Any]]:
+        if not self.coerce:
+            return column_data
+        # Reused across chunks; a column that was all NULL so far gets its converter on its first values
+        self._converters = compile_converters(self.columns, column_data, self._converters)
+        return [convert(values) for convert, values in zip(self._converters, column_data)]
+
+    def _sized_chunks(self, chunks: Iterable[Sequence[Sequence[Any]]]) -> Iterator[Sequence[Sequence[Any]]]:
+        """Re-cut column chunks so none crosses a batch boundary"""
+        limit = self.batch_size or None
+        room = limit
+        for chunk in chunks:
+            count = len(chunk[0]) if chunk else 0
+            start = 0
+            while start < count:
+                take = count - start if room is None else min(room, count - start)
+                if start == 0 and take == count:
+                    yield chunk
+                else:
+                    yield [values[start:start + take] for values in chunk]
+                start += take
+                if room is not None:
+                    room -= take
+                    if room == 0:
+                        yield None          # batch boundary
+                        room = limit
+
+    def write_chunks(self, chunks: Iterable[Sequence[Sequence[Any]]]) -> int:
+        """
+        Copy column-major chunks (one sequence per column each)
+
+        Returns:
+            Rows copied
+        """
+        start = time.perf_counter()
+        if self._pool is None or self._pool.packet_size != self.client.packet_size:
+            # Queued packets plus the one being filled and the one on the socket
+            self._pool = PacketPool(self.client.packet_size, capacity=self.queue_depth + 2)
+        sender = PacketSender(self.client, self._pool, self.queue_depth)
+        writer: Optional[PacketWriter] = None
+        batch_rows = 0
+        try:
+            for chunk in self._sized_chunks(chunks):
+                if chunk is None:
+                    self._end_batch(sender, writer, batch_rows)
+                    writer, batch_rows = None, 0
+                    continue
+                if writer is None:
+                    self.client.execute(self.encoder.insert_bulk_statement(self.table))
+                    writer = PacketWriter(self._pool, sender.put)
+                    writer.write(self.encoder.colmetadata())
+                t0 = time.perf_counter()
+                data = self.encoder.encode_rows(self._prepare(chunk))
+                self.encode_time += time.perf_counter() - t0
+                writer.write(data)
+                batch_rows += len(chunk[0])
+            if writer is not None:
+                self._end_batch(sender, writer, batch_rows)
+        except BulkEncodeError as e:
+            if writer is not None:
+                # The server is mid-message and cannot be resynchronized without an attention
+                self.client.close()
+            raise BulkCopyError(f"Bulk copy into {self.table} stopped after {self.rows_copied:,} "
+                                f"committed rows: {e}", self.rows_copied) from e
+        except TdsClientError as e:
+            raise BulkCopyError(f"Bulk copy into {self.table} failed after {self.rows_copied:,} "
+                                f"committed rows: {e}", self.rows_copied) from e
+        finally:
+            sender.close()
+            self.send_time += sender.send_time
+            self.queue_wait_time += sender.wait_time
+            self.elapsed += time.perf_counter() - start
+        return self.rows_copied
+
+    def _end_batch(self, sender: PacketSender, writer: PacketWriter, batch_rows: int):
+        writer.finish(self.encoder.done())
+        sender.flush()
+        copied = self.client.read_response().rowcount or 0
+        if copied != batch_rows:
+            raise TdsClientError(f"server reported {copied} rows for a batch of {batch_rows}")
+        self.rows_copied += copied
+        self.batches += 1
+        self.packets += writer.packets
+        self.bytes_sent += writer.bytes
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        """Copy row tuples; they are transposed chunk_rows at a time"""
+        width = len(self.columns)
+
+        def chunks():
+            it = iter(rows)
+            while True:
+                block = list(islice(it, self.chunk_rows))
+                if not block:
+                    return
+                yield [list(col) for col in zip(*block)] if width else []
+
+        return self.write_chunks(chunks())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows_copied, 'batches': self.batches, 'packets': self.packets,
+            'bytes_sent': self.bytes_sent, 'encode_time': self.encode_time, 'send_time': self.send_time,
+            'queue_wait_time': self.queue_wait_time, 'elapsed': self.elapsed,
+            'packet_pool': self._pool.counters() if self._pool is not None else None,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+PERF_COLUMNS = [
+    BulkColumn('id', 'int'),
+    BulkColumn('name', 'nvarchar', length=100),
+    BulkColumn('value', 'float'),
+    BulkColumn('active', 'bit'),
+]
+
+
+def perf_rows(row_count: int) -> Iterator[tuple]:
+    """BulkCopyPerfTest1M rows, generated lazily"""
+    for i in range(1, row_count + 1):
+        yield (i, f'Record_{i:06d}', i * 1.5, i % 2 == 0)
+
+
+def peak_rss_kb() -> int:
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_once(host: str, port: int, row_count: int, batch_size: int, chunk_rows: int,
+             queue_depth: int, packet_size: int) -> Dict[str, Any]:
+    """Stream the perf dataset into #PerfTest once and return the statistics"""
+    with TdsClient(host, port, packet_size=packet_size) as client:
+        client.execute("CREATE TABLE #PerfTest (id INT NOT NULL, name NVARCHAR(100) NOT NULL, "
+                       "value FLOAT NOT NULL, active BIT NOT NULL)")
+        copy = BulkCopy(client, '#PerfTest', PERF_COLUMNS, batch_size=batch_size,
+                        chunk_rows=chunk_rows, queue_depth=queue_depth)
+        copy.write_rows(perf_rows(row_count))
+        count = client.execute('SELECT COUNT(*) FROM #PerfTest').scalar()
+        client.execute('DROP TABLE #PerfTest')
+    result = copy.stats()
+    result.update({'verified': count, 'batch_size': batch_size, 'queue_depth': queue_depth,
+                   'peak_rss_kb': peak_rss_kb()})
+    return result
+
+
+def print_run(result: Dict[str, Any]):
+    rows = result['rows']
+    print(f"  Rows copied:     {rows:,} in {result['batches']:,} batches (verified {result['verified']:,})")
+    print(f"  Elapsed:         {result['elapsed']:.3f}s ({rows / result['elapsed']:,.0f} rows/sec)")
+    print(f"  Encode time:     {result['encode_time']:.3f}s")
+    print(f"  Send time:       {result['send_time']:.3f}s")
+    print(f"  Queue wait:      {result['queue_wait_time']:.3f}s")
+    print(f"  Packets:         {result['packets']:,} ({result['bytes_sent']:,} bytes)")
+    pool = result.get('packet_pool')
+    if pool:
+        print(f"  Packet buffers:  {pool['allocations']:,} allocated, {pool['reuses']:,} reuses, "
+              f"{pool['waits']:,} waits")
+    print(f"  Peak RSS:        {result['peak_rss_kb']:,} KB")
+
+
+def run_sweep(args, host: str, port: int):
+    """One child process per (batch size, pipeline mode) so peak RSS is per run"""
+    print("=" * 80)
+    print(f"Bulk Copy Batch Size Sweep - {args.rows:,} rows, chunk {args.chunk_rows:,}, "
+          f"packet size {args.packet_size}")
+    print("=" * 80)
+    print(f"{'Batch size':>12} {'Sender':>10} {'Batches':>9} {'Rows/sec':>12} {'Encode s':>10} "
+          f"{'Send s':>8} {'Wait s':>8} {'Peak RSS KB':>12}")
+    print("-" * 80)
+    depths = [args.queue_depth, 0] if args.compare_inline else [args.queue_depth]
+    for batch_size in args.batch_sizes:
+        for depth in depths:
+            cmd = [sys.executable, os.path.abspath(__file__), '--json', '--port', str(port), '--host', host,
+                   '--rows', str(args.rows), '--batch-size', str(batch_size),
+                   '--chunk-rows', str(args.chunk_rows), '--queue-depth', str(depth),
+                   '--packet-size', str(args.packet_size)]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{batch_size:>12} failed: {proc.stdout.strip() or proc.stderr.strip()}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            label = 'thread' if depth else 'inline'
+            print(f"{batch_size or 'all':>12} {label:>10} {r['batches']:>9,} {r['rows'] / r['elapsed']:>12,.0f} "
+                  f"{r['encode_time']:>10.3f} {r['send_time']:>8.3f} {r['queue_wait_time']:>8.3f} "
+                  f"{r['peak_rss_kb']:>12,}")
+    print("=" * 80)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Streaming bulk copy with batch commits and pipelined packet sends',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # One run against a fresh stand-in server
+  python bulk_copy.py --rows 1000000 --batch-size 10000
+
+  # Batch size vs throughput vs peak RSS, threaded and inline sends
+  python bulk_copy.py --sweep --rows 1000000 --batch-sizes 0 1000 10000 100000 --compare-inline
+        """
+    )
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows to copy (default: 1000000)')
+    parser.add_argument('--batch-size', type=int, default=0, help='Rows per batch, 0 for one batch (default: 0)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'Rows encoded per step (default: {DEFAULT_CHUNK_ROWS})')
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help=f'Packets queued for the sender thread, 0 to send inline (default: {DEFAULT_QUEUE_DEPTH})')
+    parser.add_argument('--packet-size', type=int, default=8000, help='Requested TDS packet size (default: 8000)')
+    parser.add_argument('--host', default='127.0.0.1', help='Server host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, help='Server port (default: start the stand-in server)')
+    parser.add_argument('--sweep', action='store_true', help='Run once per --batch-sizes value in child processes')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[0, 1000, 10000, 100000],
+                        help='Batch sizes for --sweep (default: 0 1000 10000 100000)')
+    parser.add_argument('--compare-inline', action='store_true',
+                        help='In --sweep, also run every batch size with inline sends')
+    parser.add_argument('--json', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rows < 1 or args.batch_size < 0 or args.chunk_rows < 1 or args.queue_depth < 0:
+        print("Error: --rows and --chunk-rows must be positive, --batch-size and --queue-depth >= 0")
+        return 1
+
+    server_proc = None
+    port = args.port
+    if port is None:
+        from tds_standin_server import spawn_server
+        server_proc, port = spawn_server()
+    try:
+        if args.sweep:
+            run_sweep(args, args.host, port)
+            return 0
+        result = run_once(args.host, port, args.rows, args.batch_size, args.chunk_rows,
+                          args.queue_depth, args.packet_size)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print("=" * 80)
+            print(f"Bulk Copy - {args.rows:,} rows, batch size {args.batch_size or 'all'}, "
+                  f"{'sender thread' if args.queue_depth else 'inline sends'}")
+            print("=" * 80)
+            print_run(result)
+            print("=" * 80)
+    except (OSError, TdsClientError, BulkCopyError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if server_proc is not None:
+            server_proc.terminate()
+            server_proc.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Bulk Copy Performance Test - Python port of dotnet/bcp/BulkCopyPerfTest1M.cs
+
+Generates the same dataset as the .NET test (id INT, name NVARCHAR(100)
+'Record_000001', value FLOAT i * 1.5, active BIT i % 2 == 0), loads it into
+#PerfTest through every available path and prints the same timing breakdown
+so the numbers can be put next to the SqlBulkCopy baselines.
+
+Paths:
+- bulk:             bulk_encoder.py + tds_client.py, INSERT BULK + BULK_LOAD
+                    like SqlBulkCopy with BatchSize = 0
+- executemany:      cursor.executemany with mssql_python (or pyodbc)
+- fast_executemany: pyodbc with cursor.fast_executemany = True
+
+The bulk path runs against tds_standin_server.py, started as a subprocess
+unless --server is given, so it needs neither a driver nor SQL Server. The
+driver paths need --connection-string (or DB_CONNECTION_STRING) and the
+driver installed; they are skipped otherwise.
+
+Usage:
+    python bulk_copy_perf_test_1m.py
+    python bulk_copy_perf_test_1m.py --rows 100000 --paths bulk executemany -c "Server=..."
+    python bulk_copy_perf_test_1m.py --server localhost,1433
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from contextlib import contextmanager
+from array import array
+from typing import Optional, List, Dict, Any
+
+from bulk_encoder import BulkColumn, BulkLoadEncoder
+from tds_client import TdsClient, TdsClientError
+from tds_standin_server import spawn_server
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+ALL_PATHS = ['bulk', 'executemany', 'fast_executemany']
+
+CREATE_TABLE = """CREATE TABLE #PerfTest (
+    id INT NOT NULL,
+    name NVARCHAR(100) NOT NULL,
+    value FLOAT NOT NULL,
+    active BIT NOT NULL
+)"""
+
+COLUMNS = [
+    BulkColumn('id', 'int'),
+    BulkColumn('name', 'nvarchar', length=100),
+    BulkColumn('value', 'float'),
+    BulkColumn('active', 'bit'),
+]
+
+
+def memory_kb() -> int:
+    """Current RSS in KB (peak RSS when psutil is not installed)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss // 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def generate_columns(row_count: int) -> List[Any]:
+    """The BulkCopyPerfTest1M dataset, column-major"""
+    ids = array('i', range(1, row_count + 1))
+    return [
+        ids,
+        [f'Record_{i:06d}' for i in ids],
+        array('d', [i * 1.5 for i in ids]),
+        [i % 2 == 0 for i in ids],
+    ]
+
+
+def get_password() -> str:
+    """SQL_PASSWORD, falling back to /tmp/password like the .NET test"""
+    password = os.environ.get('SQL_PASSWORD')
+    if password:
+        return password
+    try:
+        with open('/tmp/password') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def load_driver(path: str):
+    """Import the driver module for a driver path, or None if unavailable"""
+    if path == 'fast_executemany':
+        try:
+            import pyodbc
+            return pyodbc
+        except ImportError:
+            return None
+    try:
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'mssql-python'))
+        import mssql_python
+        return mssql_python
+    except ImportError:
+        pass
+    try:
+        import pyodbc
+        return pyodbc
+    except ImportError:
+        return None
+
+
+class PhaseTimer:
+    """Collects named phase durations in the order they were timed"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def time(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def run_bulk(row_count: int, columns: List[Any], host: str, port: int, user: str, password: str,
+             packet_size: int) -> Dict[str, Any]:
+    """Load through INSERT BULK + one BULK_LOAD message (BatchSize = 0)"""
+    timer = PhaseTimer()
+    encoder = BulkLoadEncoder(COLUMNS)
+
+    with timer.time('connection'):
+        client = TdsClient(host, port, user, password, packet_size=packet_size).connect()
+    try:
+        with timer.time('setup'):
+            client.execute(CREATE_TABLE)
+        mem_before = memory_kb()
+        with timer.time('copy'):
+            copied = client.bulk_load(encoder, '#PerfTest', columns)
+        mem_after = memory_kb()
+        with timer.time('verify'):
+            count = client.execute('SELECT COUNT(*) FROM #PerfTest').scalar()
+        client.execute('DROP TABLE #PerfTest')
+        wire = client.counters()
+    finally:
+        client.close()
+
+    if copied != row_count:
+        raise RuntimeError(f"Bulk load reported {copied} rows, expected {row_count}")
+    return {'phases': timer.phases, 'count': count, 'mem_before': mem_before, 'mem_after': mem_after,
+            'wire': wire, 'packet_size': client.packet_size}
+
+
+def run_executemany(row_count: int, columns: List[Any], driver, connection_string: str,
+                    fast: bool) -> Dict[str, Any]:
+    """Load with parameterized INSERT via cursor.executemany"""
+    timer = PhaseTimer()
+    with timer.time('data gen'):
+        rows = list(zip(columns[0], columns[1], columns[2], columns[3]))
+
+    with timer.time('connection'):
+        conn = driver.connect(connection_string)
+    try:
+        cursor = conn.cursor()
+        with timer.time('setup'):
+            cursor.execute(CREATE_TABLE)
+            conn.commit()
+        if fast:
+            cursor.fast_executemany = True
+        mem_before = memory_kb()
+        with timer.time('copy'):
+            cursor.executemany('INSERT INTO #PerfTest (id, name, value, active) VALUES (?, ?, ?, ?)', rows)
+            conn.commit()
+        mem_after = memory_kb()
+        with timer.time('verify'):
+            cursor.execute('SELECT COUNT(*) FROM #PerfTest')
+            count = cursor.fetchone()[0]
+        cursor.execute('DROP TABLE #PerfTest')
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return {'phases': timer.phases, 'count': count, 'mem_before': mem_before, 'mem_after': mem_after}
+
+
+def print_result(path: str, row_count: int, gen_time: float, result: Dict[str, Any]):
+    """Print the .NET-style timing breakdown for one path"""
+    phases = dict(result['phases'])
+    phases['data gen'] = gen_time + phases.get('data gen', 0.0)
+    copy_time = phases['copy']
+    total = phases['connection'] + phases['setup'] + copy_time
+    rows_per_sec = row_count / copy_time if copy_time > 0 else 0
+
+    print(f"\n[{path}]")
+    print(f"  Data generation: {phases['data gen']:.4f}s")
+    print(f"\n  === Timing Breakdown ===")
+    print(f"  Connection: {phases['connection'] * 1000:.4f}ms ({phases['connection'] / total * 100:.1f}% of total)")
+    print(f"  Table setup: {phases['setup'] * 1000:.4f}ms ({phases['setup'] / total * 100:.1f}% of total)")
+    print(f"  Bulk copy: {copy_time:.4f}s ({copy_time / total * 100:.1f}% of total)")
+    print(f"  Total time: {total:.4f}s")
+    print(f"\n  Throughput: {rows_per_sec:,.0f} rows/sec")
+    print(f"  Memory before: {result['mem_before']:,} KB")
+    print(f"  Memory after: {result['mem_after']:,} KB")
+    print(f"  Memory delta: {result['mem_after'] - result['mem_before']:,} KB")
+    if 'wire' in result:
+        wire = result['wire']
+        print(f"  Wire: {wire['bytes_sent']:,} bytes sent in {wire['send_calls']:,} sends "
+              f"(packet size {result['packet_size']})")
+    if result['count'] != row_count:
+        raise RuntimeError(f"Row count mismatch: expected {row_count}, got {result['count']}")
+    print(f"  Verified: {result['count']:,} rows inserted ({phases['verify'] * 1000:.4f}ms)")
+
+    result['rows_per_sec'] = rows_per_sec
+    result['total'] = total + phases['data gen'] + phases['verify']
+
+
+def print_comparison(results: Dict[str, Dict[str, Any]]):
+    """Side-by-side rows/sec for the paths that ran"""
+    print("\n" + "=" * 80)
+    print("Comparison")
+    print("=" * 80)
+    print(f"{'Path':<20} {'Copy (s)':>12} {'Rows/sec':>15} {'End-to-end (s)':>16} {'Mem delta KB':>14}")
+    print("-" * 80)
+    for path, result in results.items():
+        print(f"{path:<20} {result['phases']['copy']:>12.3f} {result['rows_per_sec']:>15,.0f} "
+              f"{result['total']:>16.3f} {result['mem_after'] - result['mem_before']:>14,}")
+    print("=" * 80)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Python port of BulkCopyPerfTest1M: load 1M rows through each available path',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Bulk encoder path against a local stand-in server
+  python bulk_copy_perf_test_1m.py
+
+  # All paths; the driver paths use the connection string
+  python bulk_copy_perf_test_1m.py --rows 100000 -c "Server=localhost;Database=test;UID=sa;PWD=...;"
+
+  # Bulk path against a SQL Server that allows unencrypted logins
+  SQL_PASSWORD=... python bulk_copy_perf_test_1m.py --server localhost,1433
+        """
+    )
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows to load (default: 1000000)')
+    parser.add_argument('--paths', nargs='+', choices=ALL_PATHS, default=ALL_PATHS,
+                        help='Load paths to run (default: all available)')
+    parser.add_argument('--server', help='host,port for the bulk path (default: start the stand-in server)')
+    parser.add_argument('--packet-size', type=int, default=8000,
+                        help='Requested TDS packet size for the bulk path (default: 8000)')
+    parser.add_argument('-c', '--connection-string', default=os.environ.get('DB_CONNECTION_STRING'),
+                        help='Connection string for the driver paths (default: DB_CONNECTION_STRING env var)')
+    args = parser.parse_args()
+
+    if args.rows < 1:
+        print("Error: Number of rows must be positive")
+        return 1
+
+    print("=" * 80)
+    print(f"Python Bulk Copy Performance Test - {args.rows:,} Rows")
+    print("=" * 80)
+
+    gen_start = time.perf_counter()
+    columns = generate_columns(args.rows)
+    gen_time = time.perf_counter() - gen_start
+    print(f"Testing with {args.rows:,} rows...")
+    print(f"  Data generation: {gen_time:.4f}s")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    server_proc: Optional[subprocess.Popen] = None
+    try:
+        for path in args.paths:
+            if path == 'bulk':
+                if args.server:
+                    host, _, port = args.server.partition(',')
+                    port = int(port or 1433)
+                    user = os.environ.get('DB_USERNAME', 'sa')
+                    password = get_password()
+                else:
+                    if server_proc is None:
+                        server_proc, port = spawn_server()
+                    host, user, password = '127.0.0.1', 'sa', ''
+                    print(f"  Stand-in server on port {port}")
+                result = run_bulk(args.rows, columns, host, port, user, password, args.packet_size)
+            else:
+                driver = load_driver(path)
+                if driver is None or not args.connection_string:
+                    reason = 'driver not installed' if driver is None else 'no connection string'
+                    print(f"\n[{path}] skipped: {reason}")
+                    continue
+                try:
+                    result = run_executemany(args.rows, columns, driver, args.connection_string,
+                                             fast=path == 'fast_executemany')
+                except driver.Error as e:
+                    print(f"\n[{path}] failed: {e}")
+                    continue
+            print_result(path, args.rows, gen_time, result)
+            results[path] = result
+    except (OSError, TdsClientError, RuntimeError) as e:
+        print(f"\nError: {e}")
+        return 1
+    finally:
+        if server_proc is not None:
+            server_proc.terminate()
+            server_proc.wait()
+
+    if results:
+        print_comparison(results)
+    print("Performance Test Complete")
+    return 0 if results else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
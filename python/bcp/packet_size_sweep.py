@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Packet Size Sweep - Throughput, syscalls and CPU per negotiated packet size
+
+LOGIN7 in dotnet/bcp/dotnet_guid_trace.txt asks for 4096-byte packets and
+the server's ENVCHANGE moves the connection to 8000. This benchmark
+repeats the same work at several requested packet sizes:
+
+- load:  bulk copy of the BulkCopyPerfTest1M dataset (bulk_copy.py)
+- read:  SELECT * of the loaded rows, decoded into Python rows
+
+and reports, per size, rows/sec, the send/recv calls the client made
+(every packet costs one send, or a header and a body recv) and the CPU
+time of this process. The default target is the stand-in server started
+with --keep-rows, so that SELECT * returns the loaded rows.
+
+Usage:
+    python packet_size_sweep.py --rows 1000000
+    python packet_size_sweep.py --rows 200000 --packet-sizes 512 4096 8000 16384 32767
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from typing import Optional, List, Dict, Any
+
+from bulk_copy import BulkCopy, BulkCopyError, PERF_COLUMNS, perf_rows
+from tds_client import TdsClient, TdsClientError
+from tds_standin_server import spawn_server, MIN_PACKET_SIZE, MAX_PACKET_SIZE
+
+
+DEFAULT_PACKET_SIZES = [512, 1024, 4096, 8000, 16384, 32767]
+
+CREATE_TABLE = """CREATE TABLE #PacketSweep (
+    id INT NOT NULL,
+    name NVARCHAR(100) NOT NULL,
+    value FLOAT NOT NULL,
+    active BIT NOT NULL
+)"""
+
+
+def _measure(client: TdsClient, work) -> Dict[str, Any]:
+    """Run work() and return its result with wall time, CPU time and call deltas"""
+    before = client.counters()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    rows = work()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    after = client.counters()
+    return {
+        'rows': rows, 'elapsed': elapsed, 'cpu': cpu,
+        'syscalls': (after['send_calls'] - before['send_calls']) + (after['recv_calls'] - before['recv_calls']),
+        'bytes': (after['bytes_sent'] - before['bytes_sent']) + (after['bytes_received'] - before['bytes_received']),
+    }
+
+
+def run_size(host: str, port: int, user: str, password: str, packet_size: int, row_count: int,
+             batch_size: int, read: bool) -> Dict[str, Any]:
+    """Load (and read back) the dataset over one connection at the requested packet size"""
+    with TdsClient(host, port, user, password, packet_size=packet_size) as client:
+        client.execute(CREATE_TABLE)
+        copy = BulkCopy(client, '#PacketSweep', PERF_COLUMNS, batch_size=batch_size)
+        result = {'requested': packet_size, 'negotiated': client.packet_size,
+                  'load': _measure(client, lambda: copy.write_rows(perf_rows(row_count)))}
+        if read:
+            result['read'] = _measure(client, lambda: len(client.execute('SELECT * FROM #PacketSweep').rows))
+        client.execute('DROP TABLE #PacketSweep')
+    return result
+
+
+def _phase_columns(phase: Optional[Dict[str, Any]]) -> str:
+    if phase is None:
+        return f"{'-':>11} {'-':>9} {'-':>7}"
+    rate = phase['rows'] / phase['elapsed'] if phase['elapsed'] > 0 else 0
+    return f"{rate:>11,.0f} {phase['syscalls']:>9,} {phase['cpu']:>7.2f}"
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"{'':>17} {'--- bulk load ---':^29} {'--- SELECT * read ---':^29}")
+    print(f"{'Requested':>9} {'Actual':>7} {'Rows/sec':>11} {'Syscalls':>9} {'CPU s':>7} "
+          f"{'Rows/sec':>11} {'Syscalls':>9} {'CPU s':>7}")
+    print("-" * 80)
+    for result in results:
+        print(f"{result['requested']:>9} {result['negotiated']:>7} {_phase_columns(result['load'])} "
+              f"{_phase_columns(result.get('read'))}")
+    print("=" * 80)
+    print("Syscalls are the send/recv calls made by the client; CPU is user+system time of this process,")
+    print("including the bulk copy sender thread.")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Measure bulk load and result read throughput per negotiated TDS packet size',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default sizes against a stand-in server started with --keep-rows
+  python packet_size_sweep.py --rows 1000000
+
+  # The sizes around the 4096 -> 8000 negotiation in dotnet_guid_trace.txt
+  python packet_size_sweep.py --packet-sizes 4096 8000
+
+  # Loads only, against a SQL Server that allows unencrypted logins
+  SQL_PASSWORD=... python packet_size_sweep.py --host localhost --port 1433 --no-read
+        """
+    )
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows to load per size (default: 1000000)')
+    parser.add_argument('--packet-sizes', type=int, nargs='+', default=DEFAULT_PACKET_SIZES,
+                        help=f'Requested packet sizes (default: {" ".join(map(str, DEFAULT_PACKET_SIZES))})')
+    parser.add_argument('--batch-size', type=int, default=0, help='Bulk copy batch size (default: 0)')
+    parser.add_argument('--no-read', action='store_true', help='Skip the SELECT * read phase')
+    parser.add_argument('--host', default='127.0.0.1', help='Server host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, help='Server port (default: start the stand-in server)')
+    parser.add_argument('--user', default=os.environ.get('DB_USERNAME', 'sa'), help='SQL login (default: sa)')
+    parser.add_argument('--password', default=os.environ.get('SQL_PASSWORD', ''),
+                        help='SQL password (default: SQL_PASSWORD env var)')
+    args = parser.parse_args()
+
+    if args.rows < 1 or args.batch_size < 0:
+        print("Error: --rows must be positive and --batch-size non-negative")
+        return 1
+    bad = [size for size in args.packet_sizes if not MIN_PACKET_SIZE <= size <= MAX_PACKET_SIZE]
+    if bad:
+        print(f"Error: packet sizes must be between {MIN_PACKET_SIZE} and {MAX_PACKET_SIZE}: {bad}")
+        return 1
+
+    print("=" * 80)
+    print(f"Packet Size Sweep - {args.rows:,} rows, batch size {args.batch_size}")
+    print("=" * 80)
+
+    server_proc: Optional[subprocess.Popen] = None
+    results = []
+    try:
+        port = args.port
+        if port is None:
+            server_proc, port = spawn_server(keep_rows=True)
+            print(f"Stand-in server on port {port} (keeping rows for SELECT *)")
+        for size in args.packet_sizes:
+            result = run_size(args.host, port, args.user, args.password, size, args.rows,
+                              args.batch_size, not args.no_read)
+            results.append(result)
+            read = result.get('read')
+            print(f"  {size:>5} -> {result['negotiated']}: loaded {result['load']['rows']:,} rows"
+                  + (f", read {read['rows']:,}" if read else ''))
+    except (OSError, TdsClientError, BulkCopyError, RuntimeError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if server_proc is not None:
+            server_proc.terminate()
+            server_proc.wait()
+
+    print()
+    print_results(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
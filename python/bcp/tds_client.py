@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+TDS Client - Minimal TDS 7.4 client for bulk loads without a driver
+
+Speaks just enough TDS to log in without TLS (PRELOGIN ENCRYPTION=NOT_SUP),
+run SQL batches and push BULK_LOAD messages built by bulk_encoder.py. It is
+meant for tds_standin_server.py and for SQL Server instances that allow
+unencrypted SQL authentication; it is not a general purpose driver.
+
+Send/receive syscalls and bytes are counted so benchmarks can report wire
+cost next to wall time.
+
+Usage:
+    python tds_client.py --port 14330 "SELECT COUNT(*) FROM t"
+"""
+
+import os
+import sys
+import socket
+import struct
+import argparse
+from typing import Optional, List, Dict, Any, Sequence
+
+from tds_trace import TokenStreamDecoder, TdsDecodeError
+from bulk_encoder import (BulkLoadEncoder, encode_sql_batch,
+                          MSG_SQL_BATCH, MSG_BULK_LOAD, DEFAULT_PACKET_SIZE, HEADER_SIZE)
+from packet_pool import PacketPool, PacketWriter
+
+
+MSG_RESPONSE = 0x04
+MSG_LOGIN7 = 0x10
+MSG_PRELOGIN = 0x12
+
+TDS_VERSION_74 = 0x74000004
+ENCRYPT_NOT_SUP = 0x02
+
+TOKEN_ERROR = 0xAA
+TOKEN_ENVCHANGE = 0xE3
+DONE_TOKENS = (0xFD, 0xFE, 0xFF)
+DONE_ERROR = 0x0002
+DONE_COUNT = 0x0010
+
+_HEADER = struct.Struct('>BBHHBB')
+_LOGIN_FIXED = struct.Struct('<IIIIIIBBBBiI')
+
+
+class TdsClientError(Exception):
+    """Raised when the server reports an error or the connection breaks"""
+
+
+class TdsResult:
+    """Outcome of one request: rows, DONE row count, INFO/ERROR messages"""
+
+    __slots__ = ('columns', 'rows', 'rowcount', 'messages', 'errors')
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self.rows: List[List[Any]] = []
+        self.rowcount: Optional[int] = None
+        self.messages: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+
+    def scalar(self) -> Any:
+        """First column of the first row, like ExecuteScalar"""
+        return self.rows[0][0] if self.rows else None
+
+
+def build_prelogin() -> bytes:
+    """PRELOGIN payload: VERSION, ENCRYPTION=NOT_SUP, terminator"""
+    version = struct.pack('>IH', 0x07000000, 0)
+    options = [(0x00, version), (0x01, bytes([ENCRYPT_NOT_SUP]))]
+    offset = len(options) * 5 + 1
+    table = b''
+    data = b''
+    for option, value in options:
+        table += struct.pack('>BHH', option, offset + len(data), len(value))
+        data += value
+    return table + b'\xff' + data
+
+
+def _obfuscate_password(password: str) -> bytes:
+    """LOGIN7 password scrambling: swap nibbles then XOR 0xA5 on each byte"""
+    return bytes((((b << 4) & 0xF0) | (b >> 4)) ^ 0xA5 for b in password.encode('utf-16-le'))
+
+
+def build_login7(user: str, password: str, database: str = '', app_name: str = 'tds_client',
+                 server_name: str = '', packet_size: int = DEFAULT_PACKET_SIZE) -> bytes:
+    """LOGIN7 payload for SQL authentication"""
+    fixed_size = 94
+    fields = [
+        socket.gethostname().encode('utf-16-le'),
+        user.encode('utf-16-le'),
+        _obfuscate_password(password),
+        app_name.encode('utf-16-le'),
+        server_name.encode('utf-16-le'),
+        b'',                                    # extension
+        'tds_client'.encode('utf-16-le'),
+        b'',                                    # language
+        database.encode('utf-16-le'),
+    ]
+    offsets = b''
+    data = b''
+    for value in fields:
+        offsets += struct.pack('<HH', fixed_size + len(data), len(value) // 2)
+        data += value
+    # ClientID, SSPI, AtchDBFile, ChangePassword, cbSSPILong
+    tail = b'\x00' * 6 + struct.pack('<HH', fixed_size + len(data), 0) \
+        + struct.pack('<HH', fixed_size + len(data), 0) + struct.pack('<HH', fixed_size + len(data), 0) \
+        + struct.pack('<I', 0)
+    header = _LOGIN_FIXED.pack(fixed_size + len(data), TDS_VERSION_74, packet_size, 0x07000000,
+                               os.getpid(), 0,
+                               0xE0,    # OptionFlags1: USE_DB_ON, INIT_DB_FATAL, SET_LANG_ON
+                               0x03,    # OptionFlags2: INIT_LANG_FATAL, ODBC
+                               0x00, 0x00, 0, 0x0409)
+    return header + offsets + tail + data
+
+
+class TdsClient:
+    """
+    One TDS connection
+
+    Args:
+        host: Server host name
+        port: Server TCP port
+        user: SQL login
+        password: SQL password
+        database: Initial database (empty for the login default)
+        packet_size: Requested packet size; the server's ENVCHANGE wins
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 1433, user: str = 'sa', password: str = '',
+                 database: str = '', packet_size: int = DEFAULT_PACKET_SIZE, timeout: float = 300.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        self.packet_size = packet_size
+        self.timeout = timeout
+        self.sock: Optional[socket.socket] = None
+        self.server_version: Optional[str] = None
+        self._decoder = TokenStreamDecoder(decode_rows=True, decode_details=True)
+        self._recv_buf = bytearray(HEADER_SIZE)
+        self._pool: Optional[PacketPool] = None
+
+        # Wire counters
+        self.send_calls = 0
+        self.recv_calls = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def connect(self) -> 'TdsClient':
+        """Open the socket, exchange PRELOGIN and log in"""
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.send_message(MSG_PRELOGIN, build_prelogin())
+        self.read_message()
+
+        login = build_login7(self.user, self.password, self.database,
+                             server_name=self.host, packet_size=self.packet_size)
+        self.send_message(MSG_LOGIN7, login)
+        result = self._read_result()
+        for message in result.messages:
+            if message.get('type') == 'PACKETSIZE':
+                self.packet_size = int(message['new'])
+            elif 'program' in message:
+                self.server_version = f"{message['program']} {message['version']}"
+        if result.errors:
+            raise TdsClientError(f"Login failed: {result.errors[0]['message']}")
+        return self
+
+    def close(self):
+        """Close the socket"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send_packet(self, data):
+        """Send one complete packet (header included)"""
+        self.sock.sendall(data)
+        self.send_calls += 1
+        self.bytes_sent += len(data)
+
+    def send_message(self, msg_type: int, payload):
+        """Split a payload into packets of the negotiated size and send them"""
+        if self._pool is None or self._pool.packet_size != self.packet_size:
+            self._pool = PacketPool(self.packet_size, capacity=1)
+        pool = self._pool
+
+        def send(buf, length):
+            try:
+                self.send_packet(memoryview(buf)[:length])
+            finally:
+                pool.release(buf)
+
+        PacketWriter(pool, send, msg_type).finish(payload)
+
+    def _recv_exact(self, view: memoryview):
+        got = 0
+        size = len(view)
+        while got < size:
+            n = self.sock.recv_into(view[got:])
+            self.recv_calls += 1
+            if n == 0:
+                raise TdsClientError("Connection closed by server")
+            got += n
+        self.bytes_received += size
+
+    def read_message(self) -> bytes:
+        """Read packets up to EOM and return the reassembled payload"""
+        header = memoryview(self._recv_buf)
+        parts = []
+        while True:
+            self._recv_exact(header)
+            msg_type, status, length, _, _, _ = _HEADER.unpack_from(header)
+            body = bytearray(length - HEADER_SIZE)
+            self._recv_exact(memoryview(body))
+            parts.append(body)
+            if status & 0x01:
+                return b''.join(parts) if len(parts) > 1 else bytes(parts[0])
+
+    def _read_result(self) -> TdsResult:
+        result = TdsResult()
+
+        def emit(token_type, offset, length, detail, count):
+            if token_type in (0xD1, 0xD2):
+                result.rows.append(detail)
+            elif token_type == 0x81:
+                result.columns = [c.split(' ')[0] for c in detail]
+            elif token_type == TOKEN_ERROR:
+                result.errors.append(detail)
+            elif token_type in DONE_TOKENS:
+                if detail['status'] & DONE_COUNT:
+                    result.rowcount = detail['rowcount']
+            elif detail is not None:
+                result.messages.append(detail)
+
+        try:
+            self._decoder.decode(memoryview(self.read_message()), emit)
+        except (TdsDecodeError, IndexError, struct.error) as e:
+            raise TdsClientError(f"Malformed response: {e}")
+        return result
+
+    def read_response(self) -> TdsResult:
+        """Read one response; raises TdsClientError if it carries an ERROR token"""
+        result = self._read_result()
+        if result.errors:
+            error = result.errors[0]
+            raise TdsClientError(f"Msg {error['number']}, Level {error['class']}: {error['message']}")
+        return result
+
+    def execute(self, sql: str) -> TdsResult:
+        """Run a SQL batch; raises TdsClientError on a server error"""
+        self.send_message(MSG_SQL_BATCH, encode_sql_batch(sql))
+        return self.read_response()
+
+    def bulk_load(self, encoder: BulkLoadEncoder, table: str, column_data: Sequence[Sequence[Any]]) -> int:
+        """
+        INSERT BULK into table and send the rows as one BULK_LOAD message
+
+        Returns:
+            Row count reported by the server
+        """
+        self.execute(encoder.insert_bulk_statement(table))
+        self.send_message(MSG_BULK_LOAD, encoder.encode_message(column_data))
+        return self.read_response().rowcount or 0
+
+    def counters(self) -> Dict[str, int]:
+        """Syscall and byte counters since connect"""
+        return {'send_calls': self.send_calls, 'recv_calls': self.recv_calls,
+                'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received}
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Run SQL batches over a minimal TDS connection')
+    parser.add_argument('sql', nargs='+', help='SQL batches to run')
+    parser.add_argument('--host', default='localhost', help='Server host (default: localhost)')
+    parser.add_argument('--port', type=int, default=1433, help='Server port (default: 1433)')
+    parser.add_argument('--user', default=os.environ.get('DB_USERNAME', 'sa'), help='SQL login (default: sa)')
+    parser.add_argument('--password', default=os.environ.get('SQL_PASSWORD', ''),
+                        help='SQL password (default: SQL_PASSWORD env var)')
+    args = parser.parse_args()
+
+    try:
+        with TdsClient(args.host, args.port, args.user, args.password) as client:
+            print(f"Connected to {client.server_version} (packet size {client.packet_size})")
+            for sql in args.sql:
+                result = client.execute(sql)
+                if result.columns:
+                    print(' | '.join(result.columns))
+                for row in result.rows:
+                    print(' | '.join(str(v) for v in row))
+                if result.rowcount is not None:
+                    print(f"({result.rowcount} rows affected)")
+    except (OSError, TdsClientError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+TDS Stand-in Server - Local SQL Server substitute for bulk load benchmarks
+
+Accepts the TDS subset that tds_client.py speaks and answers with the
+tokens SQL Server sends in dotnet/bcp/test_output.txt:
+
+- PRELOGIN (encryption not supported) and LOGIN7 (ENVCHANGE packet size,
+  LOGINACK, DONE)
+- SQL batches: CREATE TABLE, DROP TABLE, TRUNCATE TABLE, INSERT BULK,
+  SELECT COUNT(*) FROM <table> and, with --keep-rows, SELECT * FROM <table>;
+  anything else completes with an empty DONE
+- BULK_LOAD: the token stream is decoded as packets arrive, keeping only an
+  incomplete trailing row in memory, and answered with DONE(COUNT, rows)
+
+Tables only hold a row count unless the server runs with --keep-rows, in
+which case the COLMETADATA and ROW bytes of every bulk load are kept and
+replayed as the result of SELECT * (the token format is the same in both
+directions). The server exists so that ingest and read benchmarks measure
+the client side (encoding, packetizing, syscalls) without needing a SQL
+Server instance.
+
+Usage:
+    python tds_standin_server.py --port 14330
+    python tds_standin_server.py --port 0        # pick a free port, print it
+    python tds_standin_server.py --port 0 --keep-rows
+"""
+
+import os
+import re
+import sys
+import struct
+import socket
+import argparse
+import threading
+import subprocess
+import socketserver
+from typing import Dict, List, Optional, Tuple
+
+from tds_trace import TokenStreamDecoder, TdsDecodeError
+
+
+MSG_SQL_BATCH = 0x01
+MSG_RESPONSE = 0x04
+MSG_BULK_LOAD = 0x07
+MSG_LOGIN7 = 0x10
+MSG_PRELOGIN = 0x12
+
+DEFAULT_PACKET_SIZE = 4096
+MIN_PACKET_SIZE = 512
+MAX_PACKET_SIZE = 32767
+HEADER_SIZE = 8
+
+DONE_FINAL = 0x0000
+DONE_ERROR = 0x0002
+DONE_COUNT = 0x0010
+
+# DONE CurCmd values seen in test_output.txt
+CURCMD_SELECT = 0xC1
+CURCMD_BULK = 0xF0
+CURCMD_INSERT_BULK = 0xFD
+
+_HEADER = struct.Struct('>BBHHBB')
+_DONE = struct.Struct('<BHHQ')
+
+_CREATE = re.compile(r'^\s*create\s+table\s+([^\s(]+)', re.I)
+_DROP = re.compile(r'^\s*drop\s+table\s+(?:if\s+exists\s+)?([^\s;]+)', re.I)
+_TRUNCATE = re.compile(r'^\s*truncate\s+table\s+([^\s;]+)', re.I)
+_INSERT_BULK = re.compile(r'^\s*insert\s+bulk\s+([^\s(]+)', re.I)
+_COUNT = re.compile(r'^\s*select\s+count\(\*\)\s+from\s+([^\s;]+)', re.I)
+_SELECT_ALL = re.compile(r'^\s*select\s+\*\s+from\s+([^\s;]+)', re.I)
+
+
+def _table_key(name: str) -> str:
+    """Normalize [dbo].[T], dbo.T and T to one key"""
+    parts = [p.strip('[]"').lower() for p in name.split('.')]
+    return parts[-1]
+
+
+def _b_varchar(text: str) -> bytes:
+    data = text.encode('utf-16-le')
+    return bytes([len(text)]) + data
+
+
+def _us_varchar(text: str) -> bytes:
+    return struct.pack('<H', len(text)) + text.encode('utf-16-le')
+
+
+def done_token(status: int = DONE_FINAL, curcmd: int = 0, rowcount: int = 0) -> bytes:
+    return _DONE.pack(0xFD, status, curcmd, rowcount)
+
+
+def error_token(number: int, message: str, severity: int = 16, state: int = 1) -> bytes:
+    body = struct.pack('<IBB', number, state, severity) + _us_varchar(message) \
+        + _b_varchar('standin') + _b_varchar('') + struct.pack('<I', 1)
+    return struct.pack('<BH', 0xAA, len(body)) + body
+
+
+def prelogin_response() -> bytes:
+    """VERSION 16.0 and ENCRYPTION=NOT_SUP"""
+    version = struct.pack('>BBHH', 16, 0, 1000, 0)
+    table = struct.pack('>BHH', 0x00, 11, len(version)) + struct.pack('>BHH', 0x01, 11 + len(version), 1)
+    return table + b'\xff' + version + b'\x02'
+
+
+def login_response(packet_size: int) -> bytes:
+    envchange = b'\x04' + _b_varchar(str(packet_size)) + _b_varchar(str(DEFAULT_PACKET_SIZE))
+    loginack = b'\x01' + struct.pack('>I', 0x74000004) + _b_varchar('Microsoft SQL Server') \
+        + bytes([16, 0, 0x03, 0xE8])
+    return (struct.pack('<BH', 0xE3, len(envchange)) + envchange
+            + struct.pack('<BH', 0xAD, len(loginack)) + loginack
+            + done_token())
+
+
+def count_response(count: int) -> bytes:
+    """COLMETADATA (one unnamed INTN(4)) + ROW + DONE, as in test_output.txt"""
+    colmetadata = struct.pack('<BH', 0x81, 1) + struct.pack('<IHBB', 0, 0x0001, 0x26, 4) + b'\x00'
+    row = struct.pack('<BBi', 0xD1, 4, count)
+    return colmetadata + row + done_token(DONE_COUNT, CURCMD_SELECT, 1)
+
+
+class StandinHandler(socketserver.BaseRequestHandler):
+    """One client connection: read messages, answer each one"""
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.packet_size = DEFAULT_PACKET_SIZE
+        self.bulk_table: Optional[str] = None
+        self.header = bytearray(HEADER_SIZE)
+        self.body = bytearray(MAX_PACKET_SIZE)
+
+    def _recv_exact(self, view: memoryview) -> bool:
+        got = 0
+        while got < len(view):
+            n = self.request.recv_into(view[got:])
+            if n == 0:
+                return False
+            got += n
+        return True
+
+    def _read_packet(self):
+        """Returns (msg_type, status, body view) or None on disconnect"""
+        if not self._recv_exact(memoryview(self.header)):
+            return None
+        msg_type, status, length, _, _, _ = _HEADER.unpack(self.header)
+        view = memoryview(self.body)[:length - HEADER_SIZE]
+        if not self._recv_exact(view):
+            return None
+        return msg_type, status, view
+
+    def _send(self, payload: bytes):
+        chunk = self.packet_size - HEADER_SIZE
+        packet_id = 1
+        for offset in range(0, max(len(payload), 1), chunk):
+            data = payload[offset:offset + chunk]
+            status = 0x01 if offset + chunk >= len(payload) else 0x00
+            self.request.sendall(_HEADER.pack(MSG_RESPONSE, status, len(data) + HEADER_SIZE, 0x33,
+                                              packet_id & 0xFF, 0) + data)
+            packet_id += 1
+
+    def handle(self):
+        while True:
+            packet = self._read_packet()
+            if packet is None:
+                return
+            msg_type, status, view = packet
+            if msg_type == MSG_BULK_LOAD:
+                reply = self._bulk_load(status, view)
+                if reply is None:
+                    return
+            else:
+                parts = [bytes(view)]
+                while not status & 0x01:
+                    packet = self._read_packet()
+                    if packet is None:
+                        return
+                    _, status, view = packet
+                    parts.append(bytes(view))
+                reply = self._dispatch(msg_type, b''.join(parts))
+            self._send(reply)
+
+    def _dispatch(self, msg_type: int, payload: bytes) -> bytes:
+        if msg_type == MSG_PRELOGIN:
+            return prelogin_response()
+        if msg_type == MSG_LOGIN7:
+            requested = struct.unpack_from('<I', payload, 8)[0] or DEFAULT_PACKET_SIZE
+            size = min(max(requested, MIN_PACKET_SIZE), MAX_PACKET_SIZE)
+            self.packet_size = size
+            return login_response(size)
+        if msg_type == MSG_SQL_BATCH:
+            headers_len = struct.unpack_from('<I', payload, 0)[0]
+            return self._sql_batch(payload[headers_len:].decode('utf-16-le'))
+        return error_token(4002, f"Message type 0x{msg_type:02X} is not supported by the stand-in server") \
+            + done_token(DONE_ERROR)
+
+    def _sql_batch(self, sql: str) -> bytes:
+        tables: Dict[str, int] = self.server.tables
+        with self.server.lock:
+            m = _CREATE.match(sql)
+            if m:
+                tables[_table_key(m.group(1))] = 0
+                self.server.row_data.pop(_table_key(m.group(1)), None)
+                return done_token()
+            m = _DROP.match(sql) or _TRUNCATE.match(sql)
+            if m:
+                key = _table_key(m.group(1))
+                if key not in tables:
+                    return self._invalid_object(m.group(1))
+                if _DROP.match(sql):
+                    del tables[key]
+                else:
+                    tables[key] = 0
+                self.server.row_data.pop(key, None)
+                return done_token()
+            m = _INSERT_BULK.match(sql)
+            if m:
+                if _table_key(m.group(1)) not in tables:
+                    return self._invalid_object(m.group(1))
+                self.bulk_table = _table_key(m.group(1))
+                return done_token(DONE_FINAL, CURCMD_INSERT_BULK)
+            m = _COUNT.match(sql)
+            if m:
+                key = _table_key(m.group(1))
+                if key not in tables:
+                    return self._invalid_object(m.group(1))
+                return count_response(tables[key])
+            m = _SELECT_ALL.match(sql)
+            if m:
+                key = _table_key(m.group(1))
+                if key not in tables:
+                    return self._invalid_object(m.group(1))
+                if not self.server.keep_rows:
+                    return error_token(4002, "SELECT * needs the stand-in server to run with --keep-rows") \
+                        + done_token(DONE_ERROR)
+                stored = self.server.row_data.get(key)
+                if not stored:
+                    return done_token(DONE_COUNT, CURCMD_SELECT, 0)
+                return b''.join(stored) + done_token(DONE_COUNT, CURCMD_SELECT, tables[key])
+        return done_token()
+
+    @staticmethod
+    def _invalid_object(name: str) -> bytes:
+        return error_token(208, f"Invalid object name '{name}'.") + done_token(DONE_ERROR)
+
+    def _bulk_load(self, status: int, view: memoryview) -> Optional[bytes]:
+        """Count the rows of a BULK_LOAD message while it streams in"""
+        decoder = TokenStreamDecoder(decode_rows=False, decode_details=False)
+        rows = 0
+        pending = bytearray()
+        kept: Optional[List[bytes]] = [] if self.server.keep_rows else None
+
+        def emit(token_type, offset, length, detail, count):
+            nonlocal rows
+            if token_type == 0xD1 or token_type == 0xD2:
+                rows += count
+                if kept is not None:
+                    kept.append(bytes(pending[offset:offset + length]))
+            elif token_type == 0x81 and kept is not None:
+                kept.append(bytes(pending[offset:offset + length]))
+
+        try:
+            while True:
+                pending += view
+                final = bool(status & 0x01)
+                consumed = decoder.decode(memoryview(pending), emit, partial=not final)
+                del pending[:consumed]
+                if final:
+                    break
+                packet = self._read_packet()
+                if packet is None:
+                    return None
+                _, status, view = packet
+        except (TdsDecodeError, IndexError, struct.error) as e:
+            return error_token(4815, f"Received an invalid column length from the bcp client: {e}") \
+                + done_token(DONE_ERROR)
+
+        if self.bulk_table is None:
+            return error_token(4804, "BULK_LOAD received without a preceding INSERT BULK") \
+                + done_token(DONE_ERROR)
+        with self.server.lock:
+            self.server.tables[self.bulk_table] = self.server.tables.get(self.bulk_table, 0) + rows
+            if kept:
+                stored = self.server.row_data.setdefault(self.bulk_table, [])
+                # Later batches repeat the COLMETADATA; the result set needs it once
+                stored.extend(kept[1:] if stored and kept[0][0] == 0x81 else kept)
+        self.bulk_table = None
+        return done_token(DONE_COUNT, CURCMD_BULK, rows)
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    """Threaded server sharing one table catalog across connections"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, keep_rows: bool = False):
+        super().__init__(address, StandinHandler)
+        self.tables: Dict[str, int] = {}
+        self.keep_rows = keep_rows
+        self.row_data: Dict[str, List[bytes]] = {}
+        self.lock = threading.Lock()
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, keep_rows: bool = False) -> StandinServer:
+    """Start a server on a background thread; server.server_address has the port"""
+    server = StandinServer((host, port), keep_rows)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def spawn_server(keep_rows: bool = False) -> Tuple[subprocess.Popen, int]:
+    """Run this server on a free port in a child process; returns (process, port)"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--port', '0']
+    if keep_rows:
+        cmd.append('--keep-rows')
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.strip().isdigit():
+        proc.kill()
+        raise RuntimeError("Stand-in server did not report its port")
+    return proc, int(line)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Local TDS stand-in server for bulk load benchmarks',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Fixed port
+  python tds_standin_server.py --port 14330
+
+  # Any free port; the chosen port is printed on the first line
+  python tds_standin_server.py --port 0
+
+  # Keep loaded rows so SELECT * FROM <table> returns them
+  python tds_standin_server.py --port 0 --keep-rows
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=14330, help='Port to listen on, 0 for any (default: 14330)')
+    parser.add_argument('--keep-rows', action='store_true',
+                        help='Keep bulk loaded rows and serve them to SELECT * FROM <table>')
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), args.keep_rows)
+    print(server.server_address[1], flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
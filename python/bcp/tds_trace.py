@@ -0,0 +1,1210 @@
+#!/usr/bin/env python3
+"""
+TDS Trace Decoder - Parse captured TDS traffic into packets and tokens
+
+Reads either the `[TDS OUT]` / `[TDS IN]` hex dumps that SqlClient writes
+when TDS tracing is enabled (see dotnet/bcp/dotnet_guid_trace.txt) or a
+pcap/pcapng capture of SQL Server traffic, reassembles TDS packets into
+messages and walks the token streams (COLMETADATA, ROW, NBCROW, DONE,
+ENVCHANGE, INFO, ...).
+
+The decoder works on memoryview slices of the input and only skips over
+row values unless asked to decode them, so multi-GB traces of million-row
+bulk loads can be summarised without materialising per-row objects.
+
+Usage:
+    python tds_trace.py ../../dotnet/bcp/dotnet_guid_trace.txt
+    python tds_trace.py ../../dotnet/bcp/dotnet_guid_trace.txt --tokens --rows
+    python tds_trace.py capture.pcap --port 1433 --messages
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+from decimal import Decimal
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional, List, Dict, Any, Iterator, Iterable, Callable, NamedTuple, Tuple
+from collections import defaultdict
+
+from guid_codec import decode_guid
+
+
+# TDS message (packet) types
+MSG_TYPES = {
+    0x01: 'SQL_BATCH',
+    0x02: 'PRE_TDS7_LOGIN',
+    0x03: 'RPC',
+    0x04: 'TABULAR_RESULT',
+    0x06: 'ATTENTION',
+    0x07: 'BULK_LOAD',
+    0x08: 'FEDAUTH_TOKEN',
+    0x0E: 'TRANSACTION_MANAGER',
+    0x10: 'LOGIN7',
+    0x11: 'SSPI',
+    0x12: 'PRELOGIN',
+}
+
+# Token stream token types
+TOKEN_NAMES = {
+    0x79: 'RETURNSTATUS',
+    0x81: 'COLMETADATA',
+    0xA4: 'TABNAME',
+    0xA5: 'COLINFO',
+    0xA9: 'ORDER',
+    0xAA: 'ERROR',
+    0xAB: 'INFO',
+    0xAC: 'RETURNVALUE',
+    0xAD: 'LOGINACK',
+    0xAE: 'FEATUREEXTACK',
+    0xD1: 'ROW',
+    0xD2: 'NBCROW',
+    0xE3: 'ENVCHANGE',
+    0xE4: 'SESSIONSTATE',
+    0xED: 'SSPI',
+    0xEE: 'FEDAUTHINFO',
+    0xFD: 'DONE',
+    0xFE: 'DONEPROC',
+    0xFF: 'DONEINPROC',
+}
+
+ENVCHANGE_TYPES = {
+    1: 'DATABASE',
+    2: 'LANGUAGE',
+    3: 'CHARSET',
+    4: 'PACKETSIZE',
+    5: 'UNICODE_SORT_LOCALE',
+    6: 'UNICODE_COMPARISON_FLAGS',
+    7: 'SQL_COLLATION',
+    8: 'BEGIN_TRANSACTION',
+    9: 'COMMIT_TRANSACTION',
+    10: 'ROLLBACK_TRANSACTION',
+    13: 'DATABASE_MIRRORING_PARTNER',
+    17: 'TRANSACTION_ENDED',
+    18: 'RESET_CONNECTION_ACK',
+    19: 'USER_INSTANCE',
+    20: 'ROUTING',
+}
+
+PRELOGIN_OPTIONS = {
+    0x00: 'VERSION',
+    0x01: 'ENCRYPTION',
+    0x02: 'INSTOPT',
+    0x03: 'THREADID',
+    0x04: 'MARS',
+    0x05: 'TRACEID',
+    0x06: 'FEDAUTHREQUIRED',
+    0x07: 'NONCEOPT',
+}
+
+# Data types. Fixed-length types carry no TYPE_INFO in COLMETADATA and no
+# length prefix in ROW data; everything else is length-prefixed per value.
+FIXED_LEN_TYPES = {
+    0x1F: 0,   # NULLTYPE
+    0x30: 1,   # INT1
+    0x32: 1,   # BIT
+    0x34: 2,   # INT2
+    0x38: 4,   # INT4
+    0x3A: 4,   # DATETIM4
+    0x3B: 4,   # FLT4
+    0x3C: 8,   # MONEY
+    0x3D: 8,   # DATETIME
+    0x3E: 8,   # FLT8
+    0x7A: 4,   # MONEY4
+    0x7F: 8,   # INT8
+}
+BYTELEN_TYPES = {0x24, 0x26, 0x68, 0x6D, 0x6E, 0x6F, 0x25, 0x27, 0x2D, 0x2F}
+DECIMAL_TYPES = {0x37, 0x3F, 0x6A, 0x6C}
+SCALED_TIME_TYPES = {0x29, 0x2A, 0x2B}
+DATEN_TYPE = 0x28
+USHORTLEN_TYPES = {0xA5, 0xA7, 0xAD, 0xAF, 0xE7, 0xEF}
+COLLATED_TYPES = {0xA7, 0xAF, 0xE7, 0xEF, 0x23, 0x63}
+LONGLEN_TYPES = {0x22, 0x23, 0x63}
+XML_TYPE = 0xF1
+UDT_TYPE = 0xF0
+VARIANT_TYPE = 0x62
+
+TYPE_NAMES = {
+    0x1F: 'NULL', 0x30: 'TINYINT', 0x32: 'BIT', 0x34: 'SMALLINT', 0x38: 'INT',
+    0x3A: 'SMALLDATETIME', 0x3B: 'REAL', 0x3C: 'MONEY', 0x3D: 'DATETIME',
+    0x3E: 'FLOAT', 0x7A: 'SMALLMONEY', 0x7F: 'BIGINT', 0x24: 'UNIQUEIDENTIFIER',
+    0x26: 'INTN', 0x68: 'BITN', 0x6D: 'FLTN', 0x6E: 'MONEYN', 0x6F: 'DATETIMN',
+    0x6A: 'DECIMAL', 0x6C: 'NUMERIC', 0x28: 'DATE', 0x29: 'TIME',
+    0x2A: 'DATETIME2', 0x2B: 'DATETIMEOFFSET', 0xA5: 'VARBINARY',
+    0xA7: 'VARCHAR', 0xAD: 'BINARY', 0xAF: 'CHAR', 0xE7: 'NVARCHAR',
+    0xEF: 'NCHAR', 0x22: 'IMAGE', 0x23: 'TEXT', 0x63: 'NTEXT', 0xF1: 'XML',
+    0xF0: 'UDT', 0x62: 'SQL_VARIANT',
+}
+
+# Value layouts used by the row walker
+_FIXED, _BYTELEN, _USHORTLEN, _PLP, _LONGLEN, _LONG4 = range(6)
+
+PLP_NULL = 0xFFFFFFFFFFFFFFFF
+STATUS_EOM = 0x01
+HEADER_SIZE = 8
+
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+_U64 = struct.Struct('<Q')
+_HEADER = struct.Struct('>BBHHBB')
+_DONE = struct.Struct('<HHQ')
+
+_DATETIME_EPOCH = datetime(1900, 1, 1)
+_DATE_EPOCH = date(1, 1, 1)
+
+
+class TdsDecodeError(Exception):
+    """Raised when a buffer cannot be decoded as TDS"""
+
+
+class TdsPacket(NamedTuple):
+    """A single TDS packet (8-byte header plus payload)"""
+    direction: str
+    msg_type: int
+    status: int
+    length: int
+    spid: int
+    packet_id: int
+    window: int
+    payload: memoryview
+    timestamp: Optional[float]
+
+
+class TdsMessage(NamedTuple):
+    """One or more packets up to and including the EOM packet"""
+    connection: Any
+    direction: str
+    msg_type: int
+    packet_count: int
+    wire_bytes: int
+    payload: memoryview
+    first_timestamp: Optional[float]
+    last_timestamp: Optional[float]
+
+
+class TdsToken(NamedTuple):
+    """A decoded token (offsets are relative to the message payload)"""
+    token_type: int
+    name: str
+    offset: int
+    length: int
+    detail: Any
+
+
+class ColumnInfo:
+    """Column description from a COLMETADATA token"""
+
+    __slots__ = ('name', 'tds_type', 'user_type', 'flags', 'max_length',
+                 'precision', 'scale', 'collation', 'layout', 'size')
+
+    def __init__(self):
+        self.name = ''
+        self.tds_type = 0
+        self.user_type = 0
+        self.flags = 0
+        self.max_length = 0
+        self.precision = 0
+        self.scale = 0
+        self.collation = b''
+        self.layout = _FIXED
+        self.size = 0
+
+    @property
+    def type_name(self) -> str:
+        return TYPE_NAMES.get(self.tds_type, f'0x{self.tds_type:02X}')
+
+    @property
+    def nullable(self) -> bool:
+        return bool(self.flags & 0x0001)
+
+    def describe(self) -> str:
+        text = f"{self.name or '<unnamed>'} {self.type_name}"
+        if self.tds_type in USHORTLEN_TYPES or self.tds_type in BYTELEN_TYPES:
+            length = self.max_length // 2 if self.tds_type in (0xE7, 0xEF) else self.max_length
+            text += '(max)' if self.layout == _PLP else f'({length})'
+        elif self.tds_type in DECIMAL_TYPES:
+            text += f'({self.precision},{self.scale})'
+        elif self.tds_type in SCALED_TIME_TYPES:
+            text += f'({self.scale})'
+        text += ' NULL' if self.nullable else ' NOT NULL'
+        return text
+
+
+# ---------------------------------------------------------------------------
+# Packet and message framing
+# ---------------------------------------------------------------------------
+
+class TdsStreamReassembler:
+    """
+    Splits a byte stream (one direction of one connection) into TDS packets
+
+    Whole packets are returned as memoryview slices of the input buffer;
+    only a packet that straddles two feed() calls is copied.
+    """
+
+    def __init__(self, direction: str):
+        self.direction = direction
+        self._pending = bytearray()
+
+    def feed(self, data, timestamp: Optional[float] = None) -> Iterator[TdsPacket]:
+        if self._pending:
+            self._pending += data
+            view = memoryview(bytes(self._pending))
+            self._pending.clear()
+        else:
+            view = memoryview(data)
+
+        pos = 0
+        end = len(view)
+        while end - pos >= HEADER_SIZE:
+            msg_type, status, length, spid, packet_id, window = _HEADER.unpack_from(view, pos)
+            if length < HEADER_SIZE:
+                raise TdsDecodeError(f"Invalid TDS packet length {length} at offset {pos}")
+            if end - pos < length:
+                break
+            yield TdsPacket(self.direction, msg_type, status, length, spid, packet_id,
+                            window, view[pos + HEADER_SIZE:pos + length], timestamp)
+            pos += length
+
+        if pos < end:
+            self._pending += view[pos:]
+
+
+class TdsMessageAssembler:
+    """Groups packets into messages using the EOM status bit"""
+
+    def __init__(self, connection: Any, direction: str):
+        self.connection = connection
+        self.direction = direction
+        self._packets: List[TdsPacket] = []
+
+    def add(self, packet: TdsPacket) -> Optional[TdsMessage]:
+        self._packets.append(packet)
+        if not packet.status & STATUS_EOM:
+            return None
+
+        packets = self._packets
+        self._packets = []
+        if len(packets) == 1:
+            payload = packet.payload
+        else:
+            payload = memoryview(b''.join(p.payload for p in packets))
+        return TdsMessage(
+            self.connection, self.direction, packets[0].msg_type, len(packets),
+            sum(p.length for p in packets), payload,
+            packets[0].timestamp, packet.timestamp
+        )
+
+
+def iter_trace_packets(path: str) -> Iterator[TdsPacket]:
+    """
+    Yield packets from a SqlClient TDS trace (`[TDS OUT] Hex Data: ...` lines)
+
+    `[TDS IN]` hex dumps are socket reads and may hold several packets, or
+    part of one, so both directions go through a stream reassembler.
+    """
+    streams = {'OUT': TdsStreamReassembler('OUT'), 'IN': TdsStreamReassembler('IN')}
+    marker = b'Hex Data:'
+
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.startswith(b'[TDS '):
+                continue
+            idx = line.find(marker)
+            if idx < 0:
+                continue
+            direction = 'OUT' if line.startswith(b'[TDS OUT') else 'IN'
+            data = bytes.fromhex(line[idx + len(marker):].decode('ascii'))
+            yield from streams[direction].feed(data)
+
+
+# ---------------------------------------------------------------------------
+# pcap / pcapng capture support
+# ---------------------------------------------------------------------------
+
+_LINKTYPE_NULL = 0
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_RAW = 101
+_LINKTYPE_LOOP = 108
+_LINKTYPE_LINUX_SLL = 113
+_LINKTYPE_IPV4 = 228
+_LINKTYPE_IPV6 = 229
+
+
+def _ip_payload(linktype: int, frame: memoryview) -> Optional[memoryview]:
+    """Strip the link-layer header, returning the IP packet"""
+    if linktype == _LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None
+        ethertype = (frame[12] << 8) | frame[13]
+        offset = 14
+        while ethertype == 0x8100 and len(frame) >= offset + 4:  # 802.1Q VLAN
+            ethertype = (frame[offset + 2] << 8) | frame[offset + 3]
+            offset += 4
+        return frame[offset:] if ethertype in (0x0800, 0x86DD) else None
+    if linktype in (_LINKTYPE_NULL, _LINKTYPE_LOOP):
+        return frame[4:]
+    if linktype == _LINKTYPE_LINUX_SLL:
+        return frame[16:]
+    if linktype in (_LINKTYPE_RAW, _LINKTYPE_IPV4, _LINKTYPE_IPV6):
+        return frame
+    return None
+
+
+def _tcp_segment(ip: memoryview) -> Optional[Tuple[bytes, bytes, int, int, int, memoryview]]:
+    """Return (src_ip, dst_ip, src_port, dst_port, seq, payload) for TCP packets"""
+    if len(ip) < 20:
+        return None
+    version = ip[0] >> 4
+    if version == 4:
+        ihl = (ip[0] & 0x0F) * 4
+        if ip[9] != 6:
+            return None
+        total = (ip[2] << 8) | ip[3]
+        src, dst = bytes(ip[12:16]), bytes(ip[16:20])
+        tcp = ip[ihl:total] if total else ip[ihl:]
+    elif version == 6:
+        if ip[6] != 6:  # extension headers are not followed
+            return None
+        plen = (ip[4] << 8) | ip[5]
+        src, dst = bytes(ip[8:24]), bytes(ip[24:40])
+        tcp = ip[40:40 + plen]
+    else:
+        return None
+
+    if len(tcp) < 20:
+        return None
+    src_port = (tcp[0] << 8) | tcp[1]
+    dst_port = (tcp[2] << 8) | tcp[3]
+    seq = struct.unpack_from('>I', tcp, 4)[0]
+    data_offset = (tcp[12] >> 4) * 4
+    return src, dst, src_port, dst_port, seq, tcp[data_offset:]
+
+
+def _iter_pcap_frames(view: memoryview) -> Iterator[Tuple[int, float, memoryview]]:
+    """Yield (linktype, timestamp, frame) from a classic pcap or pcapng buffer"""
+    magic = bytes(view[:4])
+
+    if magic == b'\x0a\x0d\x0d\x0a':
+        # pcapng: Section Header, Interface Description and (Enhanced) Packet blocks
+        endian = '<'
+        interfaces: List[Tuple[int, float]] = []
+        pos = 0
+        while pos + 12 <= len(view):
+            block_type = struct.unpack_from(endian + 'I', view, pos)[0]
+            if block_type == 0x0A0D0D0A:
+                endian = '<' if bytes(view[pos + 8:pos + 12]) == b'\x4d\x3c\x2b\x1a' else '>'
+                interfaces = []
+            block_len = struct.unpack_from(endian + 'I', view, pos + 4)[0]
+            if block_len < 12:
+                raise TdsDecodeError(f"Corrupt pcapng block at offset {pos}")
+            body = view[pos + 8:pos + block_len - 4]
+            if block_type == 0x00000001:
+                linktype = struct.unpack_from(endian + 'H', body, 0)[0]
+                resolution = 1e-6
+                opt = 8
+                while opt + 4 <= len(body):
+                    code, olen = struct.unpack_from(endian + 'HH', body, opt)
+                    if code == 0:
+                        break
+                    if code == 9 and olen >= 1:  # if_tsresol
+                        raw = body[opt + 4]
+                        resolution = 2.0 ** -(raw & 0x7F) if raw & 0x80 else 10.0 ** -raw
+                    opt += 4 + ((olen + 3) & ~3)
+                interfaces.append((linktype, resolution))
+            elif block_type == 0x00000006:
+                iface, ts_high, ts_low, caplen = struct.unpack_from(endian + 'IIII', body, 0)
+                linktype, resolution = interfaces[iface]
+                yield linktype, ((ts_high << 32) | ts_low) * resolution, body[20:20 + caplen]
+            elif block_type == 0x00000003:
+                linktype, _ = interfaces[0]
+                yield linktype, 0.0, body[4:]
+            pos += block_len
+        return
+
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        endian = '>'
+    else:
+        raise TdsDecodeError("Not a pcap or pcapng file")
+    nanos = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+    linktype = struct.unpack_from(endian + 'I', view, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(endian + 'IIII')
+    divisor = 1e9 if nanos else 1e6
+
+    pos = 24
+    while pos + 16 <= len(view):
+        ts_sec, ts_frac, caplen, _ = record.unpack_from(view, pos)
+        pos += 16
+        yield linktype, ts_sec + ts_frac / divisor, view[pos:pos + caplen]
+        pos += caplen
+
+
+def iter_pcap_messages(path: str, server_port: int = 1433) -> Iterator[TdsMessage]:
+    """
+    Yield TDS messages from a pcap/pcapng capture
+
+    Each client connection (keyed by client address and port) gets its own
+    reassembler per direction. Retransmitted TCP segments are dropped using
+    the sequence numbers; out-of-order delivery is not reordered.
+    """
+    flows: Dict[Tuple, Dict[str, Any]] = {}
+
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    try:
+        for linktype, ts, frame in _iter_pcap_frames(view):
+            ip = _ip_payload(linktype, frame)
+            if ip is None:
+                continue
+            segment = _tcp_segment(ip)
+            if segment is None:
+                continue
+            src, dst, src_port, dst_port, seq, payload = segment
+            if dst_port == server_port:
+                key, direction = (src, src_port), 'OUT'
+            elif src_port == server_port:
+                key, direction = (dst, dst_port), 'IN'
+            else:
+                continue
+            if not payload:
+                continue
+
+            flow = flows.get(key)
+            if flow is None:
+                connection = f"{_format_ip(key[0])}:{key[1]}"
+                flow = flows[key] = {
+                    'OUT': TdsStreamReassembler('OUT'), 'IN': TdsStreamReassembler('IN'),
+                    'asm_OUT': TdsMessageAssembler(connection, 'OUT'),
+                    'asm_IN': TdsMessageAssembler(connection, 'IN'),
+                    'seq_OUT': None, 'seq_IN': None,
+                }
+
+            next_seq = flow['seq_' + direction]
+            if next_seq is not None:
+                delta = (seq - next_seq) & 0xFFFFFFFF
+                if delta >= 0x80000000:  # segment starts before what we have already seen
+                    overlap = (next_seq - seq) & 0xFFFFFFFF
+                    if overlap >= len(payload):
+                        continue
+                    payload = payload[overlap:]
+                    seq = next_seq
+            flow['seq_' + direction] = (seq + len(payload)) & 0xFFFFFFFF
+
+            assembler = flow['asm_' + direction]
+            for packet in flow[direction].feed(payload, ts):
+                message = assembler.add(packet)
+                if message is not None:
+                    yield message
+    finally:
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            pass  # messages still referenced by the caller keep the map alive
+
+
+def _format_ip(raw: bytes) -> str:
+    if len(raw) == 4:
+        return '.'.join(str(b) for b in raw)
+    return ':'.join(f'{raw[i] << 8 | raw[i + 1]:x}' for i in range(0, len(raw), 2))
+
+
+def iter_trace_messages(path: str) -> Iterator[TdsMessage]:
+    """Yield TDS messages from a SqlClient text trace"""
+    assemblers = {'OUT': TdsMessageAssembler(path, 'OUT'), 'IN': TdsMessageAssembler(path, 'IN')}
+    for packet in iter_trace_packets(path):
+        message = assemblers[packet.direction].add(packet)
+        if message is not None:
+            yield message
+
+
+def iter_messages(path: str, server_port: int = 1433) -> Iterator[TdsMessage]:
+    """Yield messages from a trace or capture file, detecting the format"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\xc3\xd4',
+                 b'\xa1\xb2\x3c\x4d', b'\x0a\x0d\x0d\x0a'):
+        return iter_pcap_messages(path, server_port)
+    return iter_trace_messages(path)
+
+
+# ---------------------------------------------------------------------------
+# Token stream decoding
+# ---------------------------------------------------------------------------
+
+def _b_varchar(mv: memoryview, pos: int) -> Tuple[str, int]:
+    n = mv[pos] * 2
+    return bytes(mv[pos + 1:pos + 1 + n]).decode('utf-16-le'), pos + 1 + n
+
+
+def _us_varchar(mv: memoryview, pos: int) -> Tuple[str, int]:
+    n = _U16.unpack_from(mv, pos)[0] * 2
+    return bytes(mv[pos + 2:pos + 2 + n]).decode('utf-16-le'), pos + 2 + n
+
+
+def parse_type_info(mv: memoryview, pos: int, col: ColumnInfo) -> int:
+    """Parse TYPE_INFO for `col.tds_type` starting at pos, returning the new position"""
+    t = col.tds_type
+    if t in FIXED_LEN_TYPES:
+        col.layout, col.size = _FIXED, FIXED_LEN_TYPES[t]
+        col.max_length = col.size
+    elif t in BYTELEN_TYPES:
+        col.layout, col.max_length = _BYTELEN, mv[pos]
+        pos += 1
+    elif t in DECIMAL_TYPES:
+        col.layout = _BYTELEN
+        col.max_length, col.precision, col.scale = mv[pos], mv[pos + 1], mv[pos + 2]
+        pos += 3
+    elif t == DATEN_TYPE:
+        col.layout, col.max_length = _BYTELEN, 3
+    elif t in SCALED_TIME_TYPES:
+        col.layout, col.scale = _BYTELEN, mv[pos]
+        pos += 1
+    elif t in USHORTLEN_TYPES:
+        col.max_length = _U16.unpack_from(mv, pos)[0]
+        col.layout = _PLP if col.max_length == 0xFFFF else _USHORTLEN
+        pos += 2
+        if t in COLLATED_TYPES:
+            col.collation = bytes(mv[pos:pos + 5])
+            pos += 5
+    elif t in LONGLEN_TYPES:
+        col.layout, col.max_length = _LONGLEN, _U32.unpack_from(mv, pos)[0]
+        pos += 4
+        if t in COLLATED_TYPES:
+            col.collation = bytes(mv[pos:pos + 5])
+            pos += 5
+    elif t == XML_TYPE:
+        col.layout = _PLP
+        schema_present = mv[pos]
+        pos += 1
+        if schema_present:
+            _, pos = _b_varchar(mv, pos)
+            _, pos = _b_varchar(mv, pos)
+            _, pos = _us_varchar(mv, pos)
+    elif t == UDT_TYPE:
+        col.layout, col.max_length = _PLP, _U16.unpack_from(mv, pos)[0]
+        pos += 2
+        for _ in range(3):
+            _, pos = _b_varchar(mv, pos)
+        _, pos = _us_varchar(mv, pos)
+    elif t == VARIANT_TYPE:
+        col.layout, col.max_length = _LONG4, _U32.unpack_from(mv, pos)[0]
+        pos += 4
+    else:
+        raise TdsDecodeError(f"Unsupported data type 0x{t:02X}")
+    return pos
+
+
+def parse_colmetadata(mv: memoryview, pos: int) -> Tuple[List[ColumnInfo], int]:
+    """Parse a COLMETADATA body (after the 0x81 token byte)"""
+    count = _U16.unpack_from(mv, pos)[0]
+    pos += 2
+    columns: List[ColumnInfo] = []
+    if count == 0xFFFF:
+        return columns, pos
+
+    for _ in range(count):
+        col = ColumnInfo()
+        col.user_type = _U32.unpack_from(mv, pos)[0]
+        col.flags = _U16.unpack_from(mv, pos + 4)[0]
+        col.tds_type = mv[pos + 6]
+        pos = parse_type_info(mv, pos + 7, col)
+        if col.tds_type in LONGLEN_TYPES:
+            parts = mv[pos]
+            pos += 1
+            for _ in range(parts):
+                _, pos = _us_varchar(mv, pos)
+        col.name, pos = _b_varchar(mv, pos)
+        columns.append(col)
+    return columns, pos
+
+
+def skip_value(mv: memoryview, pos: int, col: ColumnInfo) -> int:
+    """Advance past one column value"""
+    layout = col.layout
+    if layout == _FIXED:
+        return pos + col.size
+    if layout == _BYTELEN:
+        return pos + 1 + mv[pos]
+    if layout == _USHORTLEN:
+        n = _U16.unpack_from(mv, pos)[0]
+        return pos + 2 + (0 if n == 0xFFFF else n)
+    if layout == _PLP:
+        total = _U64.unpack_from(mv, pos)[0]
+        pos += 8
+        if total == PLP_NULL:
+            return pos
+        while True:
+            n = _U32.unpack_from(mv, pos)[0]
+            pos += 4 + n
+            if n == 0:
+                return pos
+    if layout == _LONGLEN:
+        textptr = mv[pos]
+        pos += 1
+        if textptr == 0:
+            return pos
+        pos += textptr + 8
+        return pos + 4 + _I32.unpack_from(mv, pos)[0]
+    return pos + 4 + _U32.unpack_from(mv, pos)[0]
+
+
+def _value_bytes(mv: memoryview, pos: int, col: ColumnInfo) -> Tuple[Optional[bytes], int]:
+    """Return the raw bytes of one value (None for NULL) and the next position"""
+    layout = col.layout
+    if layout == _FIXED:
+        return bytes(mv[pos:pos + col.size]), pos + col.size
+    if layout == _BYTELEN:
+        n = mv[pos]
+        if n == 0:
+            return None, pos + 1
+        return bytes(mv[pos + 1:pos + 1 + n]), pos + 1 + n
+    if layout == _USHORTLEN:
+        n = _U16.unpack_from(mv, pos)[0]
+        if n == 0xFFFF:
+            return None, pos + 2
+        return bytes(mv[pos + 2:pos + 2 + n]), pos + 2 + n
+    if layout == _PLP:
+        total = _U64.unpack_from(mv, pos)[0]
+        pos += 8
+        if total == PLP_NULL:
+            return None, pos
+        chunks = []
+        while True:
+            n = _U32.unpack_from(mv, pos)[0]
+            pos += 4
+            if n == 0:
+                return b''.join(chunks), pos
+            chunks.append(bytes(mv[pos:pos + n]))
+            pos += n
+    if layout == _LONGLEN:
+        end = skip_value(mv, pos, col)
+        textptr = mv[pos]
+        if textptr == 0:
+            return None, end
+        start = pos + 1 + textptr + 8 + 4
+        return bytes(mv[start:end]), end
+    n = _U32.unpack_from(mv, pos)[0]
+    return bytes(mv[pos + 4:pos + 4 + n]), pos + 4 + n
+
+
+def convert_value(raw: Optional[bytes], col: ColumnInfo) -> Any:
+    """Convert raw value bytes to a Python object (best effort, raw bytes otherwise)"""
+    if raw is None:
+        return None
+    t = col.tds_type
+    if t in (0x30, 0x34, 0x38, 0x7F) or t == 0x26:
+        return int.from_bytes(raw, 'little', signed=len(raw) > 1)
+    if t in (0x32, 0x68):
+        return bool(raw[0])
+    if t == 0x3B or t == 0x6D and len(raw) == 4:
+        return struct.unpack('<f', raw)[0]
+    if t == 0x3E or t == 0x6D:
+        return struct.unpack('<d', raw)[0]
+    if t == 0x24:
+        return decode_guid(raw)
+    if t in (0xE7, 0xEF, 0x63):
+        return raw.decode('utf-16-le')
+    if t in (0xA7, 0xAF, 0x23):
+        return raw.decode('cp1252', errors='replace')
+    if t == XML_TYPE:
+        return raw.decode('utf-16-le')
+    if t in DECIMAL_TYPES:
+        magnitude = int.from_bytes(raw[1:], 'little')
+        return Decimal(magnitude if raw[0] else -magnitude).scaleb(-col.scale)
+    if t in (0x3C, 0x7A) or t == 0x6E:
+        if len(raw) == 8:
+            value = (_I32.unpack(raw[:4])[0] << 32) | _U32.unpack(raw[4:])[0]
+        else:
+            value = _I32.unpack(raw)[0]
+        return Decimal(value).scaleb(-4)
+    if t == 0x3D or t == 0x6F and len(raw) == 8:
+        days, ticks = struct.unpack('<iI', raw)
+        return _DATETIME_EPOCH + timedelta(days=days, milliseconds=ticks * 10 / 3)
+    if t == 0x3A or t == 0x6F:
+        days, minutes = struct.unpack('<HH', raw)
+        return _DATETIME_EPOCH + timedelta(days=days, minutes=minutes)
+    if t == DATEN_TYPE:
+        return _DATE_EPOCH + timedelta(days=int.from_bytes(raw, 'little'))
+    if t in SCALED_TIME_TYPES:
+        time_len = len(raw) - {0x29: 0, 0x2A: 3, 0x2B: 5}[t]
+        units = int.from_bytes(raw[:time_len], 'little')
+        since_midnight = timedelta(microseconds=units / 10 ** (col.scale - 6)) if col.scale > 6 \
+            else timedelta(microseconds=units * 10 ** (6 - col.scale))
+        if t == 0x29:
+            return since_midnight
+        day = _DATE_EPOCH + timedelta(days=int.from_bytes(raw[time_len:time_len + 3], 'little'))
+        value = datetime(day.year, day.month, day.day) + since_midnight
+        if t == 0x2B:
+            offset = timedelta(minutes=struct.unpack('<h', raw[-2:])[0])
+            return (value + offset).replace(tzinfo=timezone(offset))
+        return value
+    return raw
+
+
+def decode_row(mv: memoryview, pos: int, columns: List[ColumnInfo], nbc: bool) -> Tuple[List[Any], int]:
+    """Decode one ROW/NBCROW body into Python values"""
+    values: List[Any] = []
+    if nbc:
+        bitmap_len = (len(columns) + 7) // 8
+        bitmap = mv[pos:pos + bitmap_len]
+        pos += bitmap_len
+        for i, col in enumerate(columns):
+            if bitmap[i >> 3] & (1 << (i & 7)):
+                values.append(None)
+            else:
+                raw, pos = _value_bytes(mv, pos, col)
+                values.append(convert_value(raw, col))
+        return values, pos
+    for col in columns:
+        raw, pos = _value_bytes(mv, pos, col)
+        values.append(convert_value(raw, col))
+    return values, pos
+
+
+def _skip_row(mv: memoryview, pos: int, columns: List[ColumnInfo], nbc: bool) -> int:
+    if nbc:
+        bitmap_len = (len(columns) + 7) // 8
+        bitmap = mv[pos:pos + bitmap_len]
+        pos += bitmap_len
+        for i, col in enumerate(columns):
+            if not bitmap[i >> 3] & (1 << (i & 7)):
+                pos = skip_value(mv, pos, col)
+        return pos
+    # Fixed and byte-length values dominate bulk loads; handle them inline
+    for col in columns:
+        layout = col.layout
+        if layout == _FIXED:
+            pos += col.size
+        elif layout == _BYTELEN:
+            pos += 1 + mv[pos]
+        else:
+            pos = skip_value(mv, pos, col)
+    return pos
+
+
+def _decode_envchange(body: memoryview) -> Dict[str, Any]:
+    env_type = body[0]
+    detail: Dict[str, Any] = {'type': ENVCHANGE_TYPES.get(env_type, env_type)}
+    if env_type in (1, 2, 3, 4, 5, 6, 13, 19):
+        detail['new'], pos = _b_varchar(body, 1)
+        detail['old'], _ = _b_varchar(body, pos)
+    else:
+        detail['data'] = bytes(body[1:]).hex(' ')
+    return detail
+
+
+def _decode_info(body: memoryview) -> Dict[str, Any]:
+    number, state, severity = struct.unpack_from('<IBB', body, 0)
+    message, pos = _us_varchar(body, 6)
+    server, pos = _b_varchar(body, pos)
+    proc, pos = _b_varchar(body, pos)
+    line = _U32.unpack_from(body, pos)[0]
+    return {'number': number, 'state': state, 'class': severity, 'message': message,
+            'server': server, 'procedure': proc, 'line': line}
+
+
+def _decode_loginack(body: memoryview) -> Dict[str, Any]:
+    interface = body[0]
+    tds_version = struct.unpack_from('>I', body, 1)[0]
+    prog_name, pos = _b_varchar(body, 5)
+    major, minor, build_hi, build_lo = body[pos:pos + 4]
+    return {'interface': interface, 'tds_version': f'0x{tds_version:08X}',
+            'program': prog_name.rstrip('\x00'), 'version': f'{major}.{minor}.{(build_hi << 8) | build_lo}'}
+
+
+def _decode_done(body: memoryview) -> Dict[str, Any]:
+    if len(body) < 12:
+        status, curcmd, rowcount = struct.unpack_from('<HHI', body, 0)
+    else:
+        status, curcmd, rowcount = _DONE.unpack_from(body, 0)
+    return {'status': status, 'curcmd': curcmd, 'rowcount': rowcount}
+
+
+class TokenStreamDecoder:
+    """
+    Walks the token stream of one direction of a connection
+
+    COLMETADATA is remembered between messages because ROW tokens can only
+    be sized with the column descriptions in hand.
+
+    Every token is reported through `emit(token_type, offset, length, detail, count)`.
+    Runs of consecutive ROW/NBCROW tokens are reported once with `count` set
+    to the number of rows unless `decode_rows` is set, in which case each
+    row is emitted individually with its decoded values as the detail.
+    """
+
+    def __init__(self, decode_rows: bool = False, decode_details: bool = True):
+        self.decode_rows = decode_rows
+        self.decode_details = decode_details
+        self.columns: List[ColumnInfo] = []
+
+    def decode(self, mv: memoryview, emit: Callable[[int, int, int, Any, int], None],
+               partial: bool = False) -> int:
+        """
+        Decode the tokens in mv, returning the number of bytes consumed
+
+        With partial=True a token cut off at the end of mv is not an error:
+        decoding stops in front of it (after emitting any complete rows of
+        a ROW run) so the caller can retry once more bytes have arrived.
+        """
+        pos = 0
+        end = len(mv)
+        detail_on = self.decode_details
+
+        while pos < end:
+            start = pos
+            token = mv[pos]
+            pos += 1
+            detail = None
+
+            if token == 0xD1 or token == 0xD2:
+                columns = self.columns
+                nbc = token == 0xD2
+                if self.decode_rows:
+                    try:
+                        detail, pos = decode_row(mv, pos, columns, nbc)
+                    except (IndexError, struct.error):
+                        if partial:
+                            return start
+                        raise
+                    if pos > end:
+                        if partial:
+                            return start
+                        raise TdsDecodeError(f"Truncated row at offset {start}")
+                    emit(token, start, pos - start, detail, 1)
+                    continue
+                count = 0
+                row_end = start
+                try:
+                    while True:
+                        pos = _skip_row(mv, pos, columns, nbc)
+                        if pos > end:
+                            raise IndexError
+                        count += 1
+                        row_end = pos
+                        if pos >= end or mv[pos] != token:
+                            break
+                        pos += 1
+                except (IndexError, struct.error):
+                    if count:
+                        emit(token, start, row_end - start, None, count)
+                    if partial:
+                        return row_end
+                    raise TdsDecodeError(f"Truncated row at offset {row_end}")
+                emit(token, start, pos - start, None, count)
+                continue
+
+            try:
+                if token in (0xFD, 0xFE, 0xFF):
+                    # SqlClient ends BULK_LOAD with the pre-7.2 DONE (4-byte row count)
+                    if partial and end - pos < 12:
+                        return start
+                    size = 12 if end - pos >= 12 else 8
+                    if detail_on:
+                        detail = _decode_done(mv[pos:pos + size])
+                    pos += size
+                elif token == 0x81:
+                    self.columns, pos = parse_colmetadata(mv, pos)
+                    if detail_on:
+                        detail = [c.describe() for c in self.columns]
+                elif token in (0xE3, 0xAB, 0xAA, 0xAD, 0xA9, 0xA4, 0xA5, 0xED):
+                    length = _U16.unpack_from(mv, pos)[0]
+                    body = mv[pos + 2:pos + 2 + length]
+                    pos += 2 + length
+                    if detail_on:
+                        if token == 0xE3:
+                            detail = _decode_envchange(body)
+                        elif token in (0xAB, 0xAA):
+                            detail = _decode_info(body)
+                        elif token == 0xAD:
+                            detail = _decode_loginack(body)
+                elif token in (0xE4, 0xEE):
+                    pos += 4 + _U32.unpack_from(mv, pos)[0]
+                elif token == 0xAE:
+                    features = []
+                    while mv[pos] != 0xFF:
+                        features.append(mv[pos])
+                        pos += 5 + _U32.unpack_from(mv, pos + 1)[0]
+                    pos += 1
+                    if detail_on:
+                        detail = {'features': features}
+                elif token == 0x79:
+                    if detail_on:
+                        detail = _I32.unpack_from(mv, pos)[0]
+                    pos += 4
+                elif token == 0xAC:
+                    col = ColumnInfo()
+                    pos += 2
+                    col.name, pos = _b_varchar(mv, pos)
+                    pos += 1
+                    col.user_type = _U32.unpack_from(mv, pos)[0]
+                    col.flags = _U16.unpack_from(mv, pos + 4)[0]
+                    col.tds_type = mv[pos + 6]
+                    pos = parse_type_info(mv, pos + 7, col)
+                    raw, pos = _value_bytes(mv, pos, col)
+                    if detail_on:
+                        detail = {'name': col.name, 'value': convert_value(raw, col)}
+                else:
+                    # Unknown token: its length cannot be determined, so the rest
+                    # of the message is attributed to it.
+                    emit(token, start, end - start, None, 1)
+                    return end
+                if pos > end:
+                    raise IndexError
+            except (IndexError, struct.error):
+                if partial:
+                    return start
+                raise
+
+            emit(token, start, pos - start, detail, 1)
+
+        return pos
+
+
+def decode_tokens(payload, columns: Optional[List[ColumnInfo]] = None,
+                  decode_rows: bool = True) -> List[TdsToken]:
+    """Convenience wrapper: decode a token stream into a list of TdsToken"""
+    decoder = TokenStreamDecoder(decode_rows=decode_rows)
+    if columns:
+        decoder.columns = columns
+    tokens: List[TdsToken] = []
+
+    def emit(token_type, offset, length, detail, count):
+        tokens.append(TdsToken(token_type, TOKEN_NAMES.get(token_type, f'0x{token_type:02X}'),
+                               offset, length, detail if count == 1 else {'rows': count}))
+
+    decoder.decode(memoryview(payload), emit)
+    return tokens
+
+
+def describe_message(message: TdsMessage) -> Optional[Dict[str, Any]]:
+    """Summarise non-token client messages (SQL batch text, LOGIN7, PRELOGIN)"""
+    mv = message.payload
+    try:
+        if message.msg_type == 0x01:
+            headers_len = _U32.unpack_from(mv, 0)[0] if len(mv) >= 4 else 0
+            if headers_len > len(mv) or headers_len < 4:
+                headers_len = 0
+            return {'sql': bytes(mv[headers_len:]).decode('utf-16-le', errors='replace')}
+        if message.msg_type == 0x10:
+            _, tds_version, packet_size = struct.unpack_from('<III', mv, 0)
+            return {'tds_version': f'0x{tds_version:08X}', 'packet_size': packet_size}
+        if message.msg_type == 0x12:
+            options = {}
+            pos = 0
+            while mv[pos] != 0xFF:
+                option, offset, length = struct.unpack_from('>BHH', mv, pos)
+                options[PRELOGIN_OPTIONS.get(option, option)] = bytes(mv[offset:offset + length]).hex()
+                pos += 5
+            return options
+    except (struct.error, IndexError):
+        return None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Statistics
+# ---------------------------------------------------------------------------
+
+class TraceStats:
+    """
+    Aggregate packet, message and token statistics
+
+    Token time is the wall time of the message that carried the token,
+    split in proportion to the token's bytes. A message's wall time runs
+    from the previous message on the same connection to its last packet,
+    so response tokens carry server time and BULK_LOAD rows carry the
+    client's encode/send time. Text traces have no timestamps, so only
+    pcap input produces time figures.
+    """
+
+    def __init__(self):
+        self.messages = defaultdict(lambda: {'count': 0, 'packets': 0, 'bytes': 0, 'time': 0.0})
+        self.tokens = defaultdict(lambda: {'count': 0, 'bytes': 0, 'time': 0.0})
+        self.total_bytes = 0
+        self.decode_errors = 0
+        self.has_timestamps = False
+
+    def add_message(self, message: TdsMessage, elapsed: Optional[float]):
+        key = (message.direction, MSG_TYPES.get(message.msg_type, f'0x{message.msg_type:02X}'))
+        entry = self.messages[key]
+        entry['count'] += 1
+        entry['packets'] += message.packet_count
+        entry['bytes'] += message.wire_bytes
+        if elapsed is not None:
+            entry['time'] += elapsed
+            self.has_timestamps = True
+        self.total_bytes += message.wire_bytes
+
+    def token_recorder(self, direction: str, message_bytes: int, elapsed: Optional[float]):
+        """Return an emit() callback that folds tokens into these stats"""
+        tokens = self.tokens
+        per_byte = (elapsed / message_bytes) if elapsed and message_bytes else 0.0
+
+        def emit(token_type, offset, length, detail, count):
+            entry = tokens[(direction, TOKEN_NAMES.get(token_type, f'0x{token_type:02X}'))]
+            entry['count'] += count
+            entry['bytes'] += length
+            entry['time'] += length * per_byte
+
+        return emit
+
+
+def analyze(messages: Iterable[TdsMessage],
+            on_message: Optional[Callable[[TdsMessage, Any], None]] = None,
+            on_token: Optional[Callable[[TdsMessage, TdsToken], None]] = None,
+            decode_rows: bool = False) -> TraceStats:
+    """
+    Decode every message, collecting statistics
+
+    on_message(message, description) is called for every message; on_token
+    is called for every token when given (which is slower, as each token
+    becomes a TdsToken object).
+    """
+    stats = TraceStats()
+    decoders: Dict[Tuple[Any, str], TokenStreamDecoder] = {}
+    last_out_type: Dict[Any, int] = {}
+    last_timestamp: Dict[Any, float] = {}
+
+    for message in messages:
+        conn = message.connection
+        elapsed = None
+        if message.last_timestamp is not None:
+            previous = last_timestamp.get(conn, message.first_timestamp)
+            elapsed = max(0.0, message.last_timestamp - previous)
+            last_timestamp[conn] = message.last_timestamp
+        stats.add_message(message, elapsed)
+
+        is_token_stream = (message.msg_type == 0x07 or
+                           (message.msg_type == 0x04 and last_out_type.get(conn) != 0x12))
+        if message.direction == 'OUT':
+            last_out_type[conn] = message.msg_type
+
+        if on_message is not None:
+            on_message(message, None if is_token_stream else describe_message(message))
+        if not is_token_stream:
+            continue
+
+        key = (conn, message.direction)
+        decoder = decoders.get(key)
+        if decoder is None:
+            decoder = decoders[key] = TokenStreamDecoder(decode_rows=decode_rows,
+                                                         decode_details=on_token is not None)
+        record = stats.token_recorder(message.direction, message.wire_bytes, elapsed)
+        if on_token is not None:
+            def emit(token_type, offset, length, detail, count, _record=record, _message=message):
+                _record(token_type, offset, length, detail, count)
+                name = TOKEN_NAMES.get(token_type, f'0x{token_type:02X}')
+                on_token(_message, TdsToken(token_type, name, offset, length,
+                                            detail if count == 1 else {'rows': count}))
+        else:
+            emit = record
+
+        try:
+            decoder.decode(message.payload, emit)
+        except (TdsDecodeError, struct.error, IndexError, UnicodeDecodeError) as e:
+            stats.decode_errors += 1
+            if on_token is not None:
+                print(f"  !! decode error in {MSG_TYPES.get(message.msg_type)} message: {e}")
+
+    return stats
+
+
+def print_statistics(stats: TraceStats, elapsed: float):
+    """Print packet/token statistics"""
+    print("\n" + "=" * 80)
+    print("TDS Trace Statistics")
+    print("=" * 80)
+
+    time_header = f" {'Time (ms)':>12}" if stats.has_timestamps else ''
+    print(f"\n{'Dir':<4} {'Message':<22} {'Count':>10} {'Packets':>10} {'Bytes':>14}{time_header}")
+    print("-" * 80)
+    for (direction, name), entry in sorted(stats.messages.items()):
+        line = f"{direction:<4} {name:<22} {entry['count']:>10,} {entry['packets']:>10,} {entry['bytes']:>14,}"
+        if stats.has_timestamps:
+            line += f" {entry['time'] * 1000:>12.3f}"
+        print(line)
+
+    print(f"\n{'Dir':<4} {'Token':<22} {'Count':>10} {'Bytes':>14} {'Avg Bytes':>10}{time_header}")
+    print("-" * 80)
+    for (direction, name), entry in sorted(stats.tokens.items(), key=lambda kv: -kv[1]['bytes']):
+        avg = entry['bytes'] / entry['count'] if entry['count'] else 0
+        line = f"{direction:<4} {name:<22} {entry['count']:>10,} {entry['bytes']:>14,} {avg:>10.1f}"
+        if stats.has_timestamps:
+            line += f" {entry['time'] * 1000:>12.3f}"
+        print(line)
+
+    mb = stats.total_bytes / (1024 * 1024)
+    print("\n" + "-" * 80)
+    print(f"  Wire Bytes:      {stats.total_bytes:,}")
+    print(f"  Decode Time:     {elapsed:.3f}s")
+    print(f"  Decode Rate:     {mb / elapsed if elapsed > 0 else 0:.1f} MB/s")
+    print(f"  Decode Errors:   {stats.decode_errors}")
+    print("=" * 80)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Decode SqlClient TDS traces and pcap captures into packets and tokens',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Summarise the GUID bulk copy trace
+  python tds_trace.py ../../dotnet/bcp/dotnet_guid_trace.txt
+
+  # List every message and token, decoding row values
+  python tds_trace.py ../../dotnet/bcp/dotnet_guid_trace.txt --tokens --rows
+
+  # Decode a Wireshark capture of a non-default port
+  python tds_trace.py capture.pcapng --port 14333
+        """
+    )
+    parser.add_argument('path', help='SqlClient trace (.txt) or pcap/pcapng capture')
+    parser.add_argument('--port', type=int, default=1433,
+                        help='SQL Server TCP port for pcap input (default: 1433)')
+    parser.add_argument('--messages', action='store_true', help='List every message')
+    parser.add_argument('--tokens', action='store_true', help='List every token (implies --messages)')
+    parser.add_argument('--rows', action='store_true', help='Decode ROW/NBCROW values (with --tokens)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Error: {args.path} not found")
+        return 1
+
+    on_message = None
+    on_token = None
+    if args.messages or args.tokens:
+        def on_message(message, description):
+            name = MSG_TYPES.get(message.msg_type, f'0x{message.msg_type:02X}')
+            print(f"[{message.direction:<3}] {name:<16} packets={message.packet_count} "
+                  f"bytes={message.wire_bytes}")
+            if description:
+                for key, value in description.items():
+                    text = str(value)
+                    print(f"        {key}: {text[:200]}{'...' if len(text) > 200 else ''}")
+    if args.tokens:
+        def on_token(message, token):
+            print(f"        {token.name:<14} @{token.offset:<6} len={token.length:<6} "
+                  f"{token.detail if token.detail is not None else ''}")
+
+    start = time.perf_counter()
+    try:
+        stats = analyze(iter_messages(args.path, args.port), on_message, on_token,
+                        decode_rows=args.rows)
+    except TdsDecodeError as e:
+        print(f"Error: {e}")
+        return 1
+    print_statistics(stats, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,646 @@
+#!/usr/bin/env python3
+"""
+Type Coercion - Column-wise value conversion following SqlClient's rules
+
+dotnet/bcp/TYPE_CONVERSION_MATRIX.md documents what SqlBulkCopy accepts for
+each SQL Server column type. This module applies the same rules to Python
+columns before they reach bulk_encoder.py. Checking each value's type and
+branching per value is what makes naive coercion slow, so a converter is
+compiled once per column from (source Python type, target SQL type) and
+then applied to the whole column:
+
+- Already-correct columns are passed through. An array.array (or NumPy
+  array) whose typecode matches the target is returned untouched.
+- Integer and float targets are packed with array.array, which does the
+  conversion and the range check in C; the offending row is only searched
+  for once the packing has failed.
+- Other conversions run as a single map() over the column with the
+  per-value parse function chosen at compile time.
+
+Conversions the matrix lists as not supported (string to BIT, string to
+UNIQUEIDENTIFIER, string to BINARY/VARBINARY, anything to TIMESTAMP) fail
+when the converter is compiled, not at the first row.
+
+Usage:
+    python type_coercion.py --matrix
+    python type_coercion.py --benchmark --values 200000
+"""
+
+import re
+import sys
+import json
+import time
+import uuid
+import argparse
+from array import array
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from datetime import datetime, date, time as dtime, timedelta
+from xml.etree import ElementTree
+from typing import Optional, List, Dict, Any, Callable, Sequence, Tuple
+
+from bulk_encoder import BulkColumn, BulkEncodeError
+
+
+# sql type -> (min, max, array typecode)
+INT_TARGETS = {
+    'tinyint': (0, 255, 'B'),
+    'smallint': (-32768, 32767, 'h'),
+    'int': (-2147483648, 2147483647, 'i'),
+    'bigint': (-9223372036854775808, 9223372036854775807, 'q'),
+}
+FLOAT_TARGETS = {'real': 'f', 'float': 'd'}
+MONEY_TARGETS = {
+    'money': (Decimal('-922337203685477.5808'), Decimal('922337203685477.5807')),
+    'smallmoney': (Decimal('-214748.3648'), Decimal('214748.3647')),
+}
+DATETIME_TARGETS = {
+    'datetime': (datetime(1753, 1, 1), datetime(9999, 12, 31, 23, 59, 59, 997000)),
+    'smalldatetime': (datetime(1900, 1, 1), datetime(2079, 6, 6, 23, 59)),
+    'datetime2': (datetime.min, datetime.max),
+}
+STRING_TARGETS = {'nvarchar', 'varchar', 'nchar', 'char', 'ntext', 'text'}
+BINARY_TARGETS = {'varbinary', 'binary', 'image'}
+
+# Target group for each SQL type; rules are keyed by (source type, group)
+TARGET_GROUPS: Dict[str, str] = {}
+TARGET_GROUPS.update({t: 'integer' for t in INT_TARGETS})
+TARGET_GROUPS.update({t: 'float' for t in FLOAT_TARGETS})
+TARGET_GROUPS.update({t: 'money' for t in MONEY_TARGETS})
+TARGET_GROUPS.update({t: 'datetime' for t in DATETIME_TARGETS})
+TARGET_GROUPS.update({t: 'string' for t in STRING_TARGETS})
+TARGET_GROUPS.update({t: 'binary' for t in BINARY_TARGETS})
+TARGET_GROUPS.update({
+    'bit': 'bit', 'decimal': 'decimal', 'numeric': 'decimal', 'date': 'date', 'time': 'time',
+    'datetimeoffset': 'datetimeoffset', 'uniqueidentifier': 'uniqueidentifier',
+    'xml': 'xml', 'json': 'json', 'timestamp': 'timestamp', 'rowversion': 'timestamp',
+})
+
+# The "NOT Supported Conversions" table of the matrix
+UNSUPPORTED = {
+    (str, 'bit'): "String 'true'/'false' or '0'/'1' is not convertible to BIT; send bool or int",
+    (str, 'uniqueidentifier'): "String GUID is not convertible (Guid is not IConvertible); send uuid.UUID",
+    (str, 'binary'): "String cannot convert to byte[]; send bytes",
+}
+
+_INT_CODES = set('bBhHiIlLqQ')
+_FLOAT_CODES = set('fd')
+
+
+class CoercionError(BulkEncodeError):
+    """Raised when a column cannot be converted to its SQL type"""
+
+
+# ---------------------------------------------------------------------------
+# Per-value parse functions (only used where no bulk path exists)
+# ---------------------------------------------------------------------------
+
+_FRACTION = re.compile(r'(\.\d{6})\d+')
+_SPACED_OFFSET = re.compile(r'\s+([+-]\d\d:?\d\d)$')
+
+
+def _normalize_iso(text: str) -> str:
+    """Trim 7-digit fractions, drop the space before an offset, Z -> +00:00 (Python < 3.11)"""
+    text = _FRACTION.sub(r'\1', text.strip())
+    text = _SPACED_OFFSET.sub(r'\1', text)
+    return text[:-1] + '+00:00' if text.endswith('Z') else text
+
+
+def _parse_datetime(text: str) -> datetime:
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return datetime.fromisoformat(_normalize_iso(text))
+
+
+def _parse_date(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return _parse_datetime(text).date()
+
+
+def _parse_time(text: str) -> dtime:
+    try:
+        return dtime.fromisoformat(text)
+    except ValueError:
+        return dtime.fromisoformat(_normalize_iso(text))
+
+
+def _parse_datetimeoffset(text: str) -> datetime:
+    value = _parse_datetime(text)
+    return value if value.tzinfo is not None else value.astimezone()
+
+
+def _with_offset(value: datetime) -> datetime:
+    """DateTime -> DateTimeOffset adds the local offset"""
+    return value if value.tzinfo is not None else value.astimezone()
+
+
+def _timedelta_to_time(value: timedelta) -> dtime:
+    if not timedelta(0) <= value < timedelta(days=1):
+        raise OverflowError("TimeSpan outside 00:00:00 - 23:59:59.9999999")
+    return (datetime.min + value).time()
+
+
+def _parse_currency(text: str) -> Decimal:
+    """decimal.Parse(NumberStyles.Currency): symbol, thousands separators, (negative)"""
+    if '$' not in text and ',' not in text and '(' not in text:
+        return Decimal(text)
+    cleaned = text.strip()
+    negative = cleaned.startswith('(') and cleaned.endswith(')')
+    if negative:
+        cleaned = cleaned[1:-1]
+    cleaned = cleaned.replace('$', '').replace(',', '').replace(' ', '')
+    value = Decimal(cleaned)
+    return -value if negative else value
+
+
+def _float_to_decimal(value: float) -> Decimal:
+    # Convert.ToDecimal(double) keeps the shortest round-trip digits, not the binary expansion
+    return Decimal(repr(value))
+
+
+def _validate_xml(text: str) -> str:
+    ElementTree.fromstring(text)
+    return text
+
+
+def _validate_json(text: str) -> str:
+    json.loads(text)
+    return text
+
+
+# (source type, target group) -> per-value function, or None when values pass through
+_RULES: Dict[Tuple[type, str], Optional[Callable[[Any], Any]]] = {
+    (int, 'integer'): None,
+    (bool, 'integer'): int,
+    (float, 'integer'): round,          # Convert.ToInt32(double) rounds half to even
+    (Decimal, 'integer'): round,
+    (str, 'integer'): int,
+
+    (float, 'float'): None,
+    (int, 'float'): None,
+    (bool, 'float'): float,
+    (Decimal, 'float'): float,
+    (str, 'float'): float,
+
+    (bool, 'bit'): None,
+    (int, 'bit'): bool,
+    (float, 'bit'): bool,
+    (Decimal, 'bit'): bool,
+
+    (Decimal, 'decimal'): None,
+    (int, 'decimal'): Decimal,
+    (float, 'decimal'): _float_to_decimal,
+    (str, 'decimal'): Decimal,
+
+    (Decimal, 'money'): None,
+    (int, 'money'): Decimal,
+    (float, 'money'): _float_to_decimal,
+    (str, 'money'): _parse_currency,
+
+    (datetime, 'datetime'): None,
+    (date, 'datetime'): lambda d: datetime(d.year, d.month, d.day),
+    (str, 'datetime'): _parse_datetime,
+
+    (date, 'date'): None,
+    (datetime, 'date'): datetime.date,
+    (str, 'date'): _parse_date,
+
+    (dtime, 'time'): None,
+    (timedelta, 'time'): _timedelta_to_time,
+    (str, 'time'): _parse_time,
+
+    (datetime, 'datetimeoffset'): _with_offset,
+    (str, 'datetimeoffset'): _parse_datetimeoffset,
+
+    (uuid.UUID, 'uniqueidentifier'): None,
+
+    (str, 'string'): None,
+    (list, 'string'): ''.join,          # char[] -> new string(char[])
+    (int, 'string'): str,
+    (float, 'string'): repr,
+    (Decimal, 'string'): str,
+    (bool, 'string'): str,
+    (datetime, 'string'): str,
+    (date, 'string'): str,
+    (uuid.UUID, 'string'): str,
+
+    (bytes, 'binary'): None,
+    (bytearray, 'binary'): bytes,
+    (memoryview, 'binary'): bytes,
+
+    (str, 'xml'): _validate_xml,
+    (str, 'json'): _validate_json,
+}
+
+
+def source_type_of(values) -> type:
+    """Python type a column holds: array/buffer format, else the first non-NULL value"""
+    if isinstance(values, array):
+        return int if values.typecode in _INT_CODES else float
+    if not isinstance(values, (list, tuple)):
+        try:
+            fmt = memoryview(values).format
+        except TypeError:
+            pass
+        else:
+            return int if fmt[-1:] in _INT_CODES else float
+    for value in values:
+        if value is not None:
+            return type(value)
+    return type(None)
+
+
+def _buffer_format(values) -> Optional[str]:
+    if isinstance(values, array):
+        return values.typecode
+    if isinstance(values, (list, tuple)):
+        return None
+    try:
+        return memoryview(values).format
+    except TypeError:
+        return None
+
+
+def _has_null(values) -> bool:
+    if _buffer_format(values) is not None:
+        return False
+    return None in values
+
+
+def _non_null(values) -> List[Any]:
+    return [v for v in values if v is not None]
+
+
+class ColumnConverter:
+    """
+    Converter compiled for one column
+
+    Calling it with a column (list, tuple, array.array or buffer) returns the
+    converted column: array.array for NOT NULL integer/float targets, a list
+    otherwise. NULLs (None) pass through.
+
+    Args:
+        sql_type: Target SQL type name
+        source_type: Python type the column holds
+        name: Column name for error messages
+        ordinal: 1-based column number for error messages
+        length: Fixed length for char/nchar/binary padding
+        precision: Decimal precision (default 18)
+        scale: Decimal scale; values are rounded half up to it when given
+    """
+
+    __slots__ = ('sql_type', 'source_type', 'name', 'ordinal', 'length', 'precision', 'scale',
+                 'parse', 'path', '_finish')
+
+    def __init__(self, sql_type: str, source_type: type, name: str = '', ordinal: int = 1,
+                 length: Optional[int] = None, precision: int = 18, scale: Optional[int] = None):
+        self.sql_type = sql_type.lower()
+        self.source_type = source_type
+        self.name = name
+        self.ordinal = ordinal
+        self.length = length
+        self.precision = precision
+        self.scale = scale
+
+        group = TARGET_GROUPS.get(self.sql_type)
+        if group is None:
+            raise CoercionError(f"Column {ordinal} [{name}]: unknown SQL type {sql_type}")
+        if group == 'timestamp':
+            raise CoercionError(f"Column {ordinal} [{name}]: TIMESTAMP is read-only and cannot be inserted")
+
+        if source_type is type(None):
+            parse = None
+        else:
+            for cls in source_type.__mro__:
+                if (cls, group) in UNSUPPORTED:
+                    raise CoercionError(f"Column {ordinal} [{name}]: {UNSUPPORTED[(cls, group)]}")
+                if (cls, group) in _RULES:
+                    parse = _RULES[(cls, group)]
+                    break
+            else:
+                raise CoercionError(f"Column {ordinal} [{name}]: no conversion from "
+                                    f"{source_type.__name__} to {self.sql_type}")
+        self.parse = parse
+        self._finish = getattr(self, f'_finish_{group}', None)
+        self.path = 'identity' if parse is None else 'map'
+        if group in ('integer', 'float'):
+            self.path = 'identity/array' if parse is None else 'map+array'
+        elif group in ('decimal', 'money', 'datetime'):
+            self.path += '+range'
+        elif (self.sql_type in ('nchar', 'char', 'binary')) and length:
+            self.path += '+pad'
+
+    def __repr__(self):
+        return (f"ColumnConverter({self.source_type.__name__} -> {self.sql_type}, "
+                f"column {self.ordinal} [{self.name}], path={self.path})")
+
+    def _error(self, value: Any, row: int, cause: Optional[BaseException] = None) -> CoercionError:
+        error = CoercionError(
+            f"The given value '{value}' of type {type(value).__name__} from the data source cannot be "
+            f"converted to type {self.sql_type} for Column {self.ordinal} [{self.name}] Row {row}")
+        error.__cause__ = cause
+        return error
+
+    def _locate(self, values, check: Callable[[Any], bool], cause: BaseException,
+                source=None) -> CoercionError:
+        """
+        Find the first value failing check; only runs once conversion already failed
+
+        The error names the row's value in source (what the caller passed) when values
+        are the parsed ones.
+        """
+        for row, (value, original) in enumerate(zip(values, values if source is None else source), 1):
+            if value is not None and not check(value):
+                return self._error(original, row, cause)
+        return CoercionError(f"Column {self.ordinal} [{self.name}]: {cause}")
+
+    def __call__(self, values) -> Sequence[Any]:
+        has_null = _has_null(values)
+        parse = self.parse
+        if parse is not None:
+            try:
+                if has_null:
+                    out = [None if v is None else parse(v) for v in values]
+                else:
+                    out = list(map(parse, values))
+            except (ValueError, ArithmeticError, TypeError, ElementTree.ParseError) as e:
+                def check(v):
+                    try:
+                        parse(v)
+                        return True
+                    except (ValueError, ArithmeticError, TypeError, ElementTree.ParseError):
+                        return False
+                raise self._locate(values, check, e)
+        else:
+            out = values
+        if self._finish is not None:
+            out = self._finish(out, has_null, values)
+        return out
+
+    def _pack(self, values, has_null: bool, typecode: str, check: Callable[[Any], bool], source):
+        """array.array conversion with C-level type and range checks"""
+        if has_null:
+            try:
+                array(typecode, _non_null(values))
+            except (OverflowError, TypeError) as e:
+                raise self._locate(values, check, e, source)
+            return values if isinstance(values, list) else list(values)
+        fmt = _buffer_format(values)
+        if fmt is not None and fmt[-1:] == typecode and (fmt == typecode or len(fmt) == 2):
+            return values
+        try:
+            return array(typecode, values)
+        except (OverflowError, TypeError) as e:
+            raise self._locate(values, check, e, source)
+
+    def _finish_integer(self, values, has_null: bool, source):
+        low, high, typecode = INT_TARGETS[self.sql_type]
+        return self._pack(values, has_null, typecode,
+                          lambda v: isinstance(v, int) and low <= v <= high, source)
+
+    def _finish_float(self, values, has_null: bool, source):
+        return self._pack(values, has_null, FLOAT_TARGETS[self.sql_type],
+                          lambda v: isinstance(v, (int, float)), source)
+
+    def _finish_decimal(self, values, has_null: bool, source):
+        # NaN and Infinity (parsed from 'NaN', '1e400' or a float) raise InvalidOperation in
+        # quantize() or the comparisons; only then is the offending row looked for
+        limit = Decimal(10) ** (self.precision - (self.scale or 0))
+        in_range = lambda v: v.is_finite() and abs(v) < limit
+        if self.scale is not None:
+            quantum = Decimal(1).scaleb(-self.scale)
+            try:
+                values = [None if v is None else v.quantize(quantum, ROUND_HALF_UP) for v in values]
+            except InvalidOperation as e:
+                raise self._locate(values, in_range, e, source)
+        present = _non_null(values) if has_null else values
+        try:
+            overflow = bool(present) and max(map(abs, present)) >= limit
+        except InvalidOperation as e:
+            raise self._locate(values, in_range, e, source)
+        if overflow:
+            raise self._locate(values, in_range,
+                               OverflowError(f"value exceeds decimal({self.precision},{self.scale or 0})"),
+                               source)
+        return values
+
+    def _finish_money(self, values, has_null: bool, source):
+        low, high = MONEY_TARGETS[self.sql_type]
+        in_range = lambda v: v.is_finite() and low <= v <= high
+        present = _non_null(values) if has_null else values
+        try:
+            overflow = bool(present) and (min(present) < low or max(present) > high)
+        except InvalidOperation as e:
+            raise self._locate(values, in_range, e, source)
+        if overflow:
+            raise self._locate(values, in_range,
+                               OverflowError(f"value outside the {self.sql_type} range"), source)
+        return values
+
+    def _finish_datetime(self, values, has_null: bool, source):
+        low, high = DATETIME_TARGETS[self.sql_type]
+        # The target has no offset: timezone-aware values are refused (datetimeoffset keeps them)
+        in_range = lambda v: v.tzinfo is None and low <= v <= high
+        present = _non_null(values) if has_null else values
+        try:
+            overflow = bool(present) and (min(present) < low or max(present) > high)
+        except TypeError as e:
+            raise self._locate(values, in_range, e, source)
+        if overflow:
+            raise self._locate(values, in_range,
+                               OverflowError(f"value outside the {self.sql_type} range"), source)
+        return values
+
+    def _finish_string(self, values, has_null: bool, source):
+        if self.sql_type in ('nchar', 'char') and self.length:
+            width = self.length
+            return [None if v is None else v.ljust(width) for v in values]
+        return values
+
+    def _finish_binary(self, values, has_null: bool, source):
+        if self.sql_type == 'binary' and self.length:
+            width = self.length
+            return [None if v is None else v.ljust(width, b'\x00') for v in values]
+        return values
+
+
+def compile_converter(sql_type: str, source_type: type, **kwargs) -> ColumnConverter:
+    """Compile a converter for (source type, target SQL type); see ColumnConverter for kwargs"""
+    return ColumnConverter(sql_type, source_type, **kwargs)
+
+
+def compile_converters(columns: Sequence[BulkColumn], column_data: Sequence[Sequence[Any]],
+                       converters: Optional[List[ColumnConverter]] = None) -> List[ColumnConverter]:
+    """
+    One converter per bulk column, with source types taken from the data
+
+    Converters from an earlier chunk are reused, except those compiled for a
+    column that was all NULL there: they are compiled again once it has values.
+    """
+    compiled = []
+    for i, (col, values) in enumerate(zip(columns, column_data), 1):
+        converter = converters[i - 1] if converters is not None else None
+        if converter is None or converter.source_type is type(None):
+            source_type = source_type_of(values)
+            if converter is None or source_type is not type(None):
+                converter = ColumnConverter(col.sql_type, source_type, name=col.name, ordinal=i,
+                                            length=col.length)
+        compiled.append(converter)
+    return compiled
+
+
+def coerce_columns(columns: Sequence[BulkColumn], column_data: Sequence[Sequence[Any]],
+                   converters: Optional[List[ColumnConverter]] = None) -> List[Sequence[Any]]:
+    """
+    Convert column-major data to what BulkLoadEncoder expects for each column
+
+    Pass the converters from an earlier call to skip compiling them again
+    when loading several chunks with the same shape.
+    """
+    converters = compile_converters(columns, column_data, converters)
+    return [convert(values) for convert, values in zip(converters, column_data)]
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+_BASE_DT = datetime(2024, 1, 15, 14, 30)
+
+# (source label, value generator, target sql type, converter kwargs)
+BENCHMARK_CASES = [
+    ('int', lambda i: i % 256, 'tinyint', {}),
+    ('int', lambda i: i % 32768, 'smallint', {}),
+    ('int', lambda i: i, 'int', {}),
+    ('array(i)', None, 'int', {}),
+    ('int', lambda i: i, 'bigint', {}),
+    ('str', lambda i: str(i % 256), 'tinyint', {}),
+    ('str', lambda i: str(i), 'int', {}),
+    ('str', lambda i: str(i * 1000003), 'bigint', {}),
+    ('float', lambda i: i + 0.5, 'int', {}),
+    ('float', lambda i: i * 1.5, 'float', {}),
+    ('str', lambda i: f'{i}.14', 'real', {}),
+    ('str', lambda i: f'{i}.14159265359', 'float', {}),
+    ('str', lambda i: f'{i}.1234', 'decimal', {'precision': 18, 'scale': 4}),
+    ('float', lambda i: i * 1.5, 'decimal', {'precision': 18, 'scale': 4}),
+    ('str', lambda i: f'${i:,}.56', 'money', {}),
+    ('str', lambda i: f'{i % 100000}.45', 'smallmoney', {}),
+    ('str', lambda i: f'2024-01-15 14:{i % 60:02d}:00', 'datetime', {}),
+    ('str', lambda i: f'2024-01-15 14:{i % 60:02d}', 'smalldatetime', {}),
+    ('str', lambda i: f'2024-01-15 14:30:00.{i % 10000000:07d}', 'datetime2', {}),
+    ('date', lambda i: date(2024, 1, 1 + i % 28), 'datetime', {}),
+    ('str', lambda i: f'2024-01-{1 + i % 28:02d}', 'date', {}),
+    ('datetime', lambda i: _BASE_DT + timedelta(seconds=i), 'date', {}),
+    ('str', lambda i: f'14:30:{i % 60:02d}.1234567', 'time', {}),
+    ('timedelta', lambda i: timedelta(seconds=i % 86400), 'time', {}),
+    ('str', lambda i: f'2024-01-15 14:30:00.1234567 -08:00', 'datetimeoffset', {}),
+    ('datetime', lambda i: _BASE_DT + timedelta(seconds=i), 'datetimeoffset', {}),
+    ('bool', lambda i: i % 2 == 0, 'bit', {}),
+    ('int', lambda i: i % 2, 'bit', {}),
+    ('str', lambda i: f'Record_{i:06d}', 'nvarchar', {}),
+    ('int', lambda i: i, 'nvarchar', {}),
+    ('str', lambda i: 'abc', 'nchar', {'length': 10}),
+    ('char[]', lambda i: ['a', 'b', 'c'], 'nvarchar', {}),
+    ('bytes', lambda i: i.to_bytes(4, 'little'), 'varbinary', {}),
+    ('bytearray', lambda i: bytearray(i.to_bytes(4, 'little')), 'varbinary', {}),
+    ('UUID', lambda i: uuid.UUID(int=i), 'uniqueidentifier', {}),
+    ('str', lambda i: f'<root>{i}</root>', 'xml', {}),
+    ('str', lambda i: f'{{"key": {i}}}', 'json', {}),
+    ('str', lambda i: 'true', 'bit', {}),
+    ('str', lambda i: str(uuid.UUID(int=i)), 'uniqueidentifier', {}),
+    ('str', lambda i: 'abc', 'varbinary', {}),
+]
+
+
+def print_matrix():
+    """Supported (source, target) pairs, grouped by target"""
+    print("=" * 80)
+    print("Supported Conversions")
+    print("=" * 80)
+    by_group: Dict[str, List[str]] = {}
+    for (source, group), parse in _RULES.items():
+        by_group.setdefault(group, []).append(source.__name__ + ('' if parse else ' (passthrough)'))
+    for sql_type, group in sorted(TARGET_GROUPS.items(), key=lambda item: (item[1], item[0])):
+        sources = ', '.join(by_group.get(group, [])) or '-'
+        print(f"  {sql_type:<18} <- {sources}")
+    print("\nNot supported (SqlBulkCopy rejects them too):")
+    for (source, group), reason in UNSUPPORTED.items():
+        print(f"  {source.__name__} -> {group}: {reason}")
+    print("  any -> timestamp: read-only, auto-generated")
+    print("=" * 80)
+
+
+def run_benchmark(count: int, null_fraction: float):
+    """Time each matrix row over count values; report seconds per million"""
+    print("=" * 80)
+    print(f"Type Coercion Benchmark - {count:,} values per case, {null_fraction:.0%} NULL")
+    print("=" * 80)
+    print(f"{'Source':<10} {'Target':<16} {'Path':<15} {'s / 1M values':>14} {'ns / value':>11}")
+    print("-" * 80)
+    null_every = int(1 / null_fraction) if null_fraction > 0 else 0
+    for label, make, sql_type, kwargs in BENCHMARK_CASES:
+        if make is None:
+            values = array('i', range(count))
+        else:
+            values = [make(i) for i in range(count)]
+            if null_every:
+                values[::null_every] = [None] * len(values[::null_every])
+        try:
+            converter = compile_converter(sql_type, source_type_of(values), name='col', **kwargs)
+        except CoercionError:
+            print(f"{label:<10} {sql_type:<16} {'not supported':<15} {'-':>14} {'-':>11}")
+            continue
+        start = time.perf_counter()
+        converter(values)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} {sql_type:<16} {converter.path:<15} {elapsed * 1_000_000 / count:>14.3f} "
+              f"{elapsed * 1e9 / count:>11.1f}")
+    print("=" * 80)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Column-wise type coercion following TYPE_CONVERSION_MATRIX.md',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Which Python types convert to which SQL types
+  python type_coercion.py --matrix
+
+  # Coercion cost per million values for each row of the matrix
+  python type_coercion.py --benchmark --values 200000
+
+  # Same, with every 10th value NULL
+  python type_coercion.py --benchmark --null-fraction 0.1
+        """
+    )
+    parser.add_argument('--matrix', action='store_true', help='Print the supported conversions')
+    parser.add_argument('--benchmark', action='store_true', help='Run the coercion benchmark')
+    parser.add_argument('--values', type=int, default=200_000,
+                        help='Values per benchmark case (default: 200000); results are scaled per million')
+    parser.add_argument('--null-fraction', type=float, default=0.0,
+                        help='Fraction of NULL values in benchmark columns (default: 0)')
+    args = parser.parse_args()
+
+    if not args.matrix and not args.benchmark:
+        parser.print_help()
+        return 1
+    if args.values < 1:
+        print("Error: Number of values must be positive")
+        return 1
+    if not 0 <= args.null_fraction < 1:
+        print("Error: --null-fraction must be in [0, 1)")
+        return 1
+
+    if args.matrix:
+        print_matrix()
+    if args.benchmark:
+        run_benchmark(args.values, args.null_fraction)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Connection pool with pre-warming for the FastAPI service
+
+Each enabled driver gets a ConnectionPool that keeps up to `size` idle
+connections for reuse. warm() opens them in parallel at startup, so the
+first burst of requests after a deploy does not pay a login each; with
+size 0 every request connects and disconnects, as the service did before.
+Connections that raised are closed instead of being returned.
+
+Drivers are imported with import_driver() only when they are enabled,
+and the import time is measured for the startup report.
+
+InFlightQuery lets the event loop cancel a query that runs in a worker
+thread, when its deadline passes or its client disconnects.
+"""
+
+import math
+import time
+import importlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def import_driver(module_name):
+    """Import a driver module; returns (module, seconds the import took)"""
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    return module, time.perf_counter() - started
+
+
+class ConnectionPool:
+    """Idle connections of one driver, reused LIFO; thread-safe"""
+
+    def __init__(self, name, connect, connection_string, size=0):
+        self.name = name
+        self.connect = connect
+        self.connection_string = connection_string
+        self.size = size
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.opened = 0      # connections opened (warm-up included)
+        self.reused = 0      # acquires served from the idle connections
+        self.discarded = 0   # connections closed after an error
+
+    def warm(self, parallel=None):
+        """
+        Open `size` connections in parallel and keep them idle
+        
+        Args:
+            parallel: Connections opened at the same time (default: all of them)
+        
+        Returns:
+            dict with opened, failed, seconds and the first error, if any
+        """
+        started = time.perf_counter()
+        if self.size <= 0:
+            return {"opened": 0, "failed": 0, "seconds": 0.0, "error": None}
+        
+        def open_one(_):
+            conn = self.connect(self.connection_string)
+            with self._lock:
+                self.opened += 1
+                self._idle.append(conn)
+        
+        opened = failed = 0
+        error = None
+        with ThreadPoolExecutor(max_workers=parallel or self.size,
+                                thread_name_prefix=f"warm-{self.name}") as executor:
+            futures = [executor.submit(open_one, n) for n in range(self.size)]
+            for future in futures:
+                try:
+                    future.result()
+                    opened += 1
+                except Exception as e:
+                    failed += 1
+                    error = error or f"{type(e).__name__}: {e}"
+        return {"opened": opened, "failed": failed, "seconds": time.perf_counter() - started, "error": error}
+
+    def acquire(self):
+        """An idle connection, or a new one when none is idle"""
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+        conn = self.connect(self.connection_string)
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def release(self, conn, healthy=True):
+        """Keep the connection for reuse if it is healthy and the pool has room, else close it"""
+        with self._lock:
+            if healthy and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            if not healthy:
+                self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close the idle connections (at shutdown)"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "opened": self.opened,
+                "reused": self.reused,
+                "discarded": self.discarded
+            }
+
+
+class InFlightQuery:
+    """
+    The cursor of a query running in a worker thread, so the event loop can cancel it
+    
+    cancel() records why and calls the driver's cursor.cancel() (SQLCancel
+    in pyodbc) where there is one. The query's connection is then closed
+    instead of going back to the pool, since its state is unknown.
+    """
+
+    def __init__(self):
+        self.cursor = None
+        self.reason = None   # "deadline" or "disconnected" once cancelled
+
+    def cancel(self, reason):
+        if self.reason is None:
+            self.reason = reason
+        cursor = self.cursor
+        if cursor is not None and hasattr(cursor, "cancel"):
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+
+class QueryCancelled(Exception):
+    """The query was cancelled for its deadline or because the client disconnected"""
+
+    def __init__(self, reason):
+        super().__init__(f"query cancelled ({reason})")
+        self.reason = reason
+
+
+def set_query_timeout(conn, seconds):
+    """Make the rest of the request's time the driver's query timeout, where it has one (Connection.timeout)"""
+    if hasattr(conn, "timeout"):
+        conn.timeout = max(1, math.ceil(seconds))
@@ -7,19 +7,59 @@ This service provides two GET endpoints:
 - /query/pyodbc - Uses PyODBC library
 
 Both endpoints execute a simple SELECT 1 query and return the result.
+Errors are classified by SQLSTATE/error number (../standalone/error_policy.py);
+transient ones are retried when QUERY_RETRIES is set, and /stats/errors
+reports the per-class counters.
+
+At startup only the drivers listed in DRIVERS are imported, POOL_SIZE
+connections per driver are opened in parallel (db_pool.py), and the
+import, pool warm-up and ready times are printed and served at
+/stats/startup.
+
+Queries run in a worker thread with a per-request deadline (REQUEST_TIMEOUT,
+or a shorter X-Request-Timeout header). When it passes or the client
+disconnects, the query is cancelled through the driver and its connection
+is discarded instead of being returned to the pool.
+
+Each driver's queries are spread over the TARGETS servers (e.g. read
+replicas), with a pool per server (routing.py). A Router sends each
+attempt to the server with the fewest queries in flight, or the lowest
+latency x load, ejects servers that keep failing or are much slower than
+the others for a while, and counts requests and latency per server.
+
+Rows are returned as one JSON object per row, or with ?format=columnar
+(RESULT_FORMAT sets the default) as one array per column, read from the
+cursor into a ColumnarResult (../standalone/columnar.py) in batches.
+
+`python main.py` starts WORKERS uvicorn worker processes (default: one per
+CPU), each with its own pools and counters. The workers share them through
+snapshot files (metrics_store.py), so /metrics and /health report the
+whole service.
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
 import time
+MODULE_IMPORT_STARTED = time.perf_counter()   # start of the startup report
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager, suppress
+import os
+import sys
+import random
+import asyncio
 from datetime import datetime
 import traceback
 
-# Import database libraries
-import mssql_python
-import pyodbc
+# Error classification and retry policy shared with the standalone runners
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'standalone'))
+from error_policy import RetryPolicy, ErrorStats, classify
+from latency_histogram import LatencyHistogram
+from columnar import ColumnarResult
+import metrics_store
 
-app = FastAPI(title="SQL Server Threading Test API")
+# Database libraries are imported at startup, and only when enabled
+from db_pool import ConnectionPool, InFlightQuery, QueryCancelled, import_driver, set_query_timeout
+from routing import Router, Target, server_of, with_server
 
 # Connection string configuration
 CONNECTION_STRING_MSSQL = "Server=10.0.14.177,1433;Database=master;UID=sa;PWD=TestPass;TrustServerCertificate=yes;"
@@ -28,6 +68,180 @@ CONNECTION_STRING_PYODBC = "DRIVER={ODBC Driver 18 for SQL Server};SERVER=10.0.1
 # Query to execute
 QUERY = "SELECT 1 as num, 'test' as str, GETDATE() as dt"
 
+# "rows" (an object per row) or "columnar" (an array per column); ?format= overrides it per request
+RESULT_FORMATS = ("rows", "columnar")
+RESULT_FORMAT = os.environ.get("RESULT_FORMAT", "rows")
+
+# Driver module and connection string per library; DRIVERS selects the enabled ones
+DRIVERS = {
+    "mssql-python": {"module": "mssql_python", "connection_string": CONNECTION_STRING_MSSQL},
+    "pyodbc": {"module": "pyodbc", "connection_string": CONNECTION_STRING_PYODBC}
+}
+ENABLED_DRIVERS = [name.strip() for name in os.environ.get("DRIVERS", ",".join(DRIVERS)).split(",") if name.strip()]
+
+# Connections opened per driver at startup and kept for reuse; 0 connects per request
+POOL_SIZE = int(os.environ.get("POOL_SIZE", "0"))
+POOL_WARM_PARALLEL = int(os.environ.get("POOL_WARM_PARALLEL", "0")) or None
+POOL_WARM_TIMEOUT = float(os.environ.get("POOL_WARM_TIMEOUT", "30"))
+
+# Servers each driver's queries are spread over, whitespace-separated ("host,port" or "host");
+# default: the server of its connection string
+TARGETS = os.environ.get("TARGETS", "").split()
+# "least-outstanding" or "latency"; passive ejection of failing or slow targets for EJECT_SECONDS
+ROUTING_POLICY = os.environ.get("ROUTING_POLICY", "least-outstanding")
+EJECT_FAILURES = int(os.environ.get("EJECT_FAILURES", "5"))
+EJECT_SLOW_FACTOR = float(os.environ.get("EJECT_SLOW_FACTOR", "3"))
+EJECT_SECONDS = float(os.environ.get("EJECT_SECONDS", "10"))
+MAX_EJECTED = float(os.environ.get("MAX_EJECTED", "0.5"))
+
+# Filled by the lifespan startup hook: a Router (with a pool per target) per enabled driver
+ROUTERS = {}
+STARTUP_REPORT = {}
+
+# Retries of transient errors (deadlock, timeout, connection, throttling); 0 disables them
+RETRY_POLICY = RetryPolicy(
+    max_retries=int(os.environ.get("QUERY_RETRIES", "0")),
+    base_delay=float(os.environ.get("QUERY_RETRY_BACKOFF", "0.05")),
+    max_delay=float(os.environ.get("QUERY_RETRY_MAX_BACKOFF", "2.0")),
+)
+
+# Request deadline in seconds (a shorter X-Request-Timeout header wins); the query is
+# cancelled when it passes or the client disconnects, and abandoned CANCEL_GRACE later
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", "30"))
+CANCEL_GRACE = float(os.environ.get("CANCEL_GRACE", "5"))
+CANCEL_POLL_INTERVAL = 0.05
+
+# Per-library request and error class counters of this worker, served by /stats/errors
+ERROR_STATS = {"mssql-python": ErrorStats(), "pyodbc": ErrorStats()}
+REQUEST_COUNTS = {
+    library: {"requests": 0, "succeeded": 0, "retries": 0,
+              "cancelled_deadline": 0, "cancelled_disconnected": 0, "abandoned": 0}
+    for library in ("mssql-python", "pyodbc")
+}
+# Latency of this worker's successful requests, retries included
+LATENCY = {"mssql-python": LatencyHistogram(), "pyodbc": LatencyHistogram()}
+
+# Worker processes for `python main.py` and how often each shares its metrics
+WORKERS = int(os.environ.get("WORKERS", "0")) or os.cpu_count() or 1
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1.0"))
+WORKER_STARTED = datetime.now().isoformat()
+
+
+def worker_snapshot(stopped=False):
+    """This worker's counters, histograms, pool usage and per-target stats for metrics_store"""
+    return {
+        "pid": os.getpid(),
+        "started": WORKER_STARTED,
+        "updated": time.time(),
+        "stopped": stopped,
+        "libraries": {
+            library: {
+                "counts": REQUEST_COUNTS[library],
+                "latency": LATENCY[library].as_dict(),
+                "errors": ERROR_STATS[library].as_dict()
+            }
+            for library in REQUEST_COUNTS
+        },
+        "pools": {library: router.pool_stats() for library, router in ROUTERS.items()},
+        "targets": {library: router.stats() for library, router in ROUTERS.items()}
+    }
+
+
+def service_metrics():
+    """Write this worker's snapshot, then merge every worker's"""
+    directory = metrics_store.metrics_dir()
+    metrics_store.write_snapshot(directory, worker_snapshot())
+    return metrics_store.aggregate(metrics_store.read_snapshots(directory), METRICS_FLUSH_INTERVAL)
+
+
+async def share_metrics():
+    """Heartbeat: write this worker's snapshot every METRICS_FLUSH_INTERVAL seconds"""
+    directory = metrics_store.metrics_dir()
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            metrics_store.write_snapshot(directory, worker_snapshot())
+        except OSError as e:
+            print(f"Warning: writing metrics to {directory} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Import the enabled drivers, pre-open their targets' pools in parallel and report the startup times"""
+    module_import = time.perf_counter() - MODULE_IMPORT_STARTED
+    unknown = [name for name in ENABLED_DRIVERS if name not in DRIVERS]
+    if unknown:
+        raise RuntimeError(f"Unknown DRIVERS entries: {', '.join(unknown)} (choose from {', '.join(DRIVERS)})")
+    
+    drivers = {}
+    for library in ENABLED_DRIVERS:
+        module, import_seconds = import_driver(DRIVERS[library]["module"])
+        connection_string = DRIVERS[library]["connection_string"]
+        targets = [
+            Target(server, ConnectionPool(f"{library}@{server}", module.connect,
+                                          with_server(connection_string, server), POOL_SIZE))
+            for server in TARGETS or [server_of(connection_string)]
+        ]
+        ROUTERS[library] = Router(targets, ROUTING_POLICY, EJECT_FAILURES, EJECT_SLOW_FACTOR,
+                                  EJECT_SECONDS, MAX_EJECTED)
+        drivers[library] = {"import_ms": round(import_seconds * 1000, 2), "targets": {}}
+    
+    # Warm all targets' pools at once; a server that hangs while connecting only delays startup by the timeout
+    warm_started = time.perf_counter()
+    pools = [(library, target) for library in ENABLED_DRIVERS for target in ROUTERS[library].targets]
+    warm_results = await asyncio.gather(
+        *(asyncio.wait_for(asyncio.to_thread(target.pool.warm, POOL_WARM_PARALLEL), POOL_WARM_TIMEOUT)
+          for _, target in pools),
+        return_exceptions=True
+    )
+    for (library, target), result in zip(pools, warm_results):
+        if isinstance(result, asyncio.TimeoutError):
+            result = {"opened": target.pool.stats()["idle"], "error": f"timed out after {POOL_WARM_TIMEOUT:g}s"}
+        elif isinstance(result, BaseException):
+            result = {"opened": 0, "error": f"{type(result).__name__}: {result}"}
+        drivers[library]["targets"][target.name] = {
+            "pool_size": POOL_SIZE,
+            "warm_opened": result["opened"],
+            "warm_ms": round(result.get("seconds", POOL_WARM_TIMEOUT) * 1000, 2),
+            "warm_error": result.get("error")
+        }
+    
+    STARTUP_REPORT.update({
+        "module_import_ms": round(module_import * 1000, 2),
+        "pool_warm_ms": round((time.perf_counter() - warm_started) * 1000, 2),
+        "ready_ms": round((time.perf_counter() - MODULE_IMPORT_STARTED) * 1000, 2),
+        "drivers": drivers,
+        "ready_at": datetime.now().isoformat()
+    })
+    print(f"Startup: module import {STARTUP_REPORT['module_import_ms']}ms, "
+          f"pool warm {STARTUP_REPORT['pool_warm_ms']}ms, ready after {STARTUP_REPORT['ready_ms']}ms")
+    for library, report in drivers.items():
+        print(f"  {library}: import {report['import_ms']}ms, {ROUTING_POLICY} routing over "
+              f"{len(report['targets'])} target(s)")
+        for server, warm in report["targets"].items():
+            print(f"    {server}: {warm['warm_opened']}/{POOL_SIZE} connections in {warm['warm_ms']}ms"
+                  + (f" ({warm['warm_error']})" if warm["warm_error"] else ""))
+    
+    directory = metrics_store.metrics_dir()
+    metrics_store.write_snapshot(directory, worker_snapshot())
+    sharing = asyncio.create_task(share_metrics())
+    
+    yield
+    
+    sharing.cancel()
+    with suppress(asyncio.CancelledError):
+        await sharing
+    for router in ROUTERS.values():
+        for target in router.targets:
+            target.pool.close()
+    # The final counts stay in the service totals; the worker no longer counts as alive
+    metrics_store.write_snapshot(directory, worker_snapshot(stopped=True))
+    metrics_store.release_dir(directory)
+    ROUTERS.clear()
+
+
+app = FastAPI(title="SQL Server Threading Test API", lifespan=lifespan)
+
 
 @app.get("/")
 async def root():
@@ -36,129 +250,308 @@ async def root():
         "service": "SQL Server Threading Test API",
         "endpoints": {
             "mssql-python": "/query/mssql-python",
-            "pyodbc": "/query/pyodbc"
+            "pyodbc": "/query/pyodbc",
+            "error-stats": "/stats/errors",
+            "startup-stats": "/stats/startup",
+            "metrics": "/metrics"
         },
         "description": "Test concurrent database queries with different Python libraries"
     }
 
 
-@app.get("/query/mssql-python")
-async def query_mssql_python():
-    """
-    Execute query using mssql-python library
-    Known issue: Hangs with 3+ concurrent requests
-    """
-    start_time = time.time()
+def run_query(pool, deadline, in_flight, result_format):
+    """One acquire -> query -> fetch -> release cycle in a worker thread; returns the rows (a ColumnarResult for "columnar")"""
+    # Under overload the thread may start after the request was cancelled, abandoned or out of
+    # time; it must not log in to the server for a response nobody waits for
+    if in_flight.reason is None and time.time() >= deadline:
+        in_flight.reason = "deadline"
+    if in_flight.reason is not None:
+        raise QueryCancelled(in_flight.reason)
+    
+    # Connect to database (or reuse a pooled connection)
+    conn = pool.acquire()
+    healthy = False
     
     try:
-        # Connect to database
-        conn = mssql_python.connect(CONNECTION_STRING_MSSQL)
-        
-        # Create cursor and execute query
+        # Create cursor and execute query, bounded by the request's deadline
+        set_query_timeout(conn, deadline - time.time())
         cursor = conn.cursor()
+        in_flight.cursor = cursor
+        if in_flight.reason is not None:
+            raise QueryCancelled(in_flight.reason)
         cursor.execute(QUERY)
         
         # Fetch results
-        rows = []
-        for row in cursor:
-            rows.append({
-                "num": row[0],
-                "str": row[1],
-                "dt": str(row[2])
-            })
+        if result_format == "columnar":
+            rows = ColumnarResult.from_cursor(cursor)
+        else:
+            rows = []
+            for row in cursor:
+                rows.append({
+                    "num": row[0],
+                    "str": row[1],
+                    "dt": str(row[2])
+                })
         
-        # Close connection
         cursor.close()
-        conn.close()
-        
-        execution_time = time.time() - start_time
+        healthy = in_flight.reason is None
+    except Exception:
+        # The driver's error for a cancel, or its own query timeout at the deadline, is the cancellation
+        if in_flight.reason is None and time.time() >= deadline:
+            in_flight.reason = "deadline"
+        if in_flight.reason is None:
+            raise
+    finally:
+        # Close the connection on errors and cancellation, so it is neither leaked nor reused
+        in_flight.cursor = None
+        pool.release(conn, healthy)
+    
+    if in_flight.reason is not None:
+        raise QueryCancelled(in_flight.reason)
+    return rows
+
+
+def _discard_outcome(future):
+    """Consume the result of abandoned work, so its exception is not reported as unretrieved"""
+    if not future.cancelled():
+        future.exception()
+
+
+async def run_with_deadline(library, pool, request, deadline, result_format):
+    """
+    Run the query in a worker thread, cancelling it when the deadline passes or
+    the client disconnects
+    
+    A driver that does not return within CANCEL_GRACE of the cancel is
+    abandoned: the request ends, the thread finishes in the background and
+    discards its connection.
+    """
+    in_flight = InFlightQuery()
+    work = asyncio.ensure_future(asyncio.to_thread(run_query, pool, deadline, in_flight, result_format))
+    cancelled_at = None
+    
+    while True:
+        done, _ = await asyncio.wait({work}, timeout=CANCEL_POLL_INTERVAL)
+        if done:
+            return work.result()
+        if in_flight.reason is None:
+            if time.time() >= deadline:
+                in_flight.cancel("deadline")
+            elif await request.is_disconnected():
+                in_flight.cancel("disconnected")
+            if in_flight.reason is not None:
+                cancelled_at = time.time()
+        elif time.time() - cancelled_at >= CANCEL_GRACE:
+            REQUEST_COUNTS[library]["abandoned"] += 1
+            work.add_done_callback(_discard_outcome)
+            raise QueryCancelled(in_flight.reason)
+
+
+def request_deadline(request, start_time):
+    """Absolute deadline: REQUEST_TIMEOUT, or the client's shorter X-Request-Timeout"""
+    timeout = REQUEST_TIMEOUT
+    header = request.headers.get("x-request-timeout")
+    if header is not None:
+        try:
+            timeout = min(timeout, float(header))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"X-Request-Timeout must be a number of seconds, got {header!r}")
+    return start_time + timeout
+
+
+async def query_with_retries(library, request, result_format=RESULT_FORMAT):
+    """
+    Run the query, retrying the error classes of RETRY_POLICY with jittered
+    backoff within the request's deadline, and count the outcome per error class
+    
+    Every attempt goes to the target the driver's Router picks, preferring
+    targets this request has not tried yet, and its outcome is reported back:
+    transient errors and deadline cancellations count against the target,
+    other errors and client disconnects do not.
+    
+    Raises HTTPException 500 with the classified error once the retries are
+    used up or the error class is not retried, 503 if the driver is not enabled,
+    504 (499 for a client that disconnected) when the query was cancelled.
+    """
+    router = ROUTERS.get(library)
+    if router is None:
+        raise HTTPException(status_code=503, detail=f"{library} is not enabled (DRIVERS={','.join(ENABLED_DRIVERS)})")
+    if result_format not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(RESULT_FORMATS)}, got {result_format!r}")
+    
+    start_time = time.time()
+    deadline = request_deadline(request, start_time)
+    counts = REQUEST_COUNTS[library]
+    counts["requests"] += 1
+    errors = []
+    attempt = 0
+    tried = set()
+    
+    while True:
+        attempt += 1
+        target = router.choose(exclude=tried)
+        tried.add(target.name)
+        router.begin(target)
+        attempt_started = time.time()
+        try:
+            rows = await run_with_deadline(library, target.pool, request, deadline, result_format)
+            router.finish(target, time.time() - attempt_started, True)
+            break
         
-        return {
-            "library": "mssql-python",
-            "status": "success",
-            "rows": rows,
-            "row_count": len(rows),
-            "execution_time_ms": round(execution_time * 1000, 2),
-            "timestamp": datetime.now().isoformat()
-        }
+        except QueryCancelled as e:
+            router.finish(target, time.time() - attempt_started, None if e.reason == "disconnected" else False)
+            execution_time = time.time() - start_time
+            counts["retries"] += attempt - 1
+            counts[f"cancelled_{e.reason}"] += 1
+            cancel_detail = {
+                "library": library,
+                "status": "cancelled",
+                "reason": e.reason,
+                "attempts": attempt,
+                "execution_time_ms": round(execution_time * 1000, 2),
+                "timestamp": datetime.now().isoformat()
+            }
+            raise HTTPException(status_code=504 if e.reason == "deadline" else 499, detail=cancel_detail)
         
-    except Exception as e:
-        execution_time = time.time() - start_time
-        error_detail = {
-            "library": "mssql-python",
-            "status": "error",
-            "error": str(e),
-            "error_type": type(e).__name__,
-            "traceback": traceback.format_exc(),
-            "execution_time_ms": round(execution_time * 1000, 2),
-            "timestamp": datetime.now().isoformat()
-        }
-        raise HTTPException(status_code=500, detail=error_detail)
+        except Exception as e:
+            error = classify(e)
+            errors.append(error)
+            router.finish(target, time.time() - attempt_started, False if error.transient else None)
+            backoff = RETRY_POLICY.backoff(attempt, random)
+            if RETRY_POLICY.should_retry(error, attempt) and time.time() + backoff < deadline:
+                await asyncio.sleep(backoff)
+                continue
+            
+            execution_time = time.time() - start_time
+            counts["retries"] += attempt - 1
+            ERROR_STATS[library].record(errors, False, execution_time)
+            error_detail = {
+                "library": library,
+                "status": "error",
+                **error.as_dict(),
+                "attempts": attempt,
+                "traceback": traceback.format_exc(),
+                "execution_time_ms": round(execution_time * 1000, 2),
+                "timestamp": datetime.now().isoformat()
+            }
+            raise HTTPException(status_code=500, detail=error_detail)
+    
+    execution_time = time.time() - start_time
+    counts["succeeded"] += 1
+    counts["retries"] += attempt - 1
+    LATENCY[library].record(execution_time)
+    if errors:
+        ERROR_STATS[library].record(errors, True, execution_time)
+    
+    if result_format == "columnar":
+        result = {"columns": rows.names, "data": rows.to_columns()}
+    else:
+        result = {"rows": rows}
+    
+    return {
+        "library": library,
+        "status": "success",
+        **result,
+        "row_count": len(rows),
+        "attempts": attempt,
+        "execution_time_ms": round(execution_time * 1000, 2),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/query/mssql-python")
+async def query_mssql_python(request: Request, result_format: str = Query(RESULT_FORMAT, alias="format")):
+    """
+    Execute query using mssql-python library
+    Known issue: Hangs with 3+ concurrent requests
+    """
+    return await query_with_retries("mssql-python", request, result_format)
 
 
 @app.get("/query/pyodbc")
-async def query_pyodbc():
+async def query_pyodbc(request: Request, result_format: str = Query(RESULT_FORMAT, alias="format")):
     """
     Execute query using PyODBC library
     Should handle concurrent requests without issues
     """
-    start_time = time.time()
+    return await query_with_retries("pyodbc", request, result_format)
+
+
+@app.get("/stats/errors")
+async def error_stats():
+    """Requests, retries and per-class error counters with latency to success, per library"""
+    libraries = {}
+    for library, stats in ERROR_STATS.items():
+        classes = {}
+        for error_class, entry in stats.rows():
+            hist = entry["to_success"]
+            classes[error_class] = {
+                "attempts": entry["attempts"],
+                "retried": entry["retried"],
+                "recovered": entry["recovered"],
+                "failed": entry["failed"],
+                "to_success_p50_ms": round(hist.percentile(50) * 1000, 2) if hist.count else None,
+                "to_success_p99_ms": round(hist.percentile(99) * 1000, 2) if hist.count else None,
+                "example": entry["sample"]
+            }
+        libraries[library] = {**REQUEST_COUNTS[library], "error_classes": classes}
     
-    try:
-        # Connect to database
-        conn = pyodbc.connect(CONNECTION_STRING_PYODBC)
-        
-        # Create cursor and execute query
-        cursor = conn.cursor()
-        cursor.execute(QUERY)
-        
-        # Fetch results
-        rows = []
-        for row in cursor:
-            rows.append({
-                "num": row[0],
-                "str": row[1],
-                "dt": str(row[2])
-            })
-        
-        # Close connection
-        cursor.close()
-        conn.close()
-        
-        execution_time = time.time() - start_time
-        
-        return {
-            "library": "pyodbc",
-            "status": "success",
-            "rows": rows,
-            "row_count": len(rows),
-            "execution_time_ms": round(execution_time * 1000, 2),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        execution_time = time.time() - start_time
-        error_detail = {
-            "library": "pyodbc",
-            "status": "error",
-            "error": str(e),
-            "error_type": type(e).__name__,
-            "traceback": traceback.format_exc(),
-            "execution_time_ms": round(execution_time * 1000, 2),
-            "timestamp": datetime.now().isoformat()
-        }
-        raise HTTPException(status_code=500, detail=error_detail)
+    return {
+        "retry_policy": RETRY_POLICY.describe(),
+        "libraries": libraries,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/stats/startup")
+async def startup_stats():
+    """Import, pool warm-up and ready times from startup, and the current pool counters"""
+    return {
+        **STARTUP_REPORT,
+        "pools": {library: {target.name: target.pool.stats() for target in router.targets}
+                  for library, router in ROUTERS.items()},
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Service-wide request counters, latency percentiles, error classes, pool usage and per-target stats over all workers"""
+    return {
+        **service_metrics(),
+        "served_by": os.getpid(),
+        "timestamp": datetime.now().isoformat()
+    }
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint"""
+    service = service_metrics()
     return {
         "status": "healthy",
+        "worker": os.getpid(),
+        "workers_alive": service["workers"]["alive"],
+        "pools": {library: data["pool"] for library, data in service["libraries"].items() if data["pool"]},
+        "ejected_targets": {library: [name for name, target in data["targets"].items() if target["ejected_in_workers"]]
+                            for library, data in service["libraries"].items() if data["targets"]},
         "timestamp": datetime.now().isoformat()
     }
 
 
 if __name__ == "__main__":
+    import shutil
+    import tempfile
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    # A fresh metrics directory per service run, inherited by the workers
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="fastapi-metrics-")
+    print(f"Starting {WORKERS} worker(s); metrics in {os.environ['METRICS_DIR']}")
+    try:
+        if WORKERS > 1:
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS,
+                        app_dir=os.path.dirname(os.path.abspath(__file__)))
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=8000)
+    finally:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
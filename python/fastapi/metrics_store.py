@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+File-backed metrics shared by the uvicorn worker processes
+
+Every worker keeps its own counters, latency histograms and driver pools.
+It writes a JSON snapshot of them to worker-<pid>.json in a directory
+shared by all workers of the service: every METRICS_FLUSH_INTERVAL
+seconds, before it answers /metrics or /health, and at shutdown. Any
+worker can then merge all the snapshots into service-wide numbers. A
+snapshot whose heartbeat is older than three flush intervals belongs to
+a worker that is gone; its counts are kept in the totals, but it no
+longer counts as alive.
+
+The directory is METRICS_DIR, which main.py sets to a fresh directory
+before it starts the workers. When uvicorn is started directly it
+defaults to one per run in the system temp directory: named after the
+uvicorn master process that spawned the workers, or after the process
+itself when it serves alone (then it starts empty). The last worker to
+stop removes it, so a later run never adds to an earlier run's totals.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+from latency_histogram import LatencyHistogram
+from error_policy import ErrorStats
+
+
+_claimed = False
+
+
+def metrics_dir():
+    """Directory the workers of this service run share (created if missing)"""
+    global _claimed
+    directory = os.environ.get("METRICS_DIR")
+    if not directory:
+        # Workers spawned by one uvicorn master share its directory; a single
+        # process owns its own and drops what a crashed run with its pid left
+        parent = multiprocessing.parent_process()
+        owner = parent.pid if parent is not None else os.getpid()
+        directory = os.path.join(tempfile.gettempdir(), f"fastapi-metrics-{owner}")
+        if parent is None and not _claimed:
+            shutil.rmtree(directory, ignore_errors=True)
+            _claimed = True
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return directory
+
+
+def release_dir(directory):
+    """At shutdown, after the stopped snapshot: remove a default directory once every worker has stopped"""
+    if os.environ.get("METRICS_DIR"):
+        return
+    if all(snapshot.get("stopped") for snapshot in read_snapshots(directory)):
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def write_snapshot(directory, snapshot):
+    """Replace this worker's snapshot file atomically"""
+    path = os.path.join(directory, f"worker-{snapshot['pid']}.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+
+def read_snapshots(directory):
+    """All workers' snapshots; files being replaced or unreadable are skipped"""
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("worker-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _latency_summary(hist):
+    if not hist.count:
+        return {"count": 0}
+    p = hist.percentiles((50, 90, 99, 99.9))
+    return {
+        "count": hist.count,
+        "mean_ms": round(hist.mean * 1000, 2),
+        "p50_ms": round(p[50] * 1000, 2),
+        "p90_ms": round(p[90] * 1000, 2),
+        "p99_ms": round(p[99] * 1000, 2),
+        "p99_9_ms": round(p[99.9] * 1000, 2),
+        "max_ms": round(hist.max * 1000, 2)
+    }
+
+
+def aggregate(snapshots, flush_interval, now=None):
+    """
+    Service-wide view of the worker snapshots
+    
+    Returns:
+        dict with the workers (alive or not), and per library the summed
+        request counters, the merged latency histogram and error classes,
+        the summed pool usage, and per target (server) its summed counters,
+        merged latency and the number of alive workers that have it ejected
+    """
+    now = time.time() if now is None else now
+    counters = {}
+    latency = {}
+    errors = {}
+    pools = {}
+    targets = {}
+    workers = []
+    for snapshot in snapshots:
+        alive = not snapshot.get("stopped") and now - snapshot["updated"] <= 3 * flush_interval
+        workers.append({
+            "pid": snapshot["pid"],
+            "alive": alive,
+            "started": snapshot["started"],
+            "heartbeat_age_s": round(now - snapshot["updated"], 2)
+        })
+        for library, data in snapshot["libraries"].items():
+            totals = counters.setdefault(library, {})
+            for key, n in data["counts"].items():
+                totals[key] = totals.get(key, 0) + n
+            latency.setdefault(library, LatencyHistogram()).merge(LatencyHistogram.from_dict(data["latency"]))
+            errors.setdefault(library, ErrorStats()).merge(ErrorStats.from_dict(data["errors"]))
+        for library, per_target in snapshot.get("targets", {}).items():
+            for name, data in per_target.items():
+                totals = targets.setdefault(library, {}).setdefault(name, {
+                    "requests": 0, "succeeded": 0, "failed": 0, "ejections": 0,
+                    "outstanding": 0, "ejected_in_workers": 0, "latency": LatencyHistogram()})
+                for key in ("requests", "succeeded", "failed", "ejections"):
+                    totals[key] += data[key]
+                totals["latency"].merge(LatencyHistogram.from_dict(data["latency"]))
+                if alive:
+                    totals["outstanding"] += data["outstanding"]
+                    totals["ejected_in_workers"] += data["ejected"]
+        if not alive:
+            continue
+        for library, pool in snapshot["pools"].items():
+            totals = pools.setdefault(library, {"size": 0, "idle": 0, "opened": 0, "reused": 0, "discarded": 0})
+            for key in totals:
+                totals[key] += pool[key]
+    
+    libraries = {}
+    for library, totals in counters.items():
+        libraries[library] = {
+            **totals,
+            "latency": _latency_summary(latency[library]),
+            "error_classes": {error_class: {key: entry[key] for key in ("attempts", "retried", "recovered", "failed")}
+                              for error_class, entry in errors[library].rows()},
+            "pool": pools.get(library),
+            "targets": {name: {**entry, "latency": _latency_summary(entry["latency"])}
+                        for name, entry in targets.get(library, {}).items()}
+        }
+    return {
+        "workers": {
+            "total": len(workers),
+            "alive": sum(1 for worker in workers if worker["alive"]),
+            "processes": workers
+        },
+        "libraries": libraries
+    }
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Routing of queries across several servers (e.g. read replicas)
+
+Each target server has its own ConnectionPool. The Router picks a target
+per attempt:
+
+    least-outstanding  the target with the fewest queries in flight
+    latency            the lower EWMA latency x (queries in flight + 1) of
+                       two targets picked at random ("power of two
+                       choices"), so a slow replica gets proportionally
+                       less load and equally fast ones share it
+
+Targets without a latency sample yet count as the fastest, so new and
+returning targets are tried. Ties are broken at random.
+
+Targets are ejected passively, from the outcomes of real queries: after
+`eject_failures` consecutive failures, or when their EWMA latency is
+`slow_factor` times the median of the other targets. An ejected target
+gets no queries for `eject_seconds` and then returns. At most
+`max_ejected` of the targets are out at a time, and if every target is
+out the router falls back to all of them.
+
+The Router is not thread-safe; the service calls it from the event loop.
+"""
+
+import re
+import time
+import random
+import statistics
+
+from latency_histogram import LatencyHistogram
+
+
+POLICIES = ("least-outstanding", "latency")
+
+_SERVER_KEYWORD = re.compile(r"(^|;)\s*server\s*=[^;]*", re.I)
+
+
+def with_server(connection_string, server):
+    """The connection string with its Server keyword set to `server` (added if missing)"""
+    if _SERVER_KEYWORD.search(connection_string):
+        return _SERVER_KEYWORD.sub(lambda m: f"{m.group(1)}Server={server}", connection_string, count=1)
+    return f"Server={server};{connection_string}"
+
+
+def server_of(connection_string):
+    """The Server keyword's value, e.g. the default target"""
+    match = _SERVER_KEYWORD.search(connection_string)
+    return match.group(0).split("=", 1)[1].strip() if match else None
+
+
+class Target:
+    """One server: its pool, load, latency and health"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.outstanding = 0
+        self.ewma = None              # seconds; None until the first success
+        self.failures = 0             # consecutive
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.requests = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.latency = LatencyHistogram()
+
+    def ejected(self, now):
+        return now < self.ejected_until
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        return {
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000, 2) if self.ewma is not None else None,
+            "ejected": self.ejected(now),
+            "ejections": self.ejections,
+            "latency": self.latency.as_dict(),
+            "pool": self.pool.stats()
+        }
+
+
+class Router:
+    """
+    Picks a target per query attempt and ejects unhealthy ones
+    
+    Args:
+        targets: Target per server
+        policy: "least-outstanding" or "latency"
+        eject_failures: Consecutive failures that eject a target (0 disables it)
+        slow_factor: EWMA latency, relative to the other targets' median, that ejects a target (0 disables it)
+        eject_seconds: How long an ejected target gets no queries
+        max_ejected: Largest fraction of the targets ejected at a time
+        alpha: Weight of the newest latency in the EWMA
+    """
+
+    def __init__(self, targets, policy="least-outstanding", eject_failures=5, slow_factor=3.0,
+                 eject_seconds=10.0, max_ejected=0.5, alpha=0.2):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy {policy!r} (choose from {', '.join(POLICIES)})")
+        self.targets = list(targets)
+        self.policy = policy
+        self.eject_failures = eject_failures
+        self.slow_factor = slow_factor
+        self.eject_seconds = eject_seconds
+        self.max_ejected = max_ejected
+        self.alpha = alpha
+
+    def _cost(self, target):
+        if self.policy == "latency":
+            return (target.ewma or 0.0) * (target.outstanding + 1)
+        return target.outstanding
+
+    def choose(self, exclude=()):
+        """
+        The target for the next attempt
+        
+        Prefers targets that are not ejected and not in `exclude` (e.g. the
+        ones a retried request already tried), then any target not ejected,
+        then all of them.
+        """
+        now = time.time()
+        admitted = [t for t in self.targets if not t.ejected(now)]
+        candidates = [t for t in admitted if t.name not in exclude] or admitted or self.targets
+        if self.policy == "latency" and len(candidates) > 2:
+            candidates = random.sample(candidates, 2)
+        cost = min(self._cost(t) for t in candidates)
+        return random.choice([t for t in candidates if self._cost(t) == cost])
+
+    def begin(self, target):
+        target.outstanding += 1
+        target.requests += 1
+
+    def finish(self, target, elapsed, ok):
+        """
+        Record an attempt's outcome
+        
+        Args:
+            target: The target it ran on
+            elapsed: Seconds it took
+            ok: True for success, False for a failure, None for an outcome that
+                says nothing about the target (e.g. the client disconnected)
+        """
+        target.outstanding -= 1
+        if ok is None:
+            return
+        if ok:
+            target.succeeded += 1
+            target.failures = 0
+            target.latency.record(elapsed)
+            sample = elapsed
+        else:
+            target.failed += 1
+            target.failures += 1
+            # At least double the current EWMA, so a target that fails fast does not look fast
+            sample = max(elapsed, 2 * (target.ewma or 0.0))
+        target.ewma = sample if target.ewma is None else (1 - self.alpha) * target.ewma + self.alpha * sample
+        self._check_ejection(target)
+
+    def _check_ejection(self, target):
+        now = time.time()
+        if target.ejected(now):
+            return
+        reason = None
+        if self.eject_failures and target.failures >= self.eject_failures:
+            reason = f"{target.failures} consecutive failures"
+        elif self.slow_factor and target.ewma is not None and target.succeeded + target.failed >= 10:
+            others = [t.ewma for t in self.targets if t is not target and t.ewma is not None]
+            if others and target.ewma > self.slow_factor * statistics.median(others):
+                reason = f"EWMA {target.ewma * 1000:.1f}ms > {self.slow_factor:g}x the others' median"
+        if reason is None:
+            return
+        ejected = sum(1 for t in self.targets if t.ejected(now))
+        if ejected + 1 > self.max_ejected * len(self.targets):
+            return
+        target.ejected_until = now + self.eject_seconds
+        target.ejections += 1
+        # A returning target starts over, with no failure streak or latency, so it is tried again
+        target.failures = 0
+        target.ewma = None
+        print(f"Ejected {target.name} for {self.eject_seconds:g}s: {reason}")
+
+    def pool_stats(self):
+        """The targets' pool counters, summed"""
+        totals = {}
+        for target in self.targets:
+            for key, n in target.pool.stats().items():
+                totals[key] = totals.get(key, 0) + n
+        return totals
+
+    def stats(self):
+        now = time.time()
+        return {target.name: target.stats(now) for target in self.targets}
@@ -14,12 +14,13 @@ import argparse
 import sys
 
 
-async def make_request(session, url, request_id):
-    """Make a single HTTP request"""
+async def make_request(session, url, request_id, timeout=30):
+    """Make a single HTTP request; the server is told the same deadline (X-Request-Timeout)"""
     start_time = time.time()
     
     try:
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout),
+                               headers={"X-Request-Timeout": str(timeout)}) as response:
             data = await response.json()
             execution_time = time.time() - start_time
             
@@ -36,7 +37,7 @@ async def make_request(session, url, request_id):
             "request_id": request_id,
             "status": "timeout",
             "execution_time_ms": round(execution_time * 1000, 2),
-            "error": "Request timed out after 30 seconds"
+            "error": f"Request timed out after {timeout} seconds"
         }
     except Exception as e:
         execution_time = time.time() - start_time
@@ -48,7 +49,7 @@ async def make_request(session, url, request_id):
         }
 
 
-async def test_endpoint(url, num_concurrent, num_iterations):
+async def test_endpoint(url, num_concurrent, num_iterations, timeout=30):
     """Test an endpoint with concurrent requests"""
     print(f"\n{'='*80}")
     print(f"Testing: {url}")
@@ -68,7 +69,7 @@ async def test_endpoint(url, num_concurrent, num_iterations):
             tasks = []
             for i in range(num_concurrent):
                 request_id = iteration * num_concurrent + i + 1
-                tasks.append(make_request(session, url, request_id))
+                tasks.append(make_request(session, url, request_id, timeout))
             
             # Execute all requests concurrently
             iteration_start = time.time()
@@ -107,6 +108,23 @@ async def test_endpoint(url, num_concurrent, num_iterations):
     print(f"Total Time:        {total_time:.2f}s")
     print(f"Avg Throughput:    {total_requests / total_time:.2f} req/sec")
     
+    # Error classes reported by the server (HTTP 500 detail), e.g. deadlock or connection
+    error_classes = {}
+    for r in all_results:
+        detail = r.get("response", {}).get("detail") if isinstance(r.get("response"), dict) else None
+        if r.get("status_code") == 500 and isinstance(detail, dict):
+            error_class = detail.get("error_class", "unknown")
+            error_classes[error_class] = error_classes.get(error_class, 0) + 1
+    if error_classes:
+        print(f"Server Errors:     " + ", ".join(f"{c}={n}" for c, n in sorted(error_classes.items())))
+    cancelled = sum(1 for r in all_results if r.get("status_code") == 504)
+    if cancelled:
+        print(f"Cancelled (504):   {cancelled} (deadline passed, query cancelled by the server)")
+    retries = sum(r["response"].get("attempts", 1) - 1 for r in all_results
+                  if r.get("status_code") == 200 and isinstance(r.get("response"), dict))
+    if retries:
+        print(f"Retried Attempts:  {retries}")
+    
     if successful > 0:
         avg_time = sum(r["execution_time_ms"] for r in all_results if r["status"] == "success") / successful
         min_time = min(r["execution_time_ms"] for r in all_results if r["status"] == "success")
@@ -159,6 +177,13 @@ async def main():
         help='Which endpoint to test (default: both)'
     )
     
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=30,
+        help='Seconds per request before giving up; sent as the server-side deadline (default: 30)'
+    )
+    
     args = parser.parse_args()
     
     base_url = f"http://{args.host}:{args.port}"
@@ -191,14 +216,14 @@ async def main():
         print("TESTING MSSQL-PYTHON ENDPOINT")
         print("="*80)
         mssql_url = f"{base_url}/query/mssql-python"
-        await test_endpoint(mssql_url, args.concurrent, args.iterations)
+        await test_endpoint(mssql_url, args.concurrent, args.iterations, args.timeout)
     
     if args.endpoint in ['pyodbc', 'both']:
         print("\n" + "="*80)
         print("TESTING PYODBC ENDPOINT")
         print("="*80)
         pyodbc_url = f"{base_url}/query/pyodbc"
-        await test_endpoint(pyodbc_url, args.concurrent, args.iterations)
+        await test_endpoint(pyodbc_url, args.concurrent, args.iterations, args.timeout)
     
     print("\n✓ Testing complete!\n")
     return 0
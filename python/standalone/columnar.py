@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Columnar - Compact column-oriented container for large result sets
+
+Keeping a result set as one dict per row costs a dict, its hash table and
+a boxed object per value, i.e. hundreds of bytes per row. ColumnarResult
+keeps one shared column description and one column per result column,
+filled row by row straight from the cursor:
+
+    int, bool, float     typed arrays (8/1/8 bytes per value)
+    naive datetime       int64 microseconds since the epoch
+    everything else      a list, with repeated strings stored once
+
+The column kind comes from the cursor description's type_code (a Python
+type in pyodbc and mssql-python), or else from the first non-NULL value.
+NULLs are kept in a per-column bitmap that is only allocated once a NULL
+is seen. A value that does not fit its typed array (an int beyond 64 bits,
+a float in an int column, a timezone-aware datetime) turns the column into
+a plain list, so nothing is lost.
+
+Usage:
+    result = ColumnarResult.from_cursor(cursor)     # instead of [dict(...) for row in cursor]
+    result.column('id'); result.row(0); result.to_columns()
+
+    python columnar.py --benchmark --rows 1000000
+"""
+
+import sys
+import time
+import argparse
+import operator
+import datetime
+import multiprocessing
+from array import array
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import psutil
+
+try:
+    import resource
+except ImportError:     # Windows: peak working set from psutil instead
+    resource = None
+
+
+RESULT_FORMATS = ('count', 'dicts', 'columnar')
+
+EPOCH = datetime.datetime(1970, 1, 1)
+STRING_CACHE_LIMIT = 65536      # distinct strings per column stored once; later ones are kept as they come
+
+_TYPECODES = {'int': 'q', 'bool': 'b', 'float': 'd', 'datetime': 'q'}
+_TYPES = {'int': int, 'bool': bool, 'float': float, 'datetime': datetime.datetime}
+_PLACEHOLDERS = {'int': 0, 'bool': False, 'float': 0.0, 'datetime': EPOCH}
+_NONE_TYPE = type(None)
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_TZINFO = operator.attrgetter('tzinfo')
+
+
+def _kind_of(value: Any) -> str:
+    # bool before int: it is a subclass of int
+    for kind, python_type in (('bool', bool), ('int', int), ('float', float), ('datetime', datetime.datetime)):
+        if isinstance(value, python_type):
+            return kind
+    return 'object'
+
+
+class _Column:
+    """Values of one result column"""
+
+    __slots__ = ('name', 'kind', 'values', 'nulls', 'strings', 'length')
+
+    def __init__(self, name: str, kind: Optional[str]):
+        self.name = name
+        self.kind = kind                    # None until the first non-NULL value
+        self.values: Any = array(_TYPECODES[kind]) if kind in _TYPECODES else []
+        self.nulls: Optional[bytearray] = None
+        self.strings: Optional[Dict[str, str]] = {} if kind == 'object' else None
+        self.length = 0
+
+    def append(self, value: Any):
+        if value is None:
+            self._append_null()
+            return
+        if self.kind is None:
+            self._start(_kind_of(value))
+        if self.kind == 'object':
+            if self.strings is not None and type(value) is str:
+                value = self.strings.setdefault(value, value)
+                if len(self.strings) >= STRING_CACHE_LIMIT:
+                    self.strings = None
+            self.values.append(value)
+        elif type(value) is not _TYPES[self.kind] or self.kind == 'datetime' and value.tzinfo is not None:
+            # The array would convert the value (or lose its timezone)
+            self._to_list()
+            self.values.append(value)
+        elif self.kind == 'datetime':
+            delta = value - EPOCH
+            self.values.append((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+        else:
+            try:
+                self.values.append(value)
+            except OverflowError:
+                self._to_list()
+                self.values.append(value)
+        self.length += 1
+
+    def extend(self, values: Sequence[Any]):
+        """Append a batch of values; the common cases are converted and copied with C loops"""
+        kind = self.kind
+        count = len(values)
+        types = set(map(type, values))
+        has_nulls = _NONE_TYPE in types
+        types.discard(_NONE_TYPE)
+        if kind == 'object' and (self.strings is None or not types <= {str}):
+            self.values.extend(values)
+        elif kind == 'object' and len(self.strings) + len(values) < STRING_CACHE_LIMIT:
+            self.values.extend(map(self.strings.setdefault, values, values))
+        elif kind in _TYPES and types == {_TYPES[kind]}:
+            present = [value for value in values if value is not None] if has_nulls else values
+            if kind == 'int' and not _INT64_MIN <= min(present) <= max(present) <= _INT64_MAX or \
+                    kind == 'datetime' and set(map(_TZINFO, present)) != {None}:
+                self._append_each(values)
+                return
+            if has_nulls:
+                for offset, value in enumerate(values):
+                    if value is None:
+                        self._set_null(self.length + offset)
+                values = [_PLACEHOLDERS[kind] if value is None else value for value in values]
+            if kind == 'datetime':
+                values = map(operator.floordiv, map(operator.sub, values, repeat(EPOCH)), repeat(_MICROSECOND))
+            self.values.extend(values)
+        else:
+            self._append_each(values)
+            return
+        self.length += count
+
+    def _append_each(self, values: Sequence[Any]):
+        for value in values:
+            self.append(value)
+
+    def _set_null(self, index: int):
+        if self.nulls is None:
+            self.nulls = bytearray((index >> 3) + 1)
+        elif len(self.nulls) <= index >> 3:
+            self.nulls.extend(bytes(max(len(self.nulls), (index >> 3) + 1 - len(self.nulls))))
+        self.nulls[index >> 3] |= 1 << (index & 7)
+
+    def _append_null(self):
+        self._set_null(self.length)
+        # A placeholder keeps the values aligned with the rows
+        self.values.append(None if isinstance(self.values, list) else 0)
+        self.length += 1
+
+    def _start(self, kind: str):
+        """The first non-NULL value decides the kind of a column the description did not type"""
+        self.kind = kind
+        if kind in _TYPECODES:
+            self.values = array(_TYPECODES[kind], [0] * self.length)
+        elif kind == 'object':
+            self.strings = {}
+
+    def _to_list(self):
+        """Keep the values decoded in a plain list from here on"""
+        self.values = [self.get(index) for index in range(self.length)]
+        self.kind = 'object'
+        self.strings = None
+        self.nulls = None
+
+    def is_null(self, index: int) -> bool:
+        nulls = self.nulls
+        return nulls is not None and (index >> 3) < len(nulls) and bool(nulls[index >> 3] & (1 << (index & 7)))
+
+    def get(self, index: int) -> Any:
+        if self.is_null(index):
+            return None
+        value = self.values[index]
+        if self.kind == 'bool':
+            return bool(value)
+        if self.kind == 'datetime':
+            return EPOCH + datetime.timedelta(microseconds=value)
+        return value
+
+    def nbytes(self) -> int:
+        """Bytes of the column's own storage (not of the objects a list column refers to)"""
+        storage = self.values.itemsize * len(self.values) if isinstance(self.values, array) \
+            else sys.getsizeof(self.values)
+        return storage + (len(self.nulls) if self.nulls is not None else 0)
+
+
+class ColumnarResult:
+    """
+    A result set stored column by column
+
+    Args:
+        description: The cursor's description (name, type_code, ...) per column
+    """
+
+    def __init__(self, description: Sequence[Sequence[Any]]):
+        self.names: List[str] = [entry[0] for entry in description]
+        self._columns = [_Column(entry[0], self._kind_of_type(entry[1])) for entry in description]
+        self._appenders = [column.append for column in self._columns]
+
+    @staticmethod
+    def _kind_of_type(type_code: Any) -> Optional[str]:
+        for kind, python_type in _TYPES.items():
+            if type_code is python_type:
+                return kind
+        # Another Python type (str, Decimal, bytes, ...) is stored as is; anything else decides on the first value
+        return 'object' if isinstance(type_code, type) else None
+
+    @classmethod
+    def from_cursor(cls, cursor, batch_size: int = 1000) -> 'ColumnarResult':
+        """Fetch the rest of the cursor's result set into a new ColumnarResult"""
+        result = cls(cursor.description)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return result
+            result.extend(rows)
+
+    def append(self, row: Sequence[Any]):
+        """Add one row (a driver Row or any sequence in column order)"""
+        for append, value in zip(self._appenders, row):
+            append(value)
+
+    def extend(self, rows: Sequence[Sequence[Any]]):
+        """Add a batch of rows, column by column"""
+        if rows:
+            for column, values in zip(self._columns, zip(*rows)):
+                column.extend(values)
+
+    def __len__(self) -> int:
+        return self._columns[0].length if self._columns else 0
+
+    def column(self, name: str) -> List[Any]:
+        column = self._columns[self.names.index(name)]
+        return [column.get(index) for index in range(column.length)]
+
+    def row(self, index: int) -> Tuple[Any, ...]:
+        if not -len(self) <= index < len(self):
+            raise IndexError('row index out of range')
+        index %= len(self)
+        return tuple(column.get(index) for column in self._columns)
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        columns = [self.column(name) for name in self.names]
+        return iter(zip(*columns))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """One dict per row, as the per-row code built them"""
+        return [dict(zip(self.names, row)) for row in self]
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        """Column name -> values, e.g. for a JSON response"""
+        return {name: self.column(name) for name in self.names}
+
+    def nbytes(self) -> int:
+        return sum(column.nbytes() for column in self._columns)
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process so far, in bytes"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024     # kilobytes on Linux
+    return psutil.Process().memory_info().peak_wset
+
+
+class _SyntheticCursor:
+    """A cursor over generated rows of a typical table, for the benchmark"""
+
+    description = [('id', int, None, 10, 10, 0, False), ('status', str, None, 20, 20, 0, False),
+                   ('customer', str, None, 40, 40, 0, False), ('amount', float, None, 53, 53, 0, True),
+                   ('created', datetime.datetime, None, 23, 23, 3, False), ('flagged', bool, None, 1, 1, 0, True)]
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.position = 0
+
+    def fetchmany(self, size: int) -> List[Tuple[Any, ...]]:
+        statuses = ('new', 'paid', 'shipped', 'returned', 'cancelled')
+        end = min(self.position + size, self.rows)
+        batch = [(n, statuses[n % 5], f'customer-{n}', n * 0.25, EPOCH + datetime.timedelta(seconds=n),
+                  None if n % 10 == 0 else n % 3 == 0) for n in range(self.position, end)]
+        self.position = end
+        return batch
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        while True:
+            rows = self.fetchmany(1000)
+            if not rows:
+                return
+            yield from rows
+
+
+def _measure(layout: str, rows: int) -> Dict[str, float]:
+    """Build `rows` rows in one layout; runs in a fresh process so the peaks do not mix"""
+    cursor = _SyntheticCursor(rows)
+    before = psutil.Process().memory_info().rss
+    started = time.perf_counter()
+    if layout == 'dicts':
+        names = [entry[0] for entry in cursor.description]
+        result: Any = [dict(zip(names, row)) for row in cursor]
+    elif layout == 'tuples':
+        result = list(cursor)
+    else:
+        result = ColumnarResult.from_cursor(cursor)
+    seconds = time.perf_counter() - started
+    peak = peak_rss()
+    assert len(result) == rows
+    return {'layout': layout, 'seconds': seconds, 'peak_delta': max(0, peak - before)}
+
+
+def benchmark(rows: int, layouts: Sequence[str] = ('dicts', 'tuples', 'columnar')) -> List[Dict[str, float]]:
+    """Peak RSS growth and build time per layout, each in its own spawned process"""
+    results = []
+    for layout in layouts:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results.append(executor.submit(_measure, layout, rows).result())
+    return results
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Compact columnar result container and its memory benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Peak RSS per million rows: dict per row vs tuples (driver rows) vs ColumnarResult
+  python columnar.py --benchmark --rows 1000000
+
+  # The query runner keeps each result set in the same layouts
+  python parallel_query_runner.py -c "Server=..." -q "SELECT * FROM orders" --result-format columnar
+        """
+    )
+    parser.add_argument('--benchmark', action='store_true', help='Measure peak RSS and build time per layout')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows per layout (default: 1000000)')
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return 1
+    if args.rows < 1:
+        print("Error: --rows must be positive")
+        return 1
+
+    print("=" * 80)
+    print(f"Result set of {args.rows:,} rows (id, status, customer, amount, created, flagged)")
+    print("=" * 80)
+    print(f"{'Layout':<10} {'Peak RSS MB':>12} {'Bytes/row':>10} {'MB per 1M rows':>15} {'Build s':>9}")
+    print("-" * 80)
+    for result in benchmark(args.rows):
+        mb = result['peak_delta'] / (1024 * 1024)
+        print(f"{result['layout']:<10} {mb:>12.1f} {result['peak_delta'] / args.rows:>10.0f} "
+              f"{mb * 1_000_000 / args.rows:>15.1f} {result['seconds']:>9.2f}")
+    print("-" * 80)
+    print("Peak RSS growth of a fresh process while it builds the result (values included: the")
+    print("unique customer strings are kept by every layout). tuples is keeping the driver rows.")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
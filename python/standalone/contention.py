@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Contention - Lock wait and GIL instrumentation for the query runner
+
+Three instruments, all per thread:
+
+    TimedLock   drop-in threading.Lock that counts acquisitions and times
+                the ones that had to wait (uncontended ones cost one
+                non-blocking acquire)
+    PhaseClock  wall time and thread CPU time (time.thread_time) per phase
+                (connect, execute, fetch, stats, ...). A phase that waits
+                on the network shows a low CPU share either way; it does
+                not tell by itself whether the GIL was released meanwhile
+    GilProbe    a thread that sleeps `interval` and measures how late it
+                wakes up. It needs the GIL to resume, so lateness means
+                some thread held the GIL. Lateness is attributed to the
+                phases the workers are in when the probe gets to run
+
+Together they answer whether a driver releases the GIL during I/O: an
+execute phase with a low CPU share and a low "GIL blocked" share waits
+without the GIL; a low CPU share with a high blocked share means the
+driver blocks on the network while holding it, which stalls every other
+Python thread.
+
+Usage:
+    locks = [TimedLock('stats_lock')]
+    clock = PhaseClock()
+    probe = GilProbe(clock).start()
+    clock.set_phase('execute')            # from each worker thread
+    probe.stop()
+    print_contention(locks, clock, probe)
+
+    python contention.py --demo
+"""
+
+import sys
+import time
+import argparse
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from latency_histogram import LatencyHistogram
+
+
+DEFAULT_PROBE_INTERVAL = 0.001
+
+
+class TimedLock:
+    """
+    threading.Lock that records per-thread acquisitions and wait time
+
+    stats maps thread name to [acquisitions, contended, total wait, max wait];
+    entries are only updated while the lock is held.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.stats: Dict[str, List[float]] = {}
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            wait = None
+        elif not blocking:
+            return False
+        else:
+            began = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            wait = time.perf_counter() - began
+        name = threading.current_thread().name
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = self.stats[name] = [0, 0, 0.0, 0.0]
+        entry[0] += 1
+        if wait is not None:
+            entry[1] += 1
+            entry[2] += wait
+            if wait > entry[3]:
+                entry[3] = wait
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def reset(self):
+        self.stats = {}
+
+
+class PhaseClock:
+    """
+    Wall and thread CPU time per thread and phase
+
+    stats maps thread name to phase to [calls, wall seconds, CPU seconds];
+    current maps thread ident to its phase for the GilProbe.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, List[float]]] = {}
+        self.current: Dict[int, str] = {}
+        self._local = threading.local()
+
+    def set_phase(self, phase: Optional[str]):
+        """End the calling thread's current phase and start `phase` (None: stop timing)"""
+        now = time.perf_counter()
+        cpu = time.thread_time()
+        local = self._local
+        table = getattr(local, 'table', None)
+        if table is None:
+            table = local.table = self.stats.setdefault(threading.current_thread().name, {})
+            local.phase = None
+        if local.phase is not None:
+            entry = table.get(local.phase)
+            if entry is None:
+                entry = table[local.phase] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += now - local.wall
+            entry[2] += cpu - local.cpu
+        local.phase, local.wall, local.cpu = phase, now, cpu
+        if phase is None:
+            self.current.pop(threading.get_ident(), None)
+        else:
+            self.current[threading.get_ident()] = phase
+
+    def totals(self) -> Dict[str, List[float]]:
+        """[calls, wall, CPU] per phase over all threads"""
+        totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        for table in self.stats.values():
+            for phase, (calls, wall, cpu) in table.items():
+                entry = totals[phase]
+                entry[0] += calls
+                entry[1] += wall
+                entry[2] += cpu
+        return dict(totals)
+
+
+class GilProbe:
+    """
+    Sleeps `interval` in a loop and records how late it wakes up
+
+    Args:
+        clock: PhaseClock whose current phases the lateness is attributed to
+        interval: Seconds the probe sleeps per tick
+        threshold: Lateness above which a tick counts as blocked
+    """
+
+    def __init__(self, clock: PhaseClock, interval: float = DEFAULT_PROBE_INTERVAL,
+                 threshold: Optional[float] = None):
+        self.clock = clock
+        self.interval = interval
+        self.threshold = interval if threshold is None else threshold
+        self.lateness = LatencyHistogram()
+        self.active: Dict[str, float] = defaultdict(float)    # seconds with a worker in the phase
+        self.blocked: Dict[str, float] = defaultdict(float)   # lateness observed during those
+        self.ticks = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'GilProbe':
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='GilProbe', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            began = time.perf_counter()
+            time.sleep(self.interval)
+            elapsed = time.perf_counter() - began
+            late = max(0.0, elapsed - self.interval)
+            self.lateness.record(late)
+            self.ticks += 1
+            for phase in set(list(self.clock.current.values())):
+                self.active[phase] += elapsed
+                if late > self.threshold:
+                    self.blocked[phase] += late
+
+    def blocked_share(self, phase: str) -> Optional[float]:
+        active = self.active.get(phase, 0.0)
+        return self.blocked.get(phase, 0.0) / active if active > 0 else None
+
+
+def verdict(occupancy: float, blocked_share: Optional[float]) -> str:
+    """
+    Reading of one phase from the probe
+
+    Args:
+        occupancy: CPU seconds the phase used per second a worker was in it;
+            about 1.0 when it keeps one core busy, whatever the thread count
+        blocked_share: GilProbe.blocked_share() of the phase
+    """
+    if blocked_share is None:
+        return ''
+    if blocked_share >= 0.5:
+        return 'holds the GIL (CPU-bound)' if occupancy >= 0.5 else 'holds the GIL while blocked'
+    if occupancy >= 0.8:
+        return 'CPU-bound'
+    if blocked_share < 0.2 and occupancy < 0.2:
+        return 'waits without the GIL'
+    return 'mixed'
+
+
+def print_contention(locks: Sequence[TimedLock], clock: PhaseClock, probe: Optional[GilProbe],
+                     indent: str = '  '):
+    """Per-thread phase times and lock waits, then the per-phase GIL estimate"""
+    for thread in sorted(clock.stats, key=lambda name: (len(name), name)):
+        print(f"{indent}{thread}:")
+        print(f"{indent}  {'Phase':<10} {'Calls':>8} {'Wall ms':>11} {'CPU ms':>10} {'CPU %':>7}")
+        for phase, (calls, wall, cpu) in sorted(clock.stats[thread].items(), key=lambda kv: -kv[1][1]):
+            print(f"{indent}  {phase:<10} {calls:>8} {wall * 1000:>11.1f} {cpu * 1000:>10.1f} "
+                  f"{(cpu / wall if wall > 0 else 0):>7.1%}")
+        for lock in locks:
+            entry = lock.stats.get(thread)
+            if entry:
+                acquisitions, contended, wait, longest = entry
+                print(f"{indent}  {lock.name}: {acquisitions} acquisitions, {contended} waited, "
+                      f"{wait * 1000:.2f}ms total, {longest * 1000:.2f}ms max")
+
+    totals = clock.totals()
+    print(f"{indent}All threads:")
+    print(f"{indent}  {'Phase':<10} {'Calls':>8} {'Wall ms':>11} {'CPU %':>7} {'GIL blk %':>10}  Reading")
+    for phase, (calls, wall, cpu) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+        cpu_share = cpu / wall if wall > 0 else 0.0
+        blocked = probe.blocked_share(phase) if probe is not None else None
+        blocked_text = f"{blocked:.1%}" if blocked is not None else '-'
+        occupancy = cpu / probe.active[phase] if blocked is not None else 0.0
+        print(f"{indent}  {phase:<10} {calls:>8} {wall * 1000:>11.1f} {cpu_share:>7.1%} {blocked_text:>10}  "
+              f"{verdict(occupancy, blocked)}".rstrip())
+    for lock in locks:
+        entries = list(lock.stats.values())
+        if entries:
+            print(f"{indent}  {lock.name}: {sum(e[0] for e in entries):,} acquisitions, "
+                  f"{sum(e[1] for e in entries):,} waited, {sum(e[2] for e in entries) * 1000:.2f}ms total wait")
+    if probe is not None and probe.ticks:
+        print(f"{indent}  GIL probe: {probe.ticks:,} ticks of {probe.interval * 1000:g}ms, wake-up lateness "
+              f"p50 {probe.lateness.percentile(50) * 1000:.2f}ms, p99 {probe.lateness.percentile(99) * 1000:.2f}ms, "
+              f"max {probe.lateness.max * 1000:.2f}ms")
+    print(f"{indent}  GIL blk % is the probe's lateness while a worker was in the phase, per second of it")
+
+
+def _demo_worker(clock: PhaseClock, lock: TimedLock, seconds: float, hold_gil: bool):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        clock.set_phase('execute')
+        if hold_gil:
+            # A busy loop stands in for a driver call that keeps the GIL
+            end = time.perf_counter() + 0.005
+            while time.perf_counter() < end:
+                pass
+        else:
+            time.sleep(0.005)
+        clock.set_phase('stats')
+        with lock:
+            sum(range(200))
+    clock.set_phase(None)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Lock wait and GIL instrumentation used by the query runner (--contention)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Two simulated drivers: one sleeps without the GIL, one spins holding it
+  python contention.py --demo --threads 4 --seconds 2
+        """
+    )
+    parser.add_argument('--demo', action='store_true', help='Run simulated workers and print the report')
+    parser.add_argument('--threads', type=int, default=4, help='Worker threads for --demo (default: 4)')
+    parser.add_argument('--seconds', type=float, default=2.0, help='Seconds per scenario (default: 2)')
+    args = parser.parse_args()
+
+    if not args.demo:
+        parser.print_help()
+        return 1
+    if args.threads < 1 or args.seconds <= 0:
+        print("Error: --threads must be at least 1 and --seconds positive")
+        return 1
+
+    for hold_gil in (False, True):
+        clock = PhaseClock()
+        lock = TimedLock('stats_lock')
+        probe = GilProbe(clock).start()
+        threads = [threading.Thread(target=_demo_worker, args=(clock, lock, args.seconds, hold_gil),
+                                    name=f"QueryWorker-{i + 1}") for i in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        probe.stop()
+        print("=" * 80)
+        print(f"Simulated driver that {'holds the GIL (busy loop)' if hold_gil else 'sleeps without the GIL'}")
+        print("=" * 80)
+        print_contention([lock], clock, probe)
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Error Policy - Classify driver errors and retry the transient ones
+
+Both drivers raise exceptions whose text carries the ODBC SQLSTATE and the
+SQL Server error number, e.g. pyodbc's
+
+    ('40001', '[40001] [Microsoft][ODBC Driver 18 for SQL Server][SQL Server]
+     Transaction (Process ID 52) was deadlocked ... (1205) (SQLExecDirectW)')
+
+classify() pulls both out and maps them to a small set of classes:
+
+    deadlock     1205, SQLSTATE 40001                        transient
+    timeout      -2, SQLSTATE HYT00/HYT01                    transient
+    connection   SQLSTATE 08xxx, 10053/10054/10060, 233, ... transient
+    throttling   40501, 10928/10929, 49918-49920             transient
+    login        18456, SQLSTATE 28000                       permanent
+    syntax       SQLSTATE 42xxx, 102, 207, 208               permanent
+    constraint   SQLSTATE 23xxx, 2601, 2627, 547             permanent
+    other        anything else                               permanent
+
+RetryPolicy retries the classes it is given (the transient ones by default)
+with capped exponential backoff and full jitter, so threads that failed
+together do not retry in lockstep.
+
+Usage:
+    from error_policy import RetryPolicy, classify
+
+    policy = RetryPolicy(max_retries=3)
+    error = classify(exc)
+    if policy.should_retry(error, attempt):
+        time.sleep(policy.backoff(attempt, rng))
+
+    python error_policy.py --classify "[08S01] Communication link failure (10054)"
+    python error_policy.py --backoff --max-retries 5
+"""
+
+import re
+import sys
+import random
+import argparse
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from latency_histogram import LatencyHistogram
+
+
+ERROR_CLASSES = ['deadlock', 'timeout', 'connection', 'throttling', 'login', 'syntax', 'constraint', 'other']
+TRANSIENT_CLASSES = frozenset(['deadlock', 'timeout', 'connection', 'throttling'])
+
+_BY_NUMBER = {
+    1205: 'deadlock',
+    -2: 'timeout',
+    53: 'connection', 64: 'connection', 121: 'connection', 233: 'connection',
+    10053: 'connection', 10054: 'connection', 10060: 'connection',
+    40197: 'connection', 40613: 'connection',
+    40501: 'throttling', 10928: 'throttling', 10929: 'throttling',
+    49918: 'throttling', 49919: 'throttling', 49920: 'throttling',
+    18456: 'login',
+    102: 'syntax', 207: 'syntax', 208: 'syntax',
+    547: 'constraint', 2601: 'constraint', 2627: 'constraint',
+}
+
+# SQLSTATE prefixes, longest first
+_BY_SQLSTATE = [
+    ('40001', 'deadlock'),
+    ('HYT', 'timeout'),
+    ('08', 'connection'),
+    ('28', 'login'),
+    ('42', 'syntax'),
+    ('23', 'constraint'),
+]
+
+_SQLSTATE = re.compile(r'\[([0-9A-Z]{5})\]|SQLSTATE[=: ]+([0-9A-Z]{5})')
+_NUMBER = re.compile(r'\((-?\d+)\)\s*(?:\(SQL\w+\)|$)|\bError (?:number )?(-?\d+)\b')
+
+
+class ClassifiedError:
+    """An exception reduced to its class, SQLSTATE, error number and message"""
+
+    __slots__ = ('error_class', 'sqlstate', 'number', 'message', 'exception_type')
+
+    def __init__(self, error_class: str, sqlstate: Optional[str], number: Optional[int],
+                 message: str, exception_type: str = 'Exception'):
+        self.error_class = error_class
+        self.sqlstate = sqlstate
+        self.number = number
+        self.message = message
+        self.exception_type = exception_type
+
+    @property
+    def transient(self) -> bool:
+        return self.error_class in TRANSIENT_CLASSES
+
+    def as_dict(self) -> Dict[str, object]:
+        return {'error_class': self.error_class, 'sqlstate': self.sqlstate, 'error_number': self.number,
+                'error': self.message, 'error_type': self.exception_type}
+
+    def __str__(self) -> str:
+        codes = ' '.join(c for c in (self.sqlstate, None if self.number is None else str(self.number)) if c)
+        return f"{self.error_class}" + (f" ({codes})" if codes else '') + f": {self.message}"
+
+
+def _codes(exc: BaseException) -> Tuple[Optional[str], Optional[int]]:
+    sqlstate = getattr(exc, 'sqlstate', None)
+    number = getattr(exc, 'number', None)
+    args = getattr(exc, 'args', ())
+    if sqlstate is None and args and isinstance(args[0], str) and re.fullmatch(r'[0-9A-Z]{5}', args[0]):
+        sqlstate = args[0]
+    text = str(exc)
+    if sqlstate is None:
+        match = _SQLSTATE.search(text)
+        if match:
+            sqlstate = match.group(1) or match.group(2)
+    if number is None:
+        for match in _NUMBER.finditer(text):
+            number = int(match.group(1) or match.group(2))
+    return sqlstate, number
+
+
+def classify(exc: BaseException) -> ClassifiedError:
+    """Map a driver (or socket) exception to one of ERROR_CLASSES"""
+    sqlstate, number = _codes(exc)
+    error_class = _BY_NUMBER.get(number) if number is not None else None
+    if error_class is None and sqlstate:
+        error_class = next((cls for prefix, cls in _BY_SQLSTATE if sqlstate.startswith(prefix)), None)
+    if error_class is None:
+        if isinstance(exc, TimeoutError):
+            error_class = 'timeout'
+        elif isinstance(exc, (ConnectionError, EOFError)):
+            error_class = 'connection'
+        else:
+            error_class = 'other'
+    return ClassifiedError(error_class, sqlstate, number, str(exc).strip(), type(exc).__name__)
+
+
+class RetryPolicy:
+    """
+    Which error classes to retry, how often and how long to back off
+
+    Args:
+        max_retries: Retries after the first attempt (0 disables retrying)
+        base_delay: Backoff cap of the first retry (seconds)
+        max_delay: Upper bound of the backoff cap (seconds)
+        retry_on: Error classes to retry (default: the transient ones)
+    """
+
+    def __init__(self, max_retries: int = 0, base_delay: float = 0.05, max_delay: float = 2.0,
+                 retry_on: Optional[Iterable[str]] = None):
+        retry_on = TRANSIENT_CLASSES if retry_on is None else frozenset(retry_on)
+        unknown = sorted(set(retry_on) - set(ERROR_CLASSES))
+        if unknown:
+            raise ValueError(f"Unknown error classes: {', '.join(unknown)}")
+        if max_retries < 0 or base_delay < 0 or max_delay < base_delay:
+            raise ValueError("Retry counts and delays must be non-negative, with max delay >= base delay")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on: FrozenSet[str] = retry_on
+
+    def should_retry(self, error: ClassifiedError, attempt: int) -> bool:
+        """attempt is 1 for the first try"""
+        return attempt <= self.max_retries and error.error_class in self.retry_on
+
+    def backoff(self, attempt: int, rng: random.Random) -> float:
+        """Full-jitter delay before retry number `attempt`: uniform(0, min(max, base * 2^(attempt-1)))"""
+        return rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def describe(self) -> str:
+        if not self.max_retries:
+            return 'off'
+        return (f"{self.max_retries} retries on {', '.join(c for c in ERROR_CLASSES if c in self.retry_on)}; "
+                f"backoff {self.base_delay:g}s doubling to {self.max_delay:g}s, full jitter")
+
+
+class ErrorStats:
+    """
+    Per-class error counters and latency-to-success; not thread-safe
+
+    Per class:
+        attempts   failed attempts of this class, retried or not
+        retried    failed attempts that were retried
+        recovered  operations that succeeded after a retry of this class
+        failed     operations that gave up on an error of this class
+        to_success latency from the first attempt to success of recovered operations
+    """
+
+    def __init__(self):
+        self.classes: Dict[str, Dict[str, object]] = {}
+
+    def _entry(self, error_class: str) -> Dict[str, object]:
+        entry = self.classes.get(error_class)
+        if entry is None:
+            entry = self.classes[error_class] = {'attempts': 0, 'retried': 0, 'recovered': 0, 'failed': 0,
+                                                 'to_success': LatencyHistogram(), 'sample': None}
+        return entry
+
+    def record(self, errors: List[ClassifiedError], success: bool, elapsed: float):
+        """Record one operation: the errors of its failed attempts, in order"""
+        for i, error in enumerate(errors):
+            entry = self._entry(error.error_class)
+            entry['attempts'] += 1
+            entry['sample'] = entry['sample'] or str(error)
+            if success or i < len(errors) - 1:
+                entry['retried'] += 1
+        if success:
+            for error_class in {e.error_class for e in errors}:
+                entry = self._entry(error_class)
+                entry['recovered'] += 1
+                entry['to_success'].record(elapsed)
+        elif errors:
+            self._entry(errors[-1].error_class)['failed'] += 1
+
+    def merge(self, other: 'ErrorStats') -> 'ErrorStats':
+        for error_class, theirs in other.classes.items():
+            entry = self._entry(error_class)
+            for key in ('attempts', 'retried', 'recovered', 'failed'):
+                entry[key] += theirs[key]
+            entry['to_success'].merge(theirs['to_success'])
+            entry['sample'] = entry['sample'] or theirs['sample']
+        return self
+
+    def as_dict(self) -> Dict[str, Dict[str, object]]:
+        """JSON-serializable form of the counters (from_dict() restores it)"""
+        return {error_class: dict(entry, to_success=entry['to_success'].as_dict())
+                for error_class, entry in self.classes.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, object]]) -> 'ErrorStats':
+        stats = cls()
+        for error_class, entry in data.items():
+            stats.classes[error_class] = dict(entry, to_success=LatencyHistogram.from_dict(entry['to_success']))
+        return stats
+
+    def rows(self) -> List[Tuple[str, Dict[str, object]]]:
+        return [(c, self.classes[c]) for c in ERROR_CLASSES if c in self.classes]
+
+
+def print_error_stats(error_stats: ErrorStats, indent: str = '  '):
+    """Table of the per-class counters and latency-to-success"""
+    print(f"{indent}{'Class':<11} {'Attempts':>8} {'Retried':>8} {'Recovered':>9} {'Failed':>7} "
+          f"{'p50 ms':>9} {'p99 ms':>9}  Example")
+    for error_class, entry in error_stats.rows():
+        hist = entry['to_success']
+        p50 = f"{hist.percentile(50) * 1000:.2f}" if hist.count else '-'
+        p99 = f"{hist.percentile(99) * 1000:.2f}" if hist.count else '-'
+        print(f"{indent}{error_class:<11} {entry['attempts']:>8} {entry['retried']:>8} {entry['recovered']:>9} "
+              f"{entry['failed']:>7} {p50:>9} {p99:>9}  {str(entry['sample'])[:60]}")
+    print(f"{indent}p50/p99 are first attempt to success, backoff included, of recovered operations")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Classify driver error messages and preview the retry backoff schedule',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Which class (and whether it is retried) for an error message
+  python error_policy.py --classify "[40001] ... was deadlocked on lock resources ... (1205) (SQLExecDirectW)"
+
+  # Sampled backoff delays for 5 retries
+  python error_policy.py --backoff --max-retries 5 --base-delay 0.1 --max-delay 2
+        """
+    )
+    parser.add_argument('--classify', metavar='MESSAGE', nargs='+', help='Error messages to classify')
+    parser.add_argument('--backoff', action='store_true', help='Print sampled backoff delays per retry')
+    parser.add_argument('--max-retries', type=int, default=3, help='Retries for --backoff (default: 3)')
+    parser.add_argument('--base-delay', type=float, default=0.05, help='First backoff cap in seconds (default: 0.05)')
+    parser.add_argument('--max-delay', type=float, default=2.0, help='Largest backoff cap in seconds (default: 2.0)')
+    parser.add_argument('--seed', type=int, help='Random seed for --backoff')
+    args = parser.parse_args()
+
+    if not args.classify and not args.backoff:
+        parser.print_help()
+        return 1
+    try:
+        policy = RetryPolicy(args.max_retries, args.base_delay, args.max_delay)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    print("=" * 80)
+    for message in args.classify or []:
+        error = classify(Exception(message))
+        print(f"{'retry' if policy.should_retry(error, 1) else 'fail':<6} {error}")
+    if args.backoff:
+        rng = random.Random(args.seed)
+        print(f"Retry policy: {policy.describe()}")
+        for attempt in range(1, policy.max_retries + 1):
+            cap = min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1)))
+            samples = sorted(policy.backoff(attempt, rng) for _ in range(5))
+            print(f"  retry {attempt}: cap {cap:.3f}s  samples " + ' '.join(f"{s:.3f}" for s in samples))
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
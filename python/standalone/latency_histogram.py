@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram - Fixed-precision latency recording for the query runners
+
+Latencies are recorded in microseconds into log-linear buckets: values
+below 256us are exact, larger values share a bucket with everything
+within 1/128 (~0.8%) of them, no matter how large. Recording is a dict
+increment, memory is bounded by the value range (a few thousand buckets
+between 1us and one hour), and histograms from different threads can be
+merged before percentiles are read.
+
+Usage:
+    from latency_histogram import LatencyHistogram
+
+    hist = LatencyHistogram()
+    hist.record(0.0042)                 # seconds
+    print(hist.percentile(99))          # seconds
+
+    python latency_histogram.py --demo
+"""
+
+import sys
+import random
+import argparse
+from typing import Dict, Iterable, List, Tuple
+
+
+SUB_BUCKETS = 128           # buckets per power of two above the exact range
+_EXACT = 2 * SUB_BUCKETS    # values below this get a bucket each
+
+
+def bucket_index(micros: int) -> int:
+    """Bucket holding a non-negative integer microsecond value"""
+    if micros < _EXACT:
+        return micros
+    shift = micros.bit_length() - 8
+    return _EXACT + (shift - 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+
+def bucket_range(index: int) -> Tuple[int, int]:
+    """Lowest and highest microsecond value of a bucket"""
+    if index < _EXACT:
+        return index, index
+    shift = (index - _EXACT) // SUB_BUCKETS + 1
+    mantissa = (index - _EXACT) % SUB_BUCKETS + SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram; not thread-safe, merge per-thread copies instead"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """Record one latency given in seconds"""
+        index = bucket_index(int(seconds * 1_000_000)) if seconds > 0 else 0
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Add another histogram's samples into this one"""
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def snapshot(self) -> 'LatencyHistogram':
+        """Copy, safe to take while another thread records (each field is copied atomically)"""
+        copy = LatencyHistogram()
+        copy.counts = dict(self.counts)
+        copy.count = sum(copy.counts.values())
+        copy.total = self.total
+        copy.min = self.min
+        copy.max = self.max
+        return copy
+
+    def since(self, earlier: 'LatencyHistogram') -> 'LatencyHistogram':
+        """
+        Samples recorded between two snapshots: newer.since(older)
+
+        Histograms only grow, so this is the per-bucket difference; min and
+        max are those of the lowest and highest bucket that grew.
+        """
+        delta = LatencyHistogram()
+        for index, n in self.counts.items():
+            n -= earlier.counts.get(index, 0)
+            if n > 0:
+                delta.counts[index] = n
+        if delta.counts:
+            delta.count = sum(delta.counts.values())
+            delta.total = max(0.0, self.total - earlier.total)
+            delta.min = bucket_range(min(delta.counts))[0] / 1_000_000
+            delta.max = bucket_range(max(delta.counts))[1] / 1_000_000
+        return delta
+
+    def as_dict(self) -> Dict[str, object]:
+        """JSON-serializable form, e.g. to merge histograms of several processes"""
+        return {'counts': {str(index): n for index, n in self.counts.items()}, 'count': self.count,
+                'total': self.total, 'min': self.min if self.count else None, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'LatencyHistogram':
+        hist = cls()
+        hist.counts = {int(index): int(n) for index, n in data['counts'].items()}
+        hist.count = int(data['count'])
+        hist.total = float(data['total'])
+        hist.min = float('inf') if data['min'] is None else float(data['min'])
+        hist.max = float(data['max'])
+        return hist
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Latency in seconds at percentile p (0-100), accurate to the bucket width"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(p / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = bucket_range(index)
+                value = (low + high) / 2 / 1_000_000
+                # The bucket midpoint can lie outside the observed extremes
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def percentiles(self, ps: Iterable[float] = (50, 90, 99, 99.9)) -> Dict[float, float]:
+        return {p: self.percentile(p) for p in ps}
+
+    def buckets(self) -> List[Tuple[float, float, int]]:
+        """(low seconds, high seconds, count) for every non-empty bucket, ascending"""
+        return [(bucket_range(i)[0] / 1_000_000, bucket_range(i)[1] / 1_000_000, self.counts[i])
+                for i in sorted(self.counts)]
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f}"
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Log-linear latency histogram used by the query runners',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Record a synthetic lognormal latency distribution and print its percentiles
+  python latency_histogram.py --demo --samples 100000
+        """
+    )
+    parser.add_argument('--demo', action='store_true', help='Record synthetic latencies and print percentiles')
+    parser.add_argument('--samples', type=int, default=100_000, help='Samples for --demo (default: 100000)')
+    args = parser.parse_args()
+
+    if not args.demo:
+        parser.print_help()
+        return 1
+    if args.samples < 1:
+        print("Error: --samples must be positive")
+        return 1
+
+    rng = random.Random(42)
+    samples = [rng.lognormvariate(-5, 0.8) for _ in range(args.samples)]
+    hist = LatencyHistogram()
+    for value in samples:
+        hist.record(value)
+    samples.sort()
+
+    print("=" * 80)
+    print(f"Latency Histogram Demo - {args.samples:,} lognormal samples, {len(hist.counts)} buckets")
+    print("=" * 80)
+    print(f"{'Percentile':>10} {'Histogram ms':>14} {'Exact ms':>10} {'Error':>8}")
+    print("-" * 80)
+    for p, value in hist.percentiles((50, 90, 99, 99.9)).items():
+        exact = samples[max(0, int(round(p / 100.0 * len(samples))) - 1)]
+        print(f"{p:>10} {format_ms(value):>14} {format_ms(exact):>10} {(value - exact) / exact:>8.2%}")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Leak Hunt - RSS/FD trend analysis and tracemalloc attribution for long runs
+
+The resource usage files of the query runners show RSS and FD counts
+every 100 iterations, but someone has to read them. LeakHunter samples
+the process on a timeline while the runner works, fits RSS, FD and thread
+counts against the number of completed iterations (every iteration opens
+and closes one connection), and flags a suspected leak when the growth is
+both steady (good linear fit) and larger than a threshold.
+
+With tracemalloc enabled, snapshots are taken at intervals and compared
+to a baseline, so Python-side growth can be attributed to allocation
+sites. Growth that shows in RSS but not in tracemalloc is native (driver
+or ODBC) memory.
+
+Usage:
+    python parallel_query_runner.py -c "Server=..." -t 4 -i 5000 --leak-hunt
+    python parallel_query_runner.py -c "Server=..." -t 4 -i 5000 --leak-hunt --tracemalloc
+    python leak_hunt.py --analyze query_results/leak_timeline_20250101_120000.csv
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+import psutil
+
+
+DEFAULT_SAMPLE_INTERVAL = 1.0
+DEFAULT_RSS_THRESHOLD = 1024        # bytes per iteration
+DEFAULT_FD_THRESHOLD = 0.01         # descriptors per iteration (one per 100 iterations)
+MIN_R_SQUARED = 0.7
+MIN_SAMPLES = 10
+
+TIMELINE_FIELDS = ['elapsed_s', 'iterations', 'measured', 'rss_mb', 'vms_mb', 'num_fds', 'num_threads',
+                   'traced_mb']
+
+
+def linear_fit(xs: List[float], ys: List[float]) -> Tuple[float, float, float]:
+    """Least-squares line through (xs, ys): (slope, intercept, r squared)"""
+    n = len(xs)
+    if n < 2:
+        return 0.0, ys[0] if ys else 0.0, 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    if sxx == 0:
+        return 0.0, mean_y, 0.0
+    slope = sxy / sxx
+    r_squared = (sxy * sxy) / (sxx * syy) if syy > 0 else 0.0
+    return slope, mean_y - slope * mean_x, r_squared
+
+
+def analyze(samples: List[Dict[str, Any]], rss_threshold: float = DEFAULT_RSS_THRESHOLD,
+            fd_threshold: float = DEFAULT_FD_THRESHOLD) -> Dict[str, Any]:
+    """
+    Fit growth per iteration over the measured (post warm-up) samples
+
+    Returns:
+        Dictionary with per-metric fits, the verdict and its reasons
+    """
+    measured = [s for s in samples if s['measured']]
+    result: Dict[str, Any] = {'samples': len(measured), 'suspected': False, 'reasons': [], 'fits': {}}
+    if len(measured) < MIN_SAMPLES or measured[-1]['iterations'] <= measured[0]['iterations']:
+        result['reasons'].append(f"not enough data ({len(measured)} samples after warm-up, "
+                                 f"need {MIN_SAMPLES} spanning several iterations)")
+        return result
+
+    xs = [float(s['iterations']) for s in measured]
+    span = xs[-1] - xs[0]
+    for metric, scale in (('rss', 1024 * 1024), ('num_fds', 1), ('num_threads', 1)):
+        key = 'rss_mb' if metric == 'rss' else metric
+        ys = [s[key] * scale for s in measured]
+        slope, _, r_squared = linear_fit(xs, ys)
+        # Growth must also persist: the second half on its own keeps rising
+        half = len(xs) // 2
+        late_slope, _, _ = linear_fit(xs[half:], ys[half:])
+        result['fits'][metric] = {'slope': slope, 'r_squared': r_squared, 'late_slope': late_slope,
+                                  'growth': ys[-1] - ys[0]}
+
+    rss = result['fits']['rss']
+    if rss['slope'] > rss_threshold and rss['r_squared'] >= MIN_R_SQUARED and rss['late_slope'] > rss_threshold / 2:
+        result['suspected'] = True
+        result['reasons'].append(f"RSS grows {rss['slope']:,.0f} bytes/iteration (R^2 {rss['r_squared']:.2f}) "
+                                 f"= {rss['slope'] * 1_000_000 / (1024 * 1024):,.0f} MB per 1M iterations")
+    for metric, label in (('num_fds', 'file descriptors'), ('num_threads', 'threads')):
+        fit = result['fits'][metric]
+        if fit['slope'] > fd_threshold and fit['r_squared'] >= MIN_R_SQUARED and fit['growth'] > 0:
+            result['suspected'] = True
+            result['reasons'].append(f"{label} grow {fit['slope'] * 1000:.1f} per 1000 iterations "
+                                     f"(R^2 {fit['r_squared']:.2f}, +{fit['growth']:.0f} over {span:,.0f})")
+    return result
+
+
+class LeakHunter:
+    """
+    Samples RSS, FDs, threads (and optionally tracemalloc) on a background thread
+
+    Args:
+        iterations: Callable returning the iterations completed so far
+        measuring: Set once warm-up is over; earlier samples are not fitted
+        output_path: CSV file for the timeline, or None
+        interval: Seconds between samples
+        use_tracemalloc: Trace Python allocations and snapshot them
+        snapshot_every: Take a tracemalloc snapshot every N samples
+        rss_threshold: Bytes per iteration above which RSS growth is a suspected leak
+        fd_threshold: Descriptors (or threads) per iteration above which growth is flagged
+    """
+
+    def __init__(self, iterations: Callable[[], int], measuring: threading.Event,
+                 output_path: Optional[str] = None, interval: float = DEFAULT_SAMPLE_INTERVAL,
+                 use_tracemalloc: bool = False, snapshot_every: int = 10,
+                 rss_threshold: float = DEFAULT_RSS_THRESHOLD, fd_threshold: float = DEFAULT_FD_THRESHOLD):
+        self.iterations = iterations
+        self.measuring = measuring
+        self.output_path = output_path
+        self.interval = interval
+        self.use_tracemalloc = use_tracemalloc
+        self.snapshot_every = snapshot_every
+        self.rss_threshold = rss_threshold
+        self.fd_threshold = fd_threshold
+        self.process = psutil.Process()
+        self.samples: List[Dict[str, Any]] = []
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.latest: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+
+    def start(self) -> 'LeakHunter':
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._started_tracemalloc = True
+        self._start = time.time()
+        self._thread = threading.Thread(target=self._run, name='LeakHunter', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+        if self.use_tracemalloc and self.baseline is not None:
+            self.latest = self._snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        if self.output_path:
+            self.write_timeline(self.output_path)
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),     # the samples list itself
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+    def sample(self) -> Dict[str, Any]:
+        mem = self.process.memory_info()
+        measured = self.measuring.is_set()
+        sample = {
+            'elapsed_s': round(time.time() - self._start, 3),
+            'iterations': self.iterations(),
+            'measured': measured,
+            'rss_mb': round(mem.rss / (1024 * 1024), 3),
+            'vms_mb': round(mem.vms / (1024 * 1024), 3),
+            'num_fds': self.process.num_fds() if hasattr(self.process, 'num_fds') else 0,
+            'num_threads': self.process.num_threads(),
+            'traced_mb': round(tracemalloc.get_traced_memory()[0] / (1024 * 1024), 3)
+                         if tracemalloc.is_tracing() else 0.0,
+        }
+        self.samples.append(sample)
+        return sample
+
+    def _run(self):
+        count = 0
+        while not self._done.wait(self.interval):
+            sample = self.sample()
+            if not self.use_tracemalloc or not sample['measured']:
+                continue
+            if self.baseline is None:
+                self.baseline = self._snapshot()
+            elif count % self.snapshot_every == 0:
+                self.latest = self._snapshot()
+            count += 1
+
+    def write_timeline(self, path: str):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=TIMELINE_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.samples)
+
+    def top_growth(self, limit: int = 10) -> List[tracemalloc.StatisticDiff]:
+        """Allocation sites that grew most between the baseline and the latest snapshot"""
+        if self.baseline is None or self.latest is None:
+            return []
+        diffs = self.latest.compare_to(self.baseline, 'lineno')
+        return [d for d in diffs if d.size_diff > 0][:limit]
+
+    def report(self):
+        """Print the fitted growth, top allocation sites and the verdict"""
+        result = analyze(self.samples, self.rss_threshold, self.fd_threshold)
+        print_report(result, self.samples)
+        growth = self.top_growth()
+        if growth:
+            print("\n  Top Python allocation growth since warm-up (tracemalloc):")
+            for diff in growth:
+                frame = diff.traceback[0]
+                print(f"    {diff.size_diff / 1024:>10,.1f} KB {diff.count_diff:>+8,} blocks  "
+                      f"{frame.filename}:{frame.lineno}")
+        elif self.use_tracemalloc:
+            print("\n  tracemalloc: no Python allocation growth since warm-up")
+        if self.output_path:
+            print(f"\n  Timeline saved to: {self.output_path}")
+        return result
+
+
+def print_report(result: Dict[str, Any], samples: List[Dict[str, Any]]):
+    print("\n" + "-" * 80)
+    print("Leak Hunt:")
+    print(f"  Samples:           {len(samples)} ({result['samples']} after warm-up)")
+    labels = {'rss': ('RSS', 'bytes'), 'num_fds': ('FDs', 'fds'), 'num_threads': ('Threads', 'threads')}
+    for metric, fit in result['fits'].items():
+        label, unit = labels[metric]
+        growth = fit['growth'] / (1024 * 1024) if metric == 'rss' else fit['growth']
+        growth_unit = 'MB' if metric == 'rss' else unit
+        print(f"  {label + ' Growth:':<18} {fit['slope']:>12,.3f} {unit}/iteration  R^2 {fit['r_squared']:.2f}  "
+              f"({growth:+,.1f} {growth_unit} total)")
+    if result['suspected']:
+        print("  Verdict:           SUSPECTED LEAK")
+    else:
+        print("  Verdict:           no leak detected")
+    for reason in result['reasons']:
+        print(f"    - {reason}")
+
+
+def load_timeline(path: str) -> List[Dict[str, Any]]:
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    samples = []
+    for row in rows:
+        sample: Dict[str, Any] = {k: float(row[k]) for k in TIMELINE_FIELDS if k not in ('measured',)}
+        sample['measured'] = row['measured'] == 'True'
+        samples.append(sample)
+    return samples
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Analyze a leak-hunt timeline written by the query runner',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Re-analyze a saved timeline with a stricter RSS threshold
+  python leak_hunt.py --analyze query_results/leak_timeline_20250101_120000.csv --rss-threshold 256
+        """
+    )
+    parser.add_argument('--analyze', metavar='CSV', help='Timeline CSV to analyze')
+    parser.add_argument('--rss-threshold', type=float, default=DEFAULT_RSS_THRESHOLD,
+                        help=f'RSS bytes per iteration that count as a leak (default: {DEFAULT_RSS_THRESHOLD})')
+    parser.add_argument('--fd-threshold', type=float, default=DEFAULT_FD_THRESHOLD,
+                        help=f'FDs/threads per iteration that count as a leak (default: {DEFAULT_FD_THRESHOLD})')
+    args = parser.parse_args()
+
+    if not args.analyze:
+        parser.print_help()
+        return 1
+    if not os.path.exists(args.analyze):
+        print(f"Error: {args.analyze} not found")
+        return 1
+    samples = load_timeline(args.analyze)
+    result = analyze(samples, args.rss_threshold, args.fd_threshold)
+    print_report(result, samples)
+    return 2 if result['suspected'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
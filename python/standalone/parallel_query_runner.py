@@ -9,17 +9,33 @@ simulate concurrent database operations.
 Usage:
     python parallel_query_runner.py --connection-string "Server=..." --threads 4 --iterations 10
     python parallel_query_runner.py -c "Server=..." -t 4 -i 10 --query "SELECT * FROM Users"
+    python parallel_query_runner.py -c "Server=..." -i 20 --packet-size-sweep 512 4096 8000 32767
+    python parallel_query_runner.py -c "Server=..." -t 4 --warmup-iterations 5 --steady-state
+    python parallel_query_runner.py -c "Server=..." -t 8 -i 1000 --workload mixed.json
+    python parallel_query_runner.py -c "Server=..." -t 4 -i 5000 --leak-hunt --tracemalloc
+    python parallel_query_runner.py -c "Server=..." -t 8 --duration 10m --stats-interval 30
+    python parallel_query_runner.py -c "Server=..." -t 8 -i 1000 --retries 3
+    python parallel_query_runner.py -c "Server=..." --replay traffic.csv --speed 2
+    python parallel_query_runner.py -c "Server=..." --steady-state --duration 2m --concurrency-sweep 1 2 4 8 16
+    python parallel_query_runner.py -c "Server=..." -t 4 --duration 1m --profile
+    python parallel_query_runner.py -c "Server=..." -t 8 -i 500 --contention
+    python parallel_query_runner.py -c "Server=..." -t 4 -i 10 -q "SELECT * FROM Orders" --result-format columnar
 """
 
 import os
+import re
 import sys
 import time
+import random
+import signal
 import argparse
 import threading
+import statistics
+import multiprocessing
+from queue import Empty
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from collections import defaultdict
-import csv
+from typing import Optional, List, Dict, Any, Sequence, Tuple
+from collections import deque
 
 # Add mssql_python to path if needed
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'mssql-python'))
@@ -27,37 +43,205 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'mssql-python')
 import mssql_python
 import psutil
 
+from latency_histogram import LatencyHistogram, format_ms
+from workload import Workload, Statement, WorkloadError, load_workload
+from leak_hunt import LeakHunter, DEFAULT_RSS_THRESHOLD
+from timeseries_writer import TimeSeriesWriter, parquet_available
+from error_policy import RetryPolicy, ERROR_CLASSES, TRANSIENT_CLASSES, classify, print_error_stats
+from replay_log import ReplayRecord, open_recorder, log_entry, load_replay, replay_workload
+from stack_sampler import StackSampler, DEFAULT_INTERVAL
+from contention import TimedLock, PhaseClock, GilProbe, DEFAULT_PROBE_INTERVAL, print_contention
+from thread_stats import ThreadStats, merge_threads
+from columnar import ColumnarResult, RESULT_FORMATS, peak_rss
+
+
+MIN_PACKET_SIZE = 512
+MAX_PACKET_SIZE = 32767
+
+_PACKET_SIZE_KEYWORD = re.compile(r'(^|;)\s*packet\s*size\s*=[^;]*;?', re.I)
+
+# Stop reasons that cut a run short; 'duration reached' and 'steady state reached' are planned ends
+_PARTIAL_STOP_REASONS = ('interrupted', 'stalled')
+
+
+# Two-sided 95% Student t critical values by degrees of freedom; 1.96 beyond the table
+_T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+         9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+def ci_relative_half_width(samples: List[float]) -> float:
+    """Half-width of the 95% confidence interval of the mean, relative to the mean"""
+    n = len(samples)
+    mean = statistics.fmean(samples)
+    if n < 2 or mean <= 0:
+        return float('inf')
+    df = n - 1
+    t = _T_95[max(k for k in _T_95 if k <= df)] if df <= 30 else 1.96
+    return t * statistics.stdev(samples) / (n ** 0.5) / mean
+
+
+SWEEP_FIELDS = ['threads', 'processes', 'concurrency', 'queries', 'errors', 'qps', 'p50_ms', 'p99_ms',
+                'cpu_seconds', 'cpu_percent', 'efficiency', 'steady', 'stalled', 'flags']
+
+
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds from '90', '90s', '10m', '1.5h' or '1d'"""
+    text = text.strip().lower()
+    unit = _DURATION_UNITS.get(text[-1:]) if text else None
+    try:
+        seconds = float(text[:-1]) * unit if unit else float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration {text!r} (use e.g. 90, 30s, 10m, 2h)")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError("duration must be positive")
+    return seconds
+
+
+def with_packet_size(connection_string: str, packet_size: int) -> str:
+    """Return the connection string with its Packet Size keyword set to packet_size"""
+    stripped = _PACKET_SIZE_KEYWORD.sub(r'\1', connection_string).rstrip(';')
+    return f"{stripped};Packet Size={packet_size};"
+
 
 class QueryRunner:
     """Handles SQL query execution with threading support"""
     
-    def __init__(self, connection_string: str, query: str, output_dir: str, verbose: bool = False, disable_pooling: bool = False):
+    def __init__(self, connection_string: str, query: str, output_dir: str, verbose: bool = False, disable_pooling: bool = False,
+                 warmup_iterations: int = 0, warmup_seconds: float = 0.0, steady_state: bool = False,
+                 ci_threshold: float = 0.05, window: int = 10, interval: float = 1.0,
+                 workload: Optional[Workload] = None, seed: Optional[int] = None,
+                 leak_hunt: bool = False, sample_interval: float = 1.0, use_tracemalloc: bool = False,
+                 snapshot_every: int = 10, leak_threshold: float = DEFAULT_RSS_THRESHOLD,
+                 timeseries_format: str = 'csv', flush_interval: float = 1.0,
+                 duration: Optional[float] = None, stats_interval: float = 0.0,
+                 retry_policy: Optional[RetryPolicy] = None, record_path: Optional[str] = None,
+                 replay: Optional[Dict[int, List[ReplayRecord]]] = None, speed: float = 1.0,
+                 stall_timeout: float = 0.0, profile: bool = False,
+                 profile_interval: float = DEFAULT_INTERVAL, contention: bool = False,
+                 probe_interval: float = DEFAULT_PROBE_INTERVAL, result_format: str = 'count'):
         """
         Initialize the QueryRunner
         
         Args:
             connection_string: SQL Server connection string
             query: SQL query to execute
-            output_dir: Directory to store CSV files with resource usage
+            output_dir: Directory for the resource usage time series
             verbose: Enable verbose output
             disable_pooling: If True, disable connection pooling
+            warmup_iterations: Iterations per thread excluded from statistics
+            warmup_seconds: Seconds from the start excluded from statistics
+            steady_state: Stop once throughput has reached a steady state
+            ci_threshold: Steady when the 95% CI half-width of the per-interval
+                throughput is below this fraction of its mean
+            window: Number of throughput intervals the CI is computed over
+            interval: Length of one throughput interval (seconds)
+            workload: Weighted statement mix; defaults to the single query
+            seed: Seed for statement choice and parameters (thread N uses seed + N)
+            leak_hunt: Sample RSS/FDs on a timeline and report suspected leaks
+            sample_interval: Seconds between leak-hunt samples
+            use_tracemalloc: Attribute Python-side growth with tracemalloc snapshots
+            snapshot_every: Take a tracemalloc snapshot every N samples
+            leak_threshold: RSS bytes per iteration that count as a suspected leak
+            timeseries_format: 'csv' or 'parquet' for the resource usage file
+            flush_interval: Seconds between batched writes of the resource usage file
+            duration: Stop after this many seconds (None to run until the iterations are done)
+            stats_interval: Print live QPS, latency and errors every N seconds (0 to disable)
+            retry_policy: Which error classes to retry and how to back off (default: no retries)
+            record_path: Log every query (offset, thread, statement, params, duration) here
+            replay: Per-thread scripts from load_replay(); replaces the workload, one
+                worker per recorded thread, each query issued at its recorded offset
+            speed: Replay speed factor (2.0 issues the recorded traffic twice as fast)
+            stall_timeout: Stop the run when a query has been in flight this many
+                seconds, and stop waiting for the threads stuck in it (0 to disable)
+            profile: Sample the worker stacks and write them as collapsed stacks,
+                labelled with the phase (connect/execute/fetch/...) of each thread
+            profile_interval: Seconds between profiler samples
+            contention: Time the waits on stats_lock/cpu_lock and the wall vs
+                thread CPU time of each phase per thread, and run a GIL probe
+                to tell whether the driver releases the GIL while it waits
+            probe_interval: Seconds the GIL probe sleeps between wake-ups
+            result_format: How each result set is kept while it is read: 'count'
+                (rows are counted and dropped), 'dicts' (one dict per row) or
+                'columnar' (ColumnarResult)
         """
         self.connection_string = connection_string
         self.query = query
+        self.replay = replay
+        self.speed = speed
+        if replay is not None:
+            self.workload = replay_workload(replay)
+        else:
+            self.workload = workload or Workload.single(query)
+        self.seed = seed
         self.output_dir = output_dir
         self.verbose = verbose
         self.disable_pooling = disable_pooling
-        self.stats_lock = threading.Lock()
-        self.stats = defaultdict(lambda: {
-            'iterations': 0,
-            'total_time': 0.0,
-            'total_rows': 0,
-            'errors': 0,
-            'min_time': float('inf'),
-            'max_time': 0.0
-        })
+        self.result_format = result_format
+        self.contention = contention
+        # Guards the warm-up state; measured iterations go to per-thread stats without a lock
+        self.stats_lock = TimedLock('stats_lock') if contention else threading.Lock()
+        self.stats: Dict[int, ThreadStats] = {}   # thread id -> stats written only by that thread
         self.process = psutil.Process()
-        self.cpu_lock = threading.Lock()  # Lock for cpu_percent() calls
+        self.cpu_lock = TimedLock('cpu_lock') if contention else threading.Lock()  # Lock for cpu_percent() calls
+        
+        # Warm-up and steady-state detection
+        self.warmup_iterations = warmup_iterations
+        self.warmup_seconds = warmup_seconds
+        self.steady_state = steady_state
+        self.ci_threshold = ci_threshold
+        self.window = window
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.measuring = threading.Event()
+        self.measure_start = 0.0
+        self.warmup_until = 0.0
+        self.warmed_threads = set()
+        self.warmup_count = 0
+        self.num_threads = 0
+        self.steady_result: Optional[Dict[str, Any]] = None
+        
+        # Stopping and live statistics
+        self.duration = duration
+        self.stats_interval = stats_interval
+        self.stop_reason: Optional[str] = None
+        self.stall_timeout = stall_timeout
+        self.in_flight: Dict[int, float] = {}   # thread id -> start of its current query
+        self.stalled_threads = 0
+        self.live_snapshots: Dict[int, Tuple[LatencyHistogram, int]] = {}   # thread id -> (latency, errors)
+        
+        # Error classes and retries
+        self.retry_policy = retry_policy or RetryPolicy()
+        
+        # Record and replay
+        self.record_path = record_path
+        self.recorder: Optional[TimeSeriesWriter] = None
+        self.run_start = 0.0
+        
+        # Sampling profiler, started with the first run
+        self.profile = profile
+        self.profile_interval = profile_interval
+        self.profiler: Optional[StackSampler] = None
+        
+        # Lock waits and per-phase wall/CPU time, reset with each run
+        self.probe_interval = probe_interval
+        self.phase_clock: Optional[PhaseClock] = None
+        self.gil_probe: Optional[GilProbe] = None
+        
+        # Leak hunting
+        self.leak_hunt = leak_hunt
+        self.sample_interval = sample_interval
+        self.use_tracemalloc = use_tracemalloc
+        self.snapshot_every = snapshot_every
+        self.leak_threshold = leak_threshold
+        self.leak_hunter: Optional[LeakHunter] = None
+        
+        # One resource usage file shared by all worker threads, opened per run
+        self.timeseries_format = timeseries_format
+        self.flush_interval = flush_interval
+        self.timeseries: Optional[TimeSeriesWriter] = None
         
         # Handle pooling
         if disable_pooling:
@@ -69,70 +253,139 @@ class QueryRunner:
         # Generate timestamp for this run
         self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    def execute_single_query(self, thread_id: int, iteration: int) -> Dict[str, Any]:
+    def execute_single_query(self, thread_id: int, iteration: int, statement: Optional[Statement] = None,
+                             params: Optional[List[Any]] = None) -> Dict[str, Any]:
         """
         Execute a single query cycle: connect -> query -> read results -> disconnect
         
+        Failed attempts are classified; classes in the retry policy are retried
+        with jittered backoff, and execution_time runs from the first attempt
+        to the last, so it is the latency to success of a retried query.
+        
         Args:
             thread_id: ID of the thread executing the query
             iteration: Iteration number
+            statement: Workload statement to run (default: the --query statement)
+            params: Parameter values for the statement's placeholders
             
         Returns:
             Dictionary with execution statistics
         """
+        statement = statement or self.workload.statements[0]
         start_time = time.time()
         result = {
             'thread_id': thread_id,
             'iteration': iteration,
+            'statement': statement.name,
             'success': False,
             'rows_read': 0,
             'execution_time': 0.0,
-            'error': None
+            'error': None,
+            'error_class': None,
+            'attempts': 0,
+            'attempt_errors': []
         }
         
-        try:
-            # Connect to database
-            if self.verbose:
-                print(f"[Thread-{thread_id}] Iteration {iteration}: Connecting...")
-            
-            conn = mssql_python.connect(self.connection_string)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result['rows_read'] = self._run_statement(thread_id, iteration, statement, params)
+                result['success'] = True
+                
+                if self.verbose:
+                    print(f"[Thread-{thread_id}] Iteration {iteration}: Completed "
+                          f"({result['rows_read']} rows in {time.time() - start_time:.3f}s)")
+                break
             
+            except Exception as e:
+                error = classify(e)
+                result['attempt_errors'].append(error)
+                if self.retry_policy.should_retry(error, attempt) and not self.stop_event.is_set():
+                    backoff = self.retry_policy.backoff(attempt, random)
+                    if self.verbose:
+                        print(f"[Thread-{thread_id}] Iteration {iteration}: attempt {attempt} failed "
+                              f"({error.error_class}); retrying in {backoff * 1000:.0f}ms")
+                    # A stop during the backoff gives up instead of retrying
+                    self._phase('backoff')
+                    if not self.stop_event.wait(backoff):
+                        continue
+                result['error'] = str(e)
+                result['error_class'] = error.error_class
+                print(f"[Thread-{thread_id}] Iteration {iteration}: ERROR - {error}")
+                break
+        
+        result['attempts'] = attempt
+        result['execution_time'] = time.time() - start_time
+        return result
+    
+    def _run_statement(self, thread_id: int, iteration: int, statement: Statement,
+                       params: Optional[List[Any]]) -> int:
+        """One attempt of the query cycle; returns the rows read"""
+        # Connect to database
+        if self.verbose:
+            print(f"[Thread-{thread_id}] Iteration {iteration}: Connecting...")
+        
+        self._phase('connect')
+        conn = mssql_python.connect(self.connection_string)
+        try:
             # Create cursor and execute query
             if self.verbose:
                 print(f"[Thread-{thread_id}] Iteration {iteration}: Executing query...")
             
+            self._phase('execute')
             cursor = conn.cursor()
-            cursor.execute(self.query)
+            cursor.execute(statement.sql, *(params or []))
             
             # Read all results
             if self.verbose:
                 print(f"[Thread-{thread_id}] Iteration {iteration}: Reading results...")
             
+            self._phase('fetch')
             rows_read = 0
-            for row in cursor:
-                rows_read += 1
-                if self.verbose and rows_read % 1000 == 0:
-                    print(f"[Thread-{thread_id}] Read {rows_read} rows...")
+            if cursor.description is None:
+                # INSERT/UPDATE/DELETE: no result set, commit before disconnecting
+                conn.commit()
+            elif self.result_format == 'count':
+                for row in cursor:
+                    rows_read += 1
+                    if self.verbose and rows_read % 1000 == 0:
+                        print(f"[Thread-{thread_id}] Read {rows_read} rows...")
+            else:
+                rows_read = len(self._keep_rows(thread_id, cursor))
             
-            # Close cursor and connection
             cursor.close()
+        finally:
+            # Close the connection even when the attempt failed, so retries do not leak it
+            self._phase('close')
             conn.close()
-            
-            result['success'] = True
-            result['rows_read'] = rows_read
-            
-            if self.verbose:
-                print(f"[Thread-{thread_id}] Iteration {iteration}: Completed "
-                      f"({rows_read} rows in {time.time() - start_time:.3f}s)")
         
-        except Exception as e:
-            result['error'] = str(e)
-            print(f"[Thread-{thread_id}] Iteration {iteration}: ERROR - {e}")
-        
-        finally:
-            result['execution_time'] = time.time() - start_time
+        return rows_read
+    
+    def _keep_rows(self, thread_id: int, cursor, batch_size: int = 1000):
+        """The whole result set in --result-format, filled batch by batch from fetchmany()"""
+        if self.result_format == 'columnar':
+            kept = ColumnarResult(cursor.description)
+            add = kept.extend
+        else:
+            names = [entry[0] for entry in cursor.description]
+            kept = []
+            add = lambda rows: kept.extend(dict(zip(names, row)) for row in rows)
         
-        return result
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return kept
+            add(rows)
+            if self.verbose and len(kept) % 10000 < batch_size:
+                print(f"[Thread-{thread_id}] Read {len(kept)} rows...")
+    
+    def _phase(self, phase: Optional[str]):
+        """Label the calling worker's profiler samples and phase times from here on (None: done)"""
+        if self.profiler is not None and phase is not None:
+            self.profiler.set_phase(phase)
+        if self.phase_clock is not None:
+            self.phase_clock.set_phase(phase)
     
     def worker_thread(self, thread_id: int, iterations: int, delay: float):
         """
@@ -143,107 +396,133 @@ class QueryRunner:
             iterations: Number of query iterations to execute (-1 for infinite)
             delay: Delay between iterations (seconds)
         """
-        if iterations < 0:
+        if self.replay is not None:
+            print(f"[Thread-{thread_id}] Started - replaying {len(self.replay.get(thread_id, []))} queries")
+        elif iterations < 0:
             print(f"[Thread-{thread_id}] Started - running infinitely (Ctrl+C to stop)")
         else:
             print(f"[Thread-{thread_id}] Started - will run {iterations} iterations")
         
-        # Create CSV file for this thread
-        csv_filename = os.path.join(
-            self.output_dir, 
-            f"thread_{thread_id}_resources_{self.timestamp}.csv"
-        )
-        
-        with open(csv_filename, 'w', newline='') as csvfile:
-            csv_writer = csv.writer(csvfile)
-            # Write header
-            csv_writer.writerow([
-                'timestamp',
-                'iteration',
-                'rss_mb',
-                'vms_mb',
-                'cpu_percent',
-                'num_threads',
-                'num_fds',
-                'execution_time_ms'
-            ])
-            csvfile.flush()
+        rng = random.Random(None if self.seed is None else self.seed + thread_id)
+        if self.replay is not None:
+            script = self.replay.get(thread_id, [])
+            statements = {s.name: s for s in self.workload.statements}
+        stats: Optional[ThreadStats] = None  # created with the first measured iteration
+        i = 0
+        warm = 0  # warm-up iterations do not count towards the iteration limit
+        while True:
+            # Check if we should stop (for finite iterations)
+            if iterations >= 0 and i - warm >= iterations:
+                break
             
-            i = 0
-            while True:
-                # Check if we should stop (for finite iterations)
-                if iterations >= 0 and i >= iterations:
+            # Steady state reached (or run stopped)
+            if self.stop_event.is_set():
+                break
+            
+            # Execute query; iterations started before warm-up ends are not measured
+            measured = self.measuring.is_set()
+            if self.replay is not None:
+                # Replay: the next recorded query, issued at its recorded offset
+                if i >= len(script):
                     break
-                
-                # Execute query
-                result = self.execute_single_query(thread_id, i + 1)
-                
-                # Update statistics
+                record = script[i]
+                self._phase('think')
+                due = self.run_start + record.offset / self.speed
+                if self.stop_event.wait(max(0.0, due - time.time())):
+                    break
+                lag = max(0.0, time.time() - due)
+                statement, params, think_time = statements[record.statement], record.params, 0.0
+            else:
+                self._phase('workload')
+                statement = self.workload.choose(rng)
+                params = statement.bind(rng)
+            issued = time.time()
+            self.in_flight[thread_id] = issued
+            result = self.execute_single_query(thread_id, i + 1, statement, params)
+            self.in_flight.pop(thread_id, None)
+            self._phase('stats')
+            if self.replay is None:
+                think_time = statement.think(rng)
+            if self.recorder is not None:
+                self.recorder.put(log_entry(issued - self.run_start, thread_id, statement, params, result))
+            
+            # Warm-up iterations are counted separately and skip the statistics
+            if not measured:
                 with self.stats_lock:
-                    stats = self.stats[thread_id]
-                    stats['iterations'] += 1
-                    stats['total_time'] += result['execution_time']
-                    stats['total_rows'] += result['rows_read']
-                    
-                    if result['success']:
-                        stats['min_time'] = min(stats['min_time'], result['execution_time'])
-                        stats['max_time'] = max(stats['max_time'], result['execution_time'])
-                    else:
-                        stats['errors'] += 1
-                
+                    self.warmup_count += 1
+                    if i + 1 >= self.warmup_iterations:
+                        self.warmed_threads.add(thread_id)
+                    self._check_warmup()
                 i += 1
+                warm += 1
+                if delay + think_time > 0:
+                    self._phase('think')
+                    self.stop_event.wait(delay + think_time)
+                continue
+            
+            # Update statistics; this thread is the only writer of its ThreadStats
+            if stats is None:
+                stats = self.stats.setdefault(thread_id, ThreadStats())
+            stats.record(statement.name, result, lag if self.replay is not None else None)
+            
+            i += 1
+            
+            # Emit resource usage every 100 iterations or on last iteration
+            should_emit = False
+            is_last_iteration = False
+            
+            if i % 100 == 0:
+                should_emit = True
+            elif iterations >= 0 and i - warm >= iterations:
+                should_emit = True
+                is_last_iteration = True
+            
+            if should_emit:
+                self._phase('metrics')
+                try:
+                    mem_info = self.process.memory_info()
+                    
+                    # cpu_percent() can hang when called from multiple threads
+                    # Use a lock to serialize access
+                    with self.cpu_lock:
+                        cpu_percent = self.process.cpu_percent(interval=0.1)
+                    
+                    num_threads = self.process.num_threads()
+                    num_fds = self.process.num_fds() if hasattr(self.process, 'num_fds') else 0
+                    
+                    # Queue for the shared time series file
+                    self.timeseries.put({
+                        'timestamp': datetime.now().isoformat(),
+                        'thread_id': thread_id,
+                        'iteration': i,
+                        'rss_mb': round(mem_info.rss / (1024 * 1024), 2),
+                        'vms_mb': round(mem_info.vms / (1024 * 1024), 2),
+                        'cpu_percent': round(cpu_percent, 2),
+                        'num_threads': num_threads,
+                        'num_fds': num_fds,
+                        'execution_time_ms': round(result['execution_time'] * 1000, 2)
+                    })
+                    
+                    if self.verbose:
+                        print(f"[Thread-{thread_id}] Iteration {i}: "
+                              f"RSS={mem_info.rss / (1024 * 1024):.2f}MB, "
+                              f"CPU={cpu_percent:.1f}%, FDs={num_fds}")
                 
-                # Emit resource usage every 100 iterations or on last iteration
-                should_emit = False
-                is_last_iteration = False
-                
-                if i % 100 == 0:
-                    should_emit = True
-                elif iterations >= 0 and i >= iterations:
-                    should_emit = True
-                    is_last_iteration = True
-                
-                if should_emit:
-                    try:
-                        mem_info = self.process.memory_info()
-                        
-                        # cpu_percent() can hang when called from multiple threads
-                        # Use a lock to serialize access
-                        with self.cpu_lock:
-                            cpu_percent = self.process.cpu_percent(interval=0.1)
-                        
-                        num_threads = self.process.num_threads()
-                        num_fds = self.process.num_fds() if hasattr(self.process, 'num_fds') else 0
-                        
-                        # Write to CSV
-                        csv_writer.writerow([
-                            datetime.now().isoformat(),
-                            i,
-                            round(mem_info.rss / (1024 * 1024), 2),  # RSS in MB
-                            round(mem_info.vms / (1024 * 1024), 2),  # VMS in MB
-                            round(cpu_percent, 2),
-                            num_threads,
-                            num_fds,
-                            round(result['execution_time'] * 1000, 2)  # ms
-                        ])
-                        csvfile.flush()
-                        
-                        if self.verbose:
-                            print(f"[Thread-{thread_id}] Iteration {i}: "
-                                  f"RSS={mem_info.rss / (1024 * 1024):.2f}MB, "
-                                  f"CPU={cpu_percent:.1f}%, FDs={num_fds}")
-                        
-                    except Exception as e:
-                        if self.verbose:
-                            print(f"[Thread-{thread_id}] Error collecting metrics: {e}")
-                
-                # Delay between iterations
-                if delay > 0:
-                    time.sleep(delay)
+                except Exception as e:
+                    if self.verbose:
+                        print(f"[Thread-{thread_id}] Error collecting metrics: {e}")
+            
+            # Delay between iterations plus the statement's think time
+            if delay + think_time > 0:
+                self._phase('think')
+                self.stop_event.wait(delay + think_time)
         
-        print(f"[Thread-{thread_id}] Completed all iterations")
-        print(f"[Thread-{thread_id}] Resource data saved to: {csv_filename}")
-    
+        self._phase(None)
+        if self.stop_event.is_set():
+            print(f"[Thread-{thread_id}] Stopped after {i} iterations")
+        else:
+            print(f"[Thread-{thread_id}] Completed all iterations")
+
     def run_parallel(self, num_threads: int, iterations_per_thread: int, delay: float = 0.0):
         """
         Run queries in parallel using multiple threads
@@ -261,17 +540,144 @@ class QueryRunner:
         print(f"Output Dir:       {self.output_dir}")
         print(f"Pooling:          {'Disabled' if self.disable_pooling else 'Enabled (default)'}")
         print(f"Threads:          {num_threads}")
-        if iterations_per_thread < 0:
+        if self.replay is not None:
+            total = sum(len(script) for script in self.replay.values())
+            print(f"Replay:           {total} queries, {self.speed:g}x recorded speed")
+        elif iterations_per_thread < 0 and self.duration:
+            print(f"Iterations/Thread: until the duration is over (Ctrl+C to stop early)")
+        elif iterations_per_thread < 0:
             print(f"Iterations/Thread: INFINITE (Ctrl+C to stop)")
             print(f"Total Iterations: INFINITE")
         else:
             print(f"Iterations/Thread: {iterations_per_thread}")
             print(f"Total Iterations: {num_threads * iterations_per_thread}")
+        if self.duration:
+            print(f"Duration:         {self.duration:g}s")
+        if self.stats_interval:
+            print(f"Live Stats:       every {self.stats_interval:g}s")
         print(f"Delay:            {delay}s")
-        print(f"Query:            {self.query[:100]}{'...' if len(self.query) > 100 else ''}")
+        if self.warmup_iterations or self.warmup_seconds:
+            print(f"Warm-up:          {self.warmup_iterations} iterations/thread, {self.warmup_seconds}s")
+        if self.steady_state:
+            print(f"Steady State:     95% CI within {self.ci_threshold:.1%} over {self.window} x {self.interval}s")
+        if self.leak_hunt:
+            print(f"Leak Hunt:        every {self.sample_interval}s"
+                  f"{', tracemalloc' if self.use_tracemalloc else ''}")
+        if self.retry_policy.max_retries:
+            print(f"Retries:          {self.retry_policy.describe()}")
+        if self.record_path:
+            print(f"Recording:        {self.record_path}")
+        if len(self.workload.statements) > 1 or self.replay is not None:
+            print(f"Workload:         {self.workload.name}")
+            for line in self.workload.describe():
+                print(f"  {line}")
+        else:
+            print(f"Query:            {self.query[:100]}{'...' if len(self.query) > 100 else ''}")
         print("=" * 80)
         
+        total_time = self._run_threads(num_threads, iterations_per_thread, delay)
+        
+        # Print statistics
+        self.close_timeseries()
+        self.print_statistics(total_time)
+    
+    def _check_warmup(self):
+        """Start measuring once every thread is warm and the warm-up time is over (holds stats_lock)"""
+        if (not self.measuring.is_set() and len(self.warmed_threads) >= self.num_threads
+                and time.time() >= self.warmup_until):
+            self.measure_start = time.time()
+            self.measuring.set()
+            if self.warmup_count:
+                print(f"Warm-up complete after {self.warmup_count} iterations; measuring")
+    
+    def _measured_iterations(self) -> int:
+        return sum(s.iterations for s in list(self.stats.values()))
+    
+    def _steady_state_monitor(self, done: threading.Event):
+        """Sample throughput every interval; set stop_event once its CI is narrow enough"""
+        samples = deque(maxlen=self.window)
+        while not done.is_set():
+            if not self.measuring.is_set():
+                with self.stats_lock:
+                    self._check_warmup()
+                done.wait(min(self.interval, 0.1))
+                continue
+            last = self._measured_iterations()
+            last_time = time.time()
+            if done.wait(self.interval):
+                return
+            now = self._measured_iterations()
+            samples.append((now - last) / (time.time() - last_time))
+            if len(samples) == self.window:
+                width = ci_relative_half_width(list(samples))
+                if self.verbose:
+                    print(f"[Steady-State] {samples[-1]:.2f} queries/sec, CI +/-{width:.1%}")
+                if width < self.ci_threshold:
+                    self.steady_result = {'throughput': statistics.fmean(samples), 'ci': width,
+                                          'after': time.time() - self.measure_start}
+                    print(f"Steady state reached: {self.steady_result['throughput']:.2f} queries/sec "
+                          f"(95% CI +/-{width:.1%}) after {self.steady_result['after']:.1f}s; stopping")
+                    self.stop_event.set()
+                    return
+    
+    def _run_threads(self, num_threads: int, iterations_per_thread: int, delay: float) -> float:
+        """Start the worker threads, wait for them and return the measured (post warm-up) time"""
         start_time = time.time()
+        self.num_threads = num_threads
+        self.warmup_until = start_time + self.warmup_seconds
+        self.warmed_threads = set(range(1, num_threads + 1)) if self.warmup_iterations == 0 else set()
+        self.warmup_count = 0
+        self.steady_result = None
+        self.stop_reason = None
+        self.live_snapshots = {}
+        self.run_start = start_time
+        self.in_flight = {}
+        self.stalled_threads = 0
+        self.stop_event.clear()
+        self.measuring.clear()
+        with self.stats_lock:
+            self._check_warmup()
+        
+        if self.record_path and self.recorder is None:
+            self.recorder = open_recorder(self.record_path, self.flush_interval)
+        
+        if self.profile and self.profiler is None:
+            self.profiler = StackSampler(self.profile_interval)
+        if self.profiler is not None:
+            self.profiler.start()
+        
+        if self.contention:
+            self.stats_lock.reset()
+            self.cpu_lock.reset()
+            self.phase_clock = PhaseClock()
+            self.gil_probe = GilProbe(self.phase_clock, self.probe_interval).start()
+        
+        if self.timeseries is None:
+            self.timeseries = TimeSeriesWriter(
+                os.path.join(self.output_dir, f"resources_{self.timestamp}.{self.timeseries_format}"),
+                fmt=self.timeseries_format,
+                flush_interval=self.flush_interval
+            ).start()
+        
+        self.leak_hunter = None
+        if self.leak_hunt:
+            self.leak_hunter = LeakHunter(
+                lambda: self._measured_iterations() + self.warmup_count,
+                self.measuring,
+                output_path=os.path.join(self.output_dir, f"leak_timeline_{self.timestamp}.csv"),
+                interval=self.sample_interval,
+                use_tracemalloc=self.use_tracemalloc,
+                snapshot_every=self.snapshot_every,
+                rss_threshold=self.leak_threshold
+            ).start()
+        
+        monitor_done = threading.Event()
+        monitor = None
+        if self.steady_state or self.warmup_seconds > 0:
+            monitor = threading.Thread(target=self._steady_state_monitor if self.steady_state
+                                       else self._warmup_timer,
+                                       args=(monitor_done,), name="SteadyStateMonitor", daemon=True)
+            monitor.start()
         
         # Create and start threads
         threads: List[threading.Thread] = []
@@ -279,19 +685,343 @@ class QueryRunner:
             thread = threading.Thread(
                 target=self.worker_thread,
                 args=(i + 1, iterations_per_thread, delay),
-                name=f"QueryWorker-{i + 1}"
+                name=f"QueryWorker-{i + 1}",
+                daemon=True  # a second Ctrl+C must be able to exit mid-query
             )
             threads.append(thread)
             thread.start()
         
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
+        # Wait for all threads to complete (or the duration, or Ctrl+C)
+        self._wait_for_workers(threads, start_time)
         
-        total_time = time.time() - start_time
+        monitor_done.set()
+        if monitor is not None:
+            monitor.join()
+        end_time = time.time()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.gil_probe is not None:
+            self.gil_probe.stop()
+        if self.leak_hunter is not None:
+            self.leak_hunter.stop()
+        return end_time - self.measure_start if self.measuring.is_set() else 0.0
+    
+    def _wait_for_workers(self, threads: List[threading.Thread], start_time: float):
+        """
+        Join the workers while enforcing --duration and printing live stats
         
-        # Print statistics
-        self.print_statistics(total_time)
+        Ctrl+C (or SIGTERM) sets the stop event: workers finish their current
+        query and exit, and the run is reported as usual. A second Ctrl+C
+        aborts without waiting. With a stall timeout, a query in flight for
+        longer stops the run too, and threads stuck in such queries are left
+        behind (they are daemon threads) instead of being waited for.
+        """
+        deadline = start_time + self.duration if self.duration else None
+        next_stats = start_time + self.stats_interval if self.stats_interval else None
+        try:
+            while True:
+                now = time.time()
+                alive = sum(1 for thread in threads if thread.is_alive())
+                stalled = self._stalled_count(now)
+                if alive == 0 or (self.stop_reason == 'stalled' and alive <= stalled):
+                    self.stalled_threads = stalled if alive else 0
+                    break
+                if stalled and self.stop_reason != 'stalled':
+                    print(f"\nStall: {stalled} queries in flight for more than {self.stall_timeout:g}s; stopping")
+                    self.stop_reason = 'stalled'
+                    self.stop_event.set()
+                if deadline is not None and now >= deadline and not self.stop_event.is_set():
+                    print(f"\nDuration of {self.duration:g}s reached; finishing in-flight queries")
+                    self.stop_reason = 'duration reached'
+                    self.stop_event.set()
+                if next_stats is not None and now >= next_stats:
+                    self.print_live_stats(now - start_time)
+                    next_stats += self.stats_interval
+                wake = [now + 0.5]
+                if deadline is not None and not self.stop_event.is_set():
+                    wake.append(deadline)
+                if next_stats is not None:
+                    wake.append(next_stats)
+                for thread in threads:
+                    if thread.is_alive():
+                        thread.join(max(0.01, min(wake) - time.time()))
+                        break
+        except KeyboardInterrupt:
+            print("\nInterrupted; finishing in-flight queries (Ctrl+C again to abort)")
+            self.stop_reason = 'interrupted'
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+        if self.stop_reason is None and self.steady_result is not None:
+            self.stop_reason = 'steady state reached'
+    
+    def _stalled_count(self, now: float) -> int:
+        """Queries that have been in flight longer than the stall timeout"""
+        if not self.stall_timeout:
+            return 0
+        return sum(1 for started in list(self.in_flight.values()) if now - started > self.stall_timeout)
+    
+    def print_live_stats(self, elapsed: float):
+        """One line with the QPS, latency percentiles and errors since the last line"""
+        hist = LatencyHistogram()
+        errors = total = total_errors = 0
+        for thread_id, stats in list(self.stats.items()):
+            # Read without a lock: the counters are at most one iteration stale
+            latency, thread_errors = stats.latency.snapshot(), stats.errors
+            last_latency, last_errors = self.live_snapshots.get(thread_id, (LatencyHistogram(), 0))
+            self.live_snapshots[thread_id] = (latency, thread_errors)
+            hist.merge(latency.since(last_latency))
+            errors += thread_errors - last_errors
+            total += stats.iterations
+            total_errors += thread_errors
+        qps = (hist.count + errors) / self.stats_interval
+        p = hist.percentiles((50, 90, 99))
+        minutes, seconds = divmod(int(elapsed), 60)
+        print(f"[Live {minutes // 60:02d}:{minutes % 60:02d}:{seconds:02d}] {qps:8.1f} q/s  "
+              f"p50 {format_ms(p[50])}ms  p90 {format_ms(p[90])}ms  p99 {format_ms(p[99])}ms  "
+              f"errors {errors} ({total_errors} total)  queries {total:,}"
+              f"{'' if self.measuring.is_set() else '  [warm-up]'}")
+    
+    def close_timeseries(self):
+        """Flush the queued resource samples (and replay log entries, profile) and close the files"""
+        if self.profiler is not None and self.profiler.stacks:
+            path = os.path.join(self.output_dir, f"profile_{self.timestamp}.folded")
+            distinct = self.profiler.write(path)
+            print(f"Profile: {sum(self.profiler.stacks.values()):,} samples, {distinct:,} distinct stacks "
+                  f"saved to {path}")
+        if self.recorder is not None:
+            self.recorder.close()
+            print(f"Replay log: {self.recorder.samples} queries saved to {self.recorder.path}")
+            if self.recorder.error is not None:
+                print(f"Warning: writing the replay log failed: {self.recorder.error}")
+            self.recorder = None
+        if self.timeseries is None:
+            return
+        self.timeseries.close()
+        print(f"Resource data: {self.timeseries.samples} samples in {self.timeseries.writes} writes "
+              f"saved to {self.timeseries.path}")
+        if self.timeseries.error is not None:
+            print(f"Warning: writing resource data failed: {self.timeseries.error}")
+        self.timeseries = None
+    
+    def _warmup_timer(self, done: threading.Event):
+        """Ends a time-based warm-up even if no iteration completes at that moment"""
+        while not done.is_set() and not self.measuring.is_set():
+            with self.stats_lock:
+                self._check_warmup()
+            done.wait(0.1)
+    
+    def run_packet_size_sweep(self, packet_sizes: List[int], num_threads: int,
+                              iterations_per_thread: int, delay: float = 0.0):
+        """
+        Run the same workload once per TDS packet size and compare them
+        
+        The packet size is set through the Packet Size connection string
+        keyword, so every size gets its own connections (and pool).
+        
+        Args:
+            packet_sizes: Packet sizes to request
+            num_threads: Number of parallel threads
+            iterations_per_thread: Number of iterations per thread (must be finite)
+            delay: Delay between iterations (seconds)
+        """
+        base_connection_string = self.connection_string
+        results = []
+        for packet_size in packet_sizes:
+            self.connection_string = with_packet_size(base_connection_string, packet_size)
+            self.stats.clear()
+            print("=" * 80)
+            print(f"Packet Size {packet_size}: {num_threads} threads x {iterations_per_thread} iterations")
+            print("=" * 80)
+            
+            cpu_before = self.process.cpu_times()
+            io_before = self._io_counters()
+            total_time = self._run_threads(num_threads, iterations_per_thread, delay)
+            cpu_after = self.process.cpu_times()
+            io_after = self._io_counters()
+            
+            stats = merge_threads(self.stats.values())
+            results.append({
+                'packet_size': packet_size,
+                'total_time': total_time,
+                'iterations': stats.iterations,
+                'rows': stats.total_rows,
+                'errors': stats.errors,
+                'cpu': (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system),
+                'syscalls': (io_after[0] - io_before[0]) + (io_after[1] - io_before[1])
+                            if io_before and io_after else None,
+            })
+            if self.stop_reason == 'interrupted':
+                break
+        self.connection_string = base_connection_string
+        self.close_timeseries()
+        self.print_sweep(results)
+    
+    def _io_counters(self):
+        """(read syscalls, write syscalls) from /proc/<pid>/io, or None where unsupported"""
+        try:
+            counters = self.process.io_counters()
+            return counters.read_count, counters.write_count
+        except (AttributeError, psutil.Error):
+            return None
+    
+    def print_sweep(self, results: List[Dict[str, Any]]):
+        """Print the per packet size comparison"""
+        print("\n" + "=" * 80)
+        print("Packet Size Sweep")
+        print("=" * 80)
+        print(f"{'Packet size':>11} {'Queries':>8} {'Errors':>7} {'Queries/sec':>12} {'Rows/sec':>13} "
+              f"{'Syscalls':>10} {'CPU s':>8}")
+        print("-" * 80)
+        for r in results:
+            qps = r['iterations'] / r['total_time'] if r['total_time'] > 0 else 0
+            rps = r['rows'] / r['total_time'] if r['total_time'] > 0 else 0
+            syscalls = f"{r['syscalls']:,}" if r['syscalls'] is not None else 'n/a'
+            print(f"{r['packet_size']:>11} {r['iterations']:>8} {r['errors']:>7} {qps:>12.2f} {rps:>13,.0f} "
+                  f"{syscalls:>10} {r['cpu']:>8.2f}")
+        print("-" * 80)
+        print("Syscalls are read/write calls of this process (psutil io_counters); CPU is user+system time.")
+        print("=" * 80)
+    
+    def run_concurrency_sweep(self, thread_counts: List[int], iterations_per_thread: int, delay: float = 0.0,
+                              process_counts: Sequence[int] = (1,), options: Optional[Dict[str, Any]] = None,
+                              workload_path: Optional[str] = None, knee_threshold: float = 0.25):
+        """
+        Step the concurrency through thread (and process) counts and report the scaling curve
+        
+        Every level is a complete run, so warm-up, --steady-state, --duration
+        and -i apply per level. Levels with more than one process run in
+        child processes built from `options`, each with the level's thread
+        count, and their results are combined. The sweep ends early at the
+        first level that stalls or is interrupted.
+        
+        Args:
+            thread_counts: Threads per process, one level each
+            iterations_per_thread: Iterations per thread and level (-1: until steady state or duration)
+            delay: Delay between iterations (seconds)
+            process_counts: Process counts, each stepped through all thread counts
+            options: QueryRunner keyword arguments for the child processes
+            workload_path: Workload file the child processes load (workloads do not pickle)
+            knee_threshold: Marginal scaling efficiency below which throughput counts as no longer scaling
+        """
+        results = []
+        for processes in process_counts:
+            for threads in thread_counts:
+                print("=" * 80)
+                print(f"Concurrency {threads * processes}: {threads} threads x {processes} processes")
+                print("=" * 80)
+                
+                if processes == 1:
+                    self.stats.clear()
+                    cpu_before = self.process.cpu_times()
+                    total_time = self._run_threads(threads, iterations_per_thread, delay)
+                    cpu_after = self.process.cpu_times()
+                    cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+                    parts = [self._level_result(total_time, cpu)]
+                else:
+                    parts = self._run_processes(processes, threads, iterations_per_thread, delay,
+                                                options or {}, workload_path)
+                
+                level = combine_levels(parts, threads, processes)
+                results.append(level)
+                print(f"Concurrency {level['concurrency']}: {level['qps']:.2f} queries/sec, "
+                      f"p99 {level['p99_ms']:.2f}ms, {level['errors']} errors"
+                      + (f", stopped: {level['stop_reason']}" if level['stop_reason'] else ''))
+                if level['stop_reason'] in _PARTIAL_STOP_REASONS:
+                    break
+            if results and results[-1]['stop_reason'] in _PARTIAL_STOP_REASONS:
+                break
+        
+        self.close_timeseries()
+        flag_scaling(results, knee_threshold)
+        self.print_concurrency_sweep(results, knee_threshold)
+        self._write_sweep(results)
+    
+    def _level_result(self, total_time: float, cpu: float) -> Dict[str, Any]:
+        """Picklable summary of the last _run_threads() for combine_levels()"""
+        stats = merge_threads(self.stats.values())
+        return {
+            'total_time': total_time,
+            'iterations': stats.iterations,
+            'errors': stats.errors,
+            'histogram': stats.latency,
+            'cpu': cpu,
+            'steady': self.steady_result is not None,
+            'stop_reason': self.stop_reason,
+            'stalled': self.stalled_threads,
+        }
+    
+    def _run_processes(self, processes: int, threads: int, iterations_per_thread: int, delay: float,
+                       options: Dict[str, Any], workload_path: Optional[str]) -> List[Dict[str, Any]]:
+        """Run one sweep level in child processes and collect their _level_result()s"""
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        children = [
+            context.Process(
+                target=_sweep_process,
+                args=(dict(options, workload=None), workload_path, n, threads, iterations_per_thread, delay, results),
+                name=f"SweepProcess-{n}"
+            )
+            for n in range(1, processes + 1)
+        ]
+        for child in children:
+            child.start()
+        
+        parts: List[Dict[str, Any]] = []
+        while len(parts) < processes:
+            try:
+                parts.append(results.get(timeout=0.5))
+            except Empty:
+                if not any(child.is_alive() for child in children):
+                    break
+            except KeyboardInterrupt:
+                # Children ignore SIGINT; forward the stop once, as SIGTERM, and keep collecting
+                print("\nInterrupted; stopping the sweep processes")
+                for child in children:
+                    if child.is_alive():
+                        os.kill(child.pid, signal.SIGTERM)
+        for child in children:
+            child.join()
+        if len(parts) < processes:
+            print(f"Warning: {processes - len(parts)} of {processes} processes returned no results")
+        return parts
+    
+    def _write_sweep(self, results: List[Dict[str, Any]]):
+        """Scaling curve as plot data next to the resource usage file"""
+        path = os.path.join(self.output_dir, f"concurrency_sweep_{self.timestamp}.{self.timeseries_format}")
+        writer = TimeSeriesWriter(path, SWEEP_FIELDS, fmt=self.timeseries_format).start()
+        for level in results:
+            writer.put({**{k: round(v, 3) if isinstance(v, float) else v for k, v in level.items()},
+                        'flags': '; '.join(level['flags'])})
+        writer.close()
+        print(f"Sweep data: {writer.samples} levels saved to {path}")
+    
+    def print_concurrency_sweep(self, results: List[Dict[str, Any]], knee_threshold: float):
+        """Print the throughput/latency curve with the scaling flags"""
+        print("\n" + "=" * 80)
+        print("Concurrency Sweep")
+        print("=" * 80)
+        print(f"{'Thr':>4} {'Proc':>4} {'Conc':>5} {'Queries/sec':>12} {'p50 ms':>9} {'p99 ms':>9} {'Errors':>7} "
+              f"{'CPU %':>7} {'Eff':>5}  Flags")
+        print("-" * 80)
+        for r in results:
+            efficiency = f"{r['efficiency']:.2f}" if r['efficiency'] is not None else '-'
+            print(f"{r['threads']:>4} {r['processes']:>4} {r['concurrency']:>5} {r['qps']:>12.2f} "
+                  f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7} {r['cpu_percent']:>7.1f} "
+                  f"{efficiency:>5}  {', '.join(r['flags'])}")
+        print("-" * 80)
+        if results:
+            best = max(results, key=lambda r: r['qps'])
+            print(f"Peak throughput:  {best['qps']:.2f} queries/sec at concurrency {best['concurrency']}")
+            for knee in (r for r in results if 'knee' in r['flags']):
+                print(f"Scaling knee:     concurrency {knee['concurrency']} with {knee['processes']} processes "
+                      f"(marginal efficiency {knee['efficiency']:.2f} < {knee_threshold:g})")
+            stall = next((r for r in results if r['stalled']), None)
+            if stall is not None:
+                print(f"Stalls from:      concurrency {stall['concurrency']} ({stall['stalled']} stuck queries)")
+        print("Eff is the marginal scaling efficiency: relative QPS gain / relative concurrency gain")
+        print("over the previous level (1.0 = linear). CPU % is process CPU time / wall time.")
+        print("=" * 80)
     
     def print_statistics(self, total_time: float):
         """Print execution statistics"""
@@ -299,39 +1029,175 @@ class QueryRunner:
         print("Execution Statistics")
         print("=" * 80)
         
-        total_iterations = 0
-        total_rows = 0
-        total_errors = 0
-        all_times = []
-        
-        # Per-thread statistics
+        # Per-thread statistics, merged only here
         for thread_id in sorted(self.stats.keys()):
             stats = self.stats[thread_id]
-            total_iterations += stats['iterations']
-            total_rows += stats['total_rows']
-            total_errors += stats['errors']
-            
-            avg_time = stats['total_time'] / stats['iterations'] if stats['iterations'] > 0 else 0
+            avg_time = stats.total_time / stats.iterations if stats.iterations > 0 else 0
             
             print(f"\nThread-{thread_id}:")
-            print(f"  Iterations:    {stats['iterations']}")
-            print(f"  Rows Read:     {stats['total_rows']:,}")
-            print(f"  Total Time:    {stats['total_time']:.3f}s")
+            print(f"  Iterations:    {stats.iterations}")
+            print(f"  Rows Read:     {stats.total_rows:,}")
+            print(f"  Total Time:    {stats.total_time:.3f}s")
             print(f"  Avg Time:      {avg_time:.3f}s")
-            print(f"  Min Time:      {stats['min_time']:.3f}s")
-            print(f"  Max Time:      {stats['max_time']:.3f}s")
-            print(f"  Errors:        {stats['errors']}")
+            print(f"  Min Time:      {stats.min_time:.3f}s")
+            print(f"  Max Time:      {stats.max_time:.3f}s")
+            print(f"  Errors:        {stats.errors}")
+            if self.retry_policy.max_retries:
+                print(f"  Retries:       {stats.retries}")
+        
+        totals = merge_threads(self.stats.values())
+        total_iterations = totals.iterations
+        total_rows = totals.total_rows
+        total_errors = totals.errors
+        total_retries = totals.retries
         
         # Overall statistics
         print("\n" + "-" * 80)
         print("Overall Statistics:")
+        if self.stop_reason:
+            partial = " (partial results)" if self.stop_reason in _PARTIAL_STOP_REASONS else ""
+            print(f"  Stopped:           {self.stop_reason}{partial}")
+        if self.warmup_count:
+            print(f"  Warm-up Excluded:  {self.warmup_count} iterations")
+        if self.steady_result:
+            print(f"  Steady State:      {self.steady_result['throughput']:.2f} queries/sec "
+                  f"(95% CI +/-{self.steady_result['ci']:.1%}) after {self.steady_result['after']:.1f}s")
+        elif self.steady_state:
+            print(f"  Steady State:      not reached (95% CI did not narrow below {self.ci_threshold:.1%})")
         print(f"  Total Time:        {total_time:.3f}s")
         print(f"  Total Iterations:  {total_iterations}")
         print(f"  Total Rows:        {total_rows:,}")
         print(f"  Total Errors:      {total_errors}")
-        print(f"  Avg Throughput:    {total_iterations / total_time:.2f} queries/sec")
-        print(f"  Avg Rows/sec:      {total_rows / total_time:.2f} rows/sec")
+        if self.retry_policy.max_retries:
+            print(f"  Total Retries:     {total_retries}")
+        if total_time > 0:
+            print(f"  Avg Throughput:    {total_iterations / total_time:.2f} queries/sec")
+            print(f"  Effective:         {(total_iterations - total_errors) / total_time:.2f} successful queries/sec")
+            print(f"  Avg Rows/sec:      {total_rows / total_time:.2f} rows/sec")
+        if self.result_format != 'count':
+            print(f"  Peak RSS:          {peak_rss() / (1024 * 1024):,.1f} MB "
+                  f"(result sets kept as {self.result_format})")
+        if self.replay is not None and totals.replay_lag.count:
+            print(f"  Schedule Lag:      p50 {format_ms(totals.replay_lag.percentile(50))}ms, "
+                  f"p99 {format_ms(totals.replay_lag.percentile(99))}ms, "
+                  f"max {format_ms(totals.replay_lag.max)}ms behind the recorded offsets")
+        self.print_statement_latencies(total_time, totals)
+        if totals.error_stats.classes:
+            print("\n" + "-" * 80)
+            print("Errors by Class:")
+            print_error_stats(totals.error_stats)
+        if self.profiler is not None:
+            print("\n" + "-" * 80)
+            print(f"Profile (worker stacks every {self.profile_interval * 1000:g}ms):")
+            self.profiler.report()
+        if self.phase_clock is not None:
+            print("\n" + "-" * 80)
+            print("Contention (phase wall vs thread CPU time, lock waits, GIL probe):")
+            print_contention([self.stats_lock, self.cpu_lock], self.phase_clock, self.gil_probe)
+        if self.leak_hunter is not None:
+            self.leak_hunter.report()
         print("=" * 80)
+    
+    def print_statement_latencies(self, total_time: float, totals: ThreadStats):
+        """Per-statement count, rate and latency percentiles from the merged histograms"""
+        if not totals.statements:
+            return
+        print("\n" + "-" * 80)
+        print("Statement Latencies (ms):")
+        print(f"  {'Statement':<20} {'Count':>8} {'Errors':>6} {'Per sec':>8} {'Mean':>8} {'p50':>8} "
+              f"{'p90':>8} {'p99':>8} {'Max':>8}")
+        for statement in self.workload.statements:
+            stats = totals.statements.get(statement.name)
+            if stats is None:
+                continue
+            hist = stats.histogram
+            rate = (hist.count + stats.errors) / total_time if total_time > 0 else 0
+            p = hist.percentiles((50, 90, 99))
+            print(f"  {statement.name[:20]:<20} {hist.count:>8} {stats.errors:>6} {rate:>8.2f} "
+                  f"{format_ms(hist.mean):>8} {format_ms(p[50]):>8} {format_ms(p[90]):>8} "
+                  f"{format_ms(p[99]):>8} {format_ms(hist.max):>8}")
+
+
+def combine_levels(parts: List[Dict[str, Any]], threads: int, processes: int) -> Dict[str, Any]:
+    """One sweep level from the _level_result() of each of its processes"""
+    histogram = LatencyHistogram()
+    for part in parts:
+        histogram.merge(part['histogram'])
+    total_time = max((p['total_time'] for p in parts), default=0.0)
+    reasons = [p['stop_reason'] for p in parts if p['stop_reason']]
+    stop_reason = next((r for r in ('stalled', 'interrupted') if r in reasons), reasons[0] if reasons else None)
+    if len(parts) < processes:
+        stop_reason = stop_reason or 'process failed'
+    cpu = sum(p['cpu'] for p in parts)
+    return {
+        'threads': threads,
+        'processes': processes,
+        'concurrency': threads * processes,
+        'queries': sum(p['iterations'] for p in parts),
+        'errors': sum(p['errors'] for p in parts),
+        # Processes overlap, so their rates add up
+        'qps': sum((p['iterations'] - p['errors']) / p['total_time'] for p in parts if p['total_time'] > 0),
+        'p50_ms': histogram.percentile(50) * 1000,
+        'p99_ms': histogram.percentile(99) * 1000,
+        'cpu_seconds': round(cpu, 3),
+        'cpu_percent': cpu / total_time * 100 if total_time > 0 else 0.0,
+        'efficiency': None,
+        'steady': bool(parts) and all(p['steady'] for p in parts),
+        'stalled': sum(p['stalled'] for p in parts),
+        'stop_reason': stop_reason,
+        'flags': [],
+    }
+
+
+def flag_scaling(results: List[Dict[str, Any]], knee_threshold: float):
+    """
+    Set the marginal scaling efficiency and flags of every sweep level
+    
+    Efficiency is the relative throughput gain over the previous level
+    divided by the relative concurrency gain (1.0 is linear scaling). The
+    first level below knee_threshold is the knee (per process count); levels
+    that lose throughput, stall or fail are flagged as well.
+    """
+    knee_seen = set()
+    for previous, level in zip([None] + results[:-1], results):
+        if level['stalled']:
+            level['flags'].append(f"STALLED ({level['stalled']} stuck)")
+        if level['errors']:
+            level['flags'].append(f"errors {level['errors'] / max(level['queries'], 1):.1%}")
+        if level['stop_reason'] == 'process failed':
+            level['flags'].append('process failed')
+        if previous is None or previous['qps'] <= 0 or level['concurrency'] <= previous['concurrency']:
+            continue
+        level['efficiency'] = ((level['qps'] / previous['qps'] - 1)
+                               / (level['concurrency'] / previous['concurrency'] - 1))
+        if level['efficiency'] < knee_threshold and level['processes'] not in knee_seen:
+            level['flags'].append('knee')
+            knee_seen.add(level['processes'])
+        if level['efficiency'] < 0:
+            level['flags'].append('throughput drops')
+        if previous['p99_ms'] > 0 and level['p99_ms'] > 3 * previous['p99_ms']:
+            level['flags'].append('p99 x3')
+
+
+def _sweep_process(options: Dict[str, Any], workload_path: Optional[str], process_index: int, num_threads: int,
+                   iterations_per_thread: int, delay: float, results):
+    """Body of one child process of a multi-process sweep level"""
+    # The parent forwards Ctrl+C exactly once, as SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    options = dict(options)
+    if workload_path:
+        options['workload'] = load_workload(workload_path)
+    if options.get('seed') is not None:
+        options['seed'] += process_index * 1000
+    runner = QueryRunner(**options)
+    runner.timestamp = f"{runner.timestamp}_p{process_index}"
+    cpu_before = runner.process.cpu_times()
+    total_time = runner._run_threads(num_threads, iterations_per_thread, delay)
+    cpu_after = runner.process.cpu_times()
+    runner.close_timeseries()
+    cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    results.put(runner._level_result(total_time, cpu))
 
 
 def get_default_connection_string() -> str:
@@ -363,6 +1229,48 @@ Examples:
   
   # Verbose output
   python parallel_query_runner.py -c "Server=localhost;..." -t 2 -i 3 -v
+  
+  # Larger TDS packets for big result sets
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 -i 10 --packet-size 32767
+  
+  # Exclude 5 warm-up iterations per thread, stop once throughput is steady
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 --warmup-iterations 5 --steady-state
+  
+  # Weighted mix of statements with parameters and think times (see workload.py)
+  python parallel_query_runner.py -c "Server=localhost;..." -t 8 -i 1000 --workload mixed.json
+  
+  # Hunt for leaks: fit RSS/FD growth per iteration, attribute Python growth
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 -i 5000 --warmup-iterations 50 \\
+      --leak-hunt --tracemalloc
+  
+  # Retry deadlocks and dropped connections up to 3 times with jittered backoff
+  python parallel_query_runner.py -c "Server=localhost;..." -t 8 -i 1000 --retries 3 --retry-on deadlock connection
+  
+  # Record 5 minutes of traffic, then replay it twice as fast (e.g. with another driver version)
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 -w mixed.json --duration 5m --record traffic.csv
+  python parallel_query_runner.py -c "Server=localhost;..." --replay traffic.csv --speed 2
+  
+  # Scaling curve: each thread count runs to steady state (at most 2 minutes); flags knee and stalls
+  python parallel_query_runner.py -c "Server=localhost;..." --steady-state --duration 2m \\
+      --concurrency-sweep 1 2 3 4 8 16 --sweep-processes 1 2
+  
+  # Where does the time go? Sampled worker stacks per connect/execute/fetch phase
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 --duration 1m --profile
+  
+  # Does the driver release the GIL while it waits? Lock waits and wall vs CPU per phase
+  python parallel_query_runner.py -c "Server=localhost;..." -t 8 -i 500 --contention
+  
+  # Peak memory of keeping large result sets: dict per row vs columnar
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 -i 10 -q "SELECT * FROM Orders" --result-format dicts
+  python parallel_query_runner.py -c "Server=localhost;..." -t 4 -i 10 -q "SELECT * FROM Orders" --result-format columnar
+  
+  # Soak test for 10 minutes with a live stats line every 30 seconds
+  python parallel_query_runner.py -c "Server=localhost;..." -t 8 --duration 10m --stats-interval 30
+  
+  # Compare packet sizes for a large result read
+  python parallel_query_runner.py -c "Server=localhost;..." -i 20 --disable-pooling \\
+      -q "SELECT TOP 100000 * FROM sys.all_columns a CROSS JOIN sys.all_objects b" \\
+      --packet-size-sweep 512 4096 8000 16384 32767
         """
     )
     
@@ -387,6 +1295,19 @@ Examples:
         help='Number of iterations per thread (default: -1 for infinite, use Ctrl+C to stop)'
     )
     
+    parser.add_argument(
+        '--duration',
+        type=parse_duration,
+        help='Stop after this long, e.g. 90, 30s, 10m, 2h (combines with -i: whichever comes first)'
+    )
+    
+    parser.add_argument(
+        '--stats-interval',
+        type=float,
+        default=0.0,
+        help='Print live QPS, latency percentiles and errors every N seconds (default: off)'
+    )
+    
     parser.add_argument(
         '-q', '--query',
         type=str,
@@ -394,6 +1315,18 @@ Examples:
         help='SQL query to execute (default: simple SELECT query)'
     )
     
+    parser.add_argument(
+        '-w', '--workload',
+        type=str,
+        help='JSON/YAML workload file with weighted statements (replaces --query)'
+    )
+    
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='Random seed for statement choice and parameters'
+    )
+    
     parser.add_argument(
         '-d', '--delay',
         type=float,
@@ -411,7 +1344,21 @@ Examples:
         '-o', '--output-dir',
         type=str,
         default='./query_results',
-        help='Output directory for resource usage CSV files (default: ./query_results)'
+        help='Output directory for the resource usage file (default: ./query_results)'
+    )
+    
+    parser.add_argument(
+        '--timeseries-format',
+        choices=['csv', 'parquet'],
+        default='csv',
+        help='Format of the resource usage file; parquet needs pyarrow (default: csv)'
+    )
+    
+    parser.add_argument(
+        '--flush-interval',
+        type=float,
+        default=1.0,
+        help='Seconds between batched writes of the resource usage file (default: 1.0)'
     )
     
     parser.add_argument(
@@ -420,6 +1367,210 @@ Examples:
         help='Disable connection pooling'
     )
     
+    parser.add_argument(
+        '--packet-size',
+        type=int,
+        help='TDS packet size to request (sets Packet Size in the connection string)'
+    )
+    
+    parser.add_argument(
+        '--packet-size-sweep',
+        type=int,
+        nargs='+',
+        metavar='SIZE',
+        help='Run the workload once per packet size and compare throughput, syscalls and CPU'
+    )
+    
+    parser.add_argument(
+        '--warmup-iterations',
+        type=int,
+        default=0,
+        help='Iterations per thread excluded from statistics (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--warmup-seconds',
+        type=float,
+        default=0.0,
+        help='Seconds from the start excluded from statistics (default: 0.0)'
+    )
+    
+    parser.add_argument(
+        '--steady-state',
+        action='store_true',
+        help='Stop once the throughput 95%% CI narrows below --ci-threshold (-i becomes the maximum)'
+    )
+    
+    parser.add_argument(
+        '--ci-threshold',
+        type=float,
+        default=0.05,
+        help='Relative 95%% CI half-width that counts as steady (default: 0.05)'
+    )
+    
+    parser.add_argument(
+        '--window',
+        type=int,
+        default=10,
+        help='Throughput intervals used for steady-state detection (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=1.0,
+        help='Length of one throughput interval in seconds (default: 1.0)'
+    )
+    
+    parser.add_argument(
+        '--leak-hunt',
+        action='store_true',
+        help='Sample RSS/FDs on a timeline, fit growth per iteration and flag suspected leaks'
+    )
+    
+    parser.add_argument(
+        '--sample-interval',
+        type=float,
+        default=1.0,
+        help='Seconds between leak-hunt samples (default: 1.0)'
+    )
+    
+    parser.add_argument(
+        '--tracemalloc',
+        action='store_true',
+        help='With --leak-hunt, attribute Python memory growth to allocation sites (slower)'
+    )
+    
+    parser.add_argument(
+        '--snapshot-every',
+        type=int,
+        default=10,
+        help='Take a tracemalloc snapshot every N samples (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--leak-threshold',
+        type=float,
+        default=DEFAULT_RSS_THRESHOLD,
+        help=f'RSS growth in bytes/iteration flagged as a leak (default: {DEFAULT_RSS_THRESHOLD})'
+    )
+    
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=0,
+        help='Retry a failed query up to N times if its error class is retried (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--retry-on',
+        nargs='+',
+        choices=ERROR_CLASSES,
+        default=sorted(TRANSIENT_CLASSES),
+        metavar='CLASS',
+        help=f'Error classes to retry (default: {" ".join(sorted(TRANSIENT_CLASSES))}; '
+             f'choices: {" ".join(ERROR_CLASSES)})'
+    )
+    
+    parser.add_argument(
+        '--retry-backoff',
+        type=float,
+        default=0.05,
+        help='Backoff cap of the first retry in seconds, doubled per retry (default: 0.05)'
+    )
+    
+    parser.add_argument(
+        '--retry-max-backoff',
+        type=float,
+        default=2.0,
+        help='Largest backoff cap in seconds; the delay is uniform below the cap (default: 2.0)'
+    )
+    
+    parser.add_argument(
+        '--record',
+        type=str,
+        metavar='LOG',
+        help='Log every query (offset, thread, statement, params, duration) for --replay (.csv or .parquet)'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        type=str,
+        metavar='LOG',
+        help='Re-issue a recorded log with its original timing and concurrency (-t, -i, -q are ignored)'
+    )
+    
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=1.0,
+        help='Replay speed factor; 2 halves the recorded inter-arrival times (default: 1.0)'
+    )
+    
+    parser.add_argument(
+        '--concurrency-sweep',
+        type=int,
+        nargs='+',
+        metavar='THREADS',
+        help='Run once per thread count (e.g. 1 2 4 8 16) and report the throughput/latency curve'
+    )
+    
+    parser.add_argument(
+        '--sweep-processes',
+        type=int,
+        nargs='+',
+        default=[1],
+        metavar='PROCS',
+        help='Process counts for --concurrency-sweep; each runs every thread count (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--knee-threshold',
+        type=float,
+        default=0.25,
+        help='Flag the level whose marginal scaling efficiency falls below this (default: 0.25)'
+    )
+    
+    parser.add_argument(
+        '--stall-timeout',
+        type=float,
+        help='Stop when a query is in flight this many seconds (default: 30 for sweeps, else off)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Sample worker stacks and write flamegraph-ready collapsed stacks split by query phase'
+    )
+    
+    parser.add_argument(
+        '--profile-interval',
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f'Seconds between profiler samples (default: {DEFAULT_INTERVAL})'
+    )
+    
+    parser.add_argument(
+        '--contention',
+        action='store_true',
+        help='Report lock waits and wall vs CPU time per thread and phase, with a GIL probe'
+    )
+    
+    parser.add_argument(
+        '--probe-interval',
+        type=float,
+        default=DEFAULT_PROBE_INTERVAL,
+        help=f'Seconds the GIL probe sleeps between wake-ups (default: {DEFAULT_PROBE_INTERVAL})'
+    )
+    
+    parser.add_argument(
+        '--result-format',
+        choices=RESULT_FORMATS,
+        default='count',
+        help='Keep each result set while reading it: count (rows are dropped), dicts (one per row) '
+             'or columnar (typed columns); reports peak RSS (default: count)'
+    )
+    
     args = parser.parse_args()
     
     # Validate arguments
@@ -435,20 +1586,162 @@ Examples:
         print("Error: Delay cannot be negative")
         return 1
     
+    for size in [args.packet_size] + (args.packet_size_sweep or []):
+        if size is not None and not MIN_PACKET_SIZE <= size <= MAX_PACKET_SIZE:
+            print(f"Error: Packet size must be between {MIN_PACKET_SIZE} and {MAX_PACKET_SIZE}")
+            return 1
+    
+    if args.warmup_iterations < 0 or args.warmup_seconds < 0:
+        print("Error: Warm-up cannot be negative")
+        return 1
+    
+    if args.window < 2 or args.interval <= 0 or args.ci_threshold <= 0:
+        print("Error: --window must be at least 2, --interval and --ci-threshold positive")
+        return 1
+    
+    if args.sample_interval <= 0 or args.snapshot_every < 1:
+        print("Error: --sample-interval must be positive and --snapshot-every at least 1")
+        return 1
+    
+    if args.stats_interval < 0:
+        print("Error: --stats-interval cannot be negative")
+        return 1
+    
+    if args.flush_interval <= 0:
+        print("Error: --flush-interval must be positive")
+        return 1
+    
+    if args.timeseries_format == 'parquet' and not parquet_available():
+        print("Error: --timeseries-format parquet needs pyarrow (pip install pyarrow)")
+        return 1
+    
+    if args.packet_size_sweep and args.iterations < 0:
+        print("Error: --packet-size-sweep needs a finite number of iterations (-i)")
+        return 1
+    
+    if args.speed <= 0:
+        print("Error: --speed must be positive")
+        return 1
+    
+    if args.replay and (args.workload or args.packet_size_sweep or args.steady_state
+                        or args.warmup_iterations or args.warmup_seconds):
+        print("Error: --replay cannot be combined with --workload, --packet-size-sweep, warm-up or --steady-state")
+        return 1
+    
+    if args.record and args.packet_size_sweep:
+        print("Error: --record cannot be combined with --packet-size-sweep")
+        return 1
+    
+    if args.concurrency_sweep:
+        if any(n < 1 for n in args.concurrency_sweep + args.sweep_processes):
+            print("Error: sweep thread and process counts must be at least 1")
+            return 1
+        if args.iterations < 0 and not args.duration and not args.steady_state:
+            print("Error: --concurrency-sweep needs -i, --duration or --steady-state to end each level")
+            return 1
+        if args.packet_size_sweep or args.replay or args.record or args.leak_hunt:
+            print("Error: --concurrency-sweep cannot be combined with --packet-size-sweep, "
+                  "--replay, --record or --leak-hunt")
+            return 1
+    
+    if args.profile_interval <= 0:
+        print("Error: --profile-interval must be positive")
+        return 1
+    
+    if args.probe_interval <= 0:
+        print("Error: --probe-interval must be positive")
+        return 1
+    
+    if args.stall_timeout is not None and args.stall_timeout < 0:
+        print("Error: --stall-timeout cannot be negative")
+        return 1
+    stall_timeout = args.stall_timeout
+    if stall_timeout is None:
+        stall_timeout = 30.0 if args.concurrency_sweep else 0.0
+    
+    try:
+        retry_policy = RetryPolicy(args.retries, args.retry_backoff, args.retry_max_backoff, args.retry_on)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    
+    connection_string = args.connection_string
+    if args.packet_size:
+        connection_string = with_packet_size(connection_string, args.packet_size)
+    
+    workload = None
+    if args.workload:
+        try:
+            workload = load_workload(args.workload)
+        except (OSError, WorkloadError) as e:
+            print(f"Error: {e}")
+            return 1
+    
+    replay = None
+    if args.replay:
+        try:
+            replay = load_replay(args.replay)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+    
+    # SIGTERM (docker stop, kill) stops the run like Ctrl+C, with a final report
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    
+    # QueryRunner arguments; also used to start the processes of a multi-process sweep
+    options = {
+        'connection_string': connection_string,
+        'query': args.query,
+        'output_dir': args.output_dir,
+        'verbose': args.verbose,
+        'disable_pooling': args.disable_pooling,
+        'warmup_iterations': args.warmup_iterations,
+        'warmup_seconds': args.warmup_seconds,
+        'steady_state': args.steady_state,
+        'ci_threshold': args.ci_threshold,
+        'window': args.window,
+        'interval': args.interval,
+        'workload': workload,
+        'seed': args.seed,
+        'leak_hunt': args.leak_hunt,
+        'sample_interval': args.sample_interval,
+        'use_tracemalloc': args.tracemalloc,
+        'snapshot_every': args.snapshot_every,
+        'leak_threshold': args.leak_threshold,
+        'timeseries_format': args.timeseries_format,
+        'flush_interval': args.flush_interval,
+        'duration': args.duration,
+        'stats_interval': args.stats_interval,
+        'retry_policy': retry_policy,
+        'record_path': args.record,
+        'replay': replay,
+        'speed': args.speed,
+        'stall_timeout': stall_timeout,
+        'profile': args.profile,
+        'profile_interval': args.profile_interval,
+        'contention': args.contention,
+        'probe_interval': args.probe_interval,
+        'result_format': args.result_format
+    }
+    
     # Create runner and execute
+    runner = None
     try:
-        runner = QueryRunner(
-            connection_string=args.connection_string,
-            query=args.query,
-            output_dir=args.output_dir,
-            verbose=args.verbose,
-            disable_pooling=args.disable_pooling
-        )
-        runner.run_parallel(args.threads, args.iterations, args.delay)
+        runner = QueryRunner(**options)
+        if args.concurrency_sweep:
+            runner.run_concurrency_sweep(args.concurrency_sweep, args.iterations, args.delay,
+                                         args.sweep_processes, options, args.workload, args.knee_threshold)
+        elif args.packet_size_sweep:
+            runner.run_packet_size_sweep(args.packet_size_sweep, args.threads, args.iterations, args.delay)
+        else:
+            runner.run_parallel(len(replay) if replay else args.threads,
+                                -1 if replay else args.iterations, 0.0 if replay else args.delay)
         return 0
     
     except KeyboardInterrupt:
         print("\n\nInterrupted by user")
+        if runner is not None:
+            runner.close_timeseries()
         return 130
     
     except Exception as e:
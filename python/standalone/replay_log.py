@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Replay Log - Record the queries a run issued and replay them with the same timing
+
+With --record the query runner logs one entry per executed query:
+
+    offset       seconds from the start of the run to the query's start
+    thread_id    worker thread that issued it
+    statement    statement name, sql text and JSON-encoded parameters
+    duration_ms  latency of the query (first attempt to last)
+    success      and error_class when it failed
+
+--replay re-issues the log with one worker per recorded thread, each
+waiting for its entries' original offsets (divided by --speed), so the
+inter-arrival times and the concurrency of the recording are kept. A
+replay that falls behind issues the next query at once; how late queries
+were issued is reported as the schedule lag. Comparing a recording with
+its replay under another driver version compares them on the same traffic.
+
+The log is written through TimeSeriesWriter: CSV, or Parquet when the
+path ends in .parquet.
+
+Usage:
+    python parallel_query_runner.py -c "Server=..." -t 4 --duration 5m --record traffic.csv
+    python parallel_query_runner.py -c "Server=..." --replay traffic.csv --speed 2
+    python replay_log.py traffic.csv
+"""
+
+import sys
+import json
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from timeseries_writer import TimeSeriesWriter, read_samples
+from workload import Workload, Statement
+
+
+LOG_FIELDS = ['offset', 'thread_id', 'statement', 'sql', 'params', 'duration_ms', 'success', 'error_class']
+
+
+class ReplayRecord:
+    """One logged query"""
+
+    __slots__ = ('offset', 'thread_id', 'statement', 'sql', 'params', 'duration', 'success')
+
+    def __init__(self, offset: float, thread_id: int, statement: str, sql: str, params: List[Any],
+                 duration: float, success: bool):
+        self.offset = offset
+        self.thread_id = thread_id
+        self.statement = statement
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.success = success
+
+
+def open_recorder(path: str, flush_interval: float = 1.0) -> TimeSeriesWriter:
+    """Start a writer for a replay log; put() entries built by log_entry()"""
+    return TimeSeriesWriter(path, LOG_FIELDS, fmt='parquet' if path.endswith('.parquet') else 'csv',
+                            flush_interval=flush_interval).start()
+
+
+def log_entry(offset: float, thread_id: int, statement: Statement, params: Optional[List[Any]],
+              result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'offset': round(offset, 6),
+        'thread_id': thread_id,
+        'statement': statement.name,
+        'sql': statement.sql,
+        'params': json.dumps(params or [], default=str),
+        'duration_ms': round(result['execution_time'] * 1000, 3),
+        'success': bool(result['success']),
+        'error_class': result.get('error_class') or '',
+    }
+
+
+def _as_bool(value: Any) -> bool:
+    return value if isinstance(value, bool) else str(value).strip().lower() in ('true', '1', 'yes')
+
+
+def load_replay(path: str) -> Dict[int, List[ReplayRecord]]:
+    """
+    Read a replay log into one offset-ordered script per thread
+
+    Recorded thread ids are renumbered 1..N in ascending order, so the
+    scripts map straight onto the runner's worker threads.
+
+    Raises:
+        ValueError: if the log is empty or an entry is malformed
+    """
+    by_thread: Dict[int, List[ReplayRecord]] = {}
+    for n, sample in enumerate(read_samples(path), start=2):
+        try:
+            record = ReplayRecord(
+                offset=float(sample['offset']),
+                thread_id=int(float(sample['thread_id'])),
+                statement=str(sample['statement']),
+                sql=str(sample['sql']),
+                params=json.loads(sample['params'] or '[]'),
+                duration=float(sample['duration_ms']) / 1000,
+                success=_as_bool(sample['success']),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: malformed entry {n}: {e}")
+        by_thread.setdefault(record.thread_id, []).append(record)
+    if not by_thread:
+        raise ValueError(f"{path}: no entries to replay")
+    scripts = {}
+    for worker_id, thread_id in enumerate(sorted(by_thread), start=1):
+        scripts[worker_id] = sorted(by_thread[thread_id], key=lambda r: r.offset)
+    return scripts
+
+
+def replay_workload(scripts: Dict[int, List[ReplayRecord]], name: str = 'replay') -> Workload:
+    """The distinct statements of a replay, weighted by their recorded counts, for reporting"""
+    statements: Dict[str, Statement] = {}
+    for script in scripts.values():
+        for record in script:
+            statement = statements.get(record.statement)
+            if statement is None:
+                statements[record.statement] = Statement(record.statement, record.sql, weight=1)
+            else:
+                statement.weight += 1
+    return Workload(list(statements.values()), name=name)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Summarize a replay log recorded by the query runner',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Threads, statement mix, rate and recorded latencies of a log
+  python replay_log.py query_results/traffic.csv
+        """
+    )
+    parser.add_argument('path', help='Replay log (.csv or .parquet)')
+    args = parser.parse_args()
+
+    try:
+        scripts = load_replay(args.path)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    records = [record for script in scripts.values() for record in script]
+    span = max(r.offset for r in records) - min(r.offset for r in records)
+    mix = Counter(r.statement for r in records)
+    failed = sum(1 for r in records if not r.success)
+
+    print("=" * 80)
+    print(f"Replay Log: {args.path}")
+    print("=" * 80)
+    print(f"Entries:          {len(records):,} ({failed} failed when recorded)")
+    print(f"Threads:          {len(scripts)}")
+    print(f"Span:             {span:.3f}s")
+    if span > 0:
+        print(f"Rate:             {len(records) / span:.2f} queries/sec")
+    print("-" * 80)
+    print(f"  {'Statement':<24} {'Count':>8} {'Share':>7} {'Mean ms':>9}")
+    for statement, count in mix.most_common():
+        durations = [r.duration for r in records if r.statement == statement]
+        print(f"  {statement[:24]:<24} {count:>8} {count / len(records):>7.1%} "
+              f"{sum(durations) / len(durations) * 1000:>9.2f}")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
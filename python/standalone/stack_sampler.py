@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Stack Sampler - Low-overhead sampling profiler for the query runner threads
+
+A background thread wakes every `interval` seconds, takes the current
+Python stack of every worker thread from sys._current_frames() and counts
+it, prefixed with the phase the thread reported it was in (connect,
+execute, fetch, stats, metrics, ...). Nothing is traced, so the workers
+run at full speed; the cost is one stack walk per worker per sample.
+
+The result is written as collapsed stacks, one "phase;outer;...;inner
+count" line per distinct stack, which flamegraph.pl, speedscope and
+inferno read directly. Time spent inside the driver's C extension shows as
+samples whose innermost frame is the Python call into it (e.g.
+cursor.execute), since native frames are not visible to sys._current_frames().
+
+Usage:
+    sampler = StackSampler(interval=0.01).start()
+    sampler.set_phase('execute')          # from a worker thread
+    sampler.stop()
+    sampler.write('profile.folded')
+
+    python stack_sampler.py --summarize query_results/profile_20250101_120000.folded
+    flamegraph.pl query_results/profile_20250101_120000.folded > profile.svg
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_INTERVAL = 0.01
+
+
+def _frame_label(code) -> str:
+    filename = os.path.basename(code.co_filename)
+    if filename == '__init__.py':
+        # Name the package, e.g. execute (mssql_python/__init__.py)
+        filename = f"{os.path.basename(os.path.dirname(code.co_filename))}/{filename}"
+    return f"{code.co_name} ({filename})"
+
+
+def collapse(frame, max_depth: int = 64) -> str:
+    """Outermost-first, ';'-joined frame labels of a stack"""
+    labels: List[str] = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class StackSampler:
+    """
+    Periodic stack sampler for the threads whose name starts with thread_prefix
+
+    Args:
+        interval: Seconds between samples
+        thread_prefix: Name prefix of the threads to sample
+        max_depth: Innermost frames kept per stack
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, thread_prefix: str = 'QueryWorker',
+                 max_depth: int = 64):
+        self.interval = interval
+        self.thread_prefix = thread_prefix
+        self.max_depth = max_depth
+        self.phases: Dict[int, str] = {}    # thread ident -> phase; plain dict stores are atomic
+        self.stacks: Counter = Counter()
+        self.samples = 0                    # sampling rounds
+        self.overhead = 0.0                 # seconds spent sampling
+        self.elapsed = 0.0
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_phase(self, phase: str):
+        """Label the calling thread's following samples"""
+        self.phases[threading.get_ident()] = phase
+
+    def start(self) -> 'StackSampler':
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='StackSampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed += time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            began = time.perf_counter()
+            idents = [t.ident for t in threading.enumerate() if t.name.startswith(self.thread_prefix)]
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[f"{self.phases.get(ident, 'other')};{collapse(frame, self.max_depth)}"] += 1
+            del frames
+            self.samples += 1
+            self.overhead += time.perf_counter() - began
+
+    def write(self, path: str) -> int:
+        """Write the collapsed stacks; returns the number of distinct stacks"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return len(self.stacks)
+
+    def report(self, top: int = 10):
+        print_summary(self.stacks, top)
+        if self.elapsed > 0:
+            print(f"  {self.samples:,} sampling rounds, {self.overhead / self.elapsed:.2%} of the run spent sampling")
+
+
+def phase_totals(stacks: Counter) -> List[Tuple[str, int]]:
+    totals: Counter = Counter()
+    for stack, count in stacks.items():
+        totals[stack.split(';', 1)[0]] += count
+    return totals.most_common()
+
+
+def leaf_totals(stacks: Counter) -> List[Tuple[str, int]]:
+    """Samples per (phase, innermost frame): where the time actually goes"""
+    totals: Counter = Counter()
+    for stack, count in stacks.items():
+        parts = stack.split(';')
+        totals[f"{parts[0]}: {parts[-1]}"] += count
+    return totals.most_common()
+
+
+def print_summary(stacks: Counter, top: int = 10):
+    """Phase breakdown and the hottest innermost frames"""
+    total = sum(stacks.values())
+    if not total:
+        print("  No samples (the run was shorter than the sampling interval)")
+        return
+    print(f"  {'Phase':<12} {'Samples':>9} {'Share':>7}")
+    for phase, count in phase_totals(stacks):
+        print(f"  {phase:<12} {count:>9,} {count / total:>7.1%}")
+    print(f"  Hottest frames (innermost):")
+    for label, count in leaf_totals(stacks)[:top]:
+        print(f"    {count / total:>6.1%}  {label[:70]}")
+
+
+def load_collapsed(path: str) -> Counter:
+    stacks: Counter = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Summarize a collapsed-stack profile written by the query runner (--profile)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Phase breakdown and hottest frames
+  python stack_sampler.py --summarize query_results/profile_20250101_120000.folded --top 20
+
+  # Flame graph (https://github.com/brendangregg/FlameGraph), or open the file in speedscope
+  flamegraph.pl query_results/profile_20250101_120000.folded > profile.svg
+        """
+    )
+    parser.add_argument('--summarize', metavar='FILE', help='Collapsed stack file (.folded)')
+    parser.add_argument('--top', type=int, default=10, help='Number of hottest frames to show (default: 10)')
+    args = parser.parse_args()
+
+    if not args.summarize:
+        parser.print_help()
+        return 1
+    try:
+        stacks = load_collapsed(args.summarize)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print("=" * 80)
+    print(f"Profile: {args.summarize} ({sum(stacks.values()):,} samples, {len(stacks):,} distinct stacks)")
+    print("=" * 80)
+    print_summary(stacks, args.top)
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
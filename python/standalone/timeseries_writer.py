@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Time Series Writer - One buffered resource-usage file for all runner threads
+
+Worker threads push samples onto an unbounded queue and return at once; a
+single writer thread drains it and appends to one file in batches (every
+flush_interval seconds or batch_size samples, whichever comes first). This
+replaces one CSV per thread, which cost a file descriptor per thread
+(inflating the num_fds being recorded) and a flush per sample.
+
+Formats:
+    csv      One header plus one line per sample, thread_id as a column
+    parquet  One row group per batch (needs pyarrow)
+
+Usage:
+    writer = TimeSeriesWriter('resources.csv').start()
+    writer.put({'timestamp': ..., 'thread_id': 1, ...})
+    writer.close()
+
+    python timeseries_writer.py --summarize query_results/resources_20250101_120000.csv
+"""
+
+import sys
+import csv
+import time
+import queue
+import argparse
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+RESOURCE_FIELDS = [
+    'timestamp',
+    'thread_id',
+    'iteration',
+    'rss_mb',
+    'vms_mb',
+    'cpu_percent',
+    'num_threads',
+    'num_fds',
+    'execution_time_ms'
+]
+
+FORMATS = ['csv', 'parquet']
+
+_STOP = object()
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+class TimeSeriesWriter:
+    """
+    Batched single-file writer fed through a queue
+
+    Args:
+        path: Output file
+        fields: Column names; samples are dicts keyed by them
+        fmt: 'csv' or 'parquet'
+        flush_interval: Maximum seconds a sample waits in memory
+        batch_size: Write as soon as this many samples are waiting
+    """
+
+    def __init__(self, path: str, fields: Sequence[str] = RESOURCE_FIELDS, fmt: str = 'csv',
+                 flush_interval: float = 1.0, batch_size: int = 1000):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown time series format {fmt!r}")
+        if fmt == 'parquet' and pa is None:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow); use csv instead")
+        self.path = path
+        self.fields = list(fields)
+        self.fmt = fmt
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.samples = 0
+        self.writes = 0
+        self.error: Optional[BaseException] = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._csv = None
+        self._parquet = None
+
+    def start(self) -> 'TimeSeriesWriter':
+        if self.fmt == 'csv':
+            self._file = open(self.path, 'w', newline='', buffering=1 << 16)
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.fields)
+        self._thread = threading.Thread(target=self._run, name='TimeSeriesWriter', daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, sample: Dict[str, Any]):
+        """Queue one sample; never blocks the calling worker"""
+        self._queue.put(sample)
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            if item is not None and not stop:
+                batch.append(item)
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            if self.fmt == 'csv':
+                fields = self.fields
+                self._csv.writerows([sample.get(f) for f in fields] for sample in batch)
+                self._file.flush()
+            else:
+                table = pa.table({f: [sample.get(f) for sample in batch] for f in self.fields})
+                if self._parquet is None:
+                    self._parquet = pq.ParquetWriter(self.path, table.schema)
+                self._parquet.write_table(table)
+            self.samples += len(batch)
+            self.writes += 1
+        except Exception as e:      # keep draining so workers never block; reported on close
+            self.error = e
+
+    def close(self):
+        """Write what is queued and close the file"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+
+def read_samples(path: str) -> List[Dict[str, Any]]:
+    """Read a time series file back as a list of dicts"""
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise RuntimeError("Reading parquet needs pyarrow")
+        return pq.read_table(path).to_pylist()
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Summarize a resource time series written by the query runner',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Per-thread sample counts and the RSS/FD range
+  python timeseries_writer.py --summarize query_results/resources_20250101_120000.csv
+        """
+    )
+    parser.add_argument('--summarize', metavar='FILE', help='Time series file (.csv or .parquet)')
+    args = parser.parse_args()
+
+    if not args.summarize:
+        parser.print_help()
+        return 1
+    try:
+        samples = read_samples(args.summarize)
+    except (OSError, RuntimeError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    by_thread: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for sample in samples:
+        by_thread[str(sample['thread_id'])].append(sample)
+
+    print("=" * 80)
+    print(f"Time Series: {args.summarize} ({len(samples):,} samples, {len(by_thread)} threads)")
+    print("=" * 80)
+    print(f"{'Thread':>8} {'Samples':>8} {'Last iter':>10} {'RSS MB min':>11} {'RSS MB max':>11} "
+          f"{'FDs max':>8} {'Exec ms max':>12}")
+    print("-" * 80)
+    for thread_id in sorted(by_thread, key=lambda t: int(float(t))):
+        rows = by_thread[thread_id]
+        rss = [float(r['rss_mb']) for r in rows]
+        print(f"{thread_id:>8} {len(rows):>8} {rows[-1]['iteration']:>10} {min(rss):>11.2f} {max(rss):>11.2f} "
+              f"{max(int(float(r['num_fds'])) for r in rows):>8} "
+              f"{max(float(r['execution_time_ms']) for r in rows):>12.2f}")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
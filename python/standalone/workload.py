@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Workload - Weighted statement mixes for the query runners
+
+A workload file (JSON, or YAML when PyYAML is installed) lists named
+statements with a weight, parameter generators and an optional think
+time. Every iteration of a runner thread picks one statement at random in
+proportion to the weights, binds fresh parameters and runs it.
+
+    {
+      "statements": [
+        {"name": "point_lookup", "weight": 70,
+         "sql": "SELECT * FROM Users WHERE id = ?",
+         "params": [{"type": "int", "min": 1, "max": 100000}]},
+        {"name": "range_scan", "weight": 20, "think_time": [0.01, 0.05],
+         "sql": "SELECT TOP 100 * FROM Orders WHERE created > DATEADD(day, ?, GETDATE())",
+         "params": [{"type": "int", "min": -30, "max": -1}]},
+        {"name": "insert_order", "weight": 10, "think_time": 0.02,
+         "sql": "INSERT INTO Orders (user_id, note) VALUES (?, ?)",
+         "params": [{"type": "int", "min": 1, "max": 100000},
+                    {"type": "string", "prefix": "note_", "length": 12}]}
+      ]
+    }
+
+Parameter generators:
+    int       min, max (inclusive)
+    float     min, max
+    choice    values, optional weights
+    sequence  start, step - shared by all threads, so values are unique
+    string    length, optional prefix (random letters and digits)
+    uuid      random UUID string
+    anything that is not an object is passed as a constant
+
+Usage:
+    python workload.py workload.json                 # validate and describe
+    python workload.py workload.json --sample 20     # show 20 picks with parameters
+"""
+
+import sys
+import json
+import math
+import uuid
+import random
+import string
+import bisect
+import argparse
+import itertools
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+Generator = Callable[[random.Random], Any]
+
+_ALPHABET = string.ascii_letters + string.digits
+
+
+class WorkloadError(ValueError):
+    """Raised for an invalid workload file"""
+
+
+def _number(spec: Dict[str, Any], key: str, where: str, default=None):
+    value = spec.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise WorkloadError(f"{where}: '{key}' must be a number")
+    return value
+
+
+def make_generator(spec: Any, where: str = 'param') -> Generator:
+    """Build a parameter generator from its workload file spec"""
+    if not isinstance(spec, dict):
+        return lambda rng, value=spec: value
+
+    kind = spec.get('type')
+    if kind == 'int':
+        low, high = int(_number(spec, 'min', where)), int(_number(spec, 'max', where))
+        if low > high:
+            raise WorkloadError(f"{where}: min is larger than max")
+        return lambda rng: rng.randint(low, high)
+    if kind == 'float':
+        low, high = _number(spec, 'min', where), _number(spec, 'max', where)
+        return lambda rng: rng.uniform(low, high)
+    if kind == 'choice':
+        values = spec.get('values')
+        if not isinstance(values, list) or not values:
+            raise WorkloadError(f"{where}: 'values' must be a non-empty list")
+        weights = spec.get('weights')
+        if weights is None:
+            return lambda rng: rng.choice(values)
+        if not isinstance(weights, list) or len(weights) != len(values):
+            raise WorkloadError(f"{where}: 'weights' must match 'values'")
+        weights = [_number({f'weights[{j}]': w}, f'weights[{j}]', where) for j, w in enumerate(weights)]
+        if not all(0 <= w < math.inf for w in weights) or sum(weights) <= 0:
+            raise WorkloadError(f"{where}: 'weights' must be non-negative with a positive sum")
+        cumulative = list(itertools.accumulate(weights))
+        return lambda rng: rng.choices(values, cum_weights=cumulative)[0]
+    if kind == 'sequence':
+        counter = itertools.count(int(_number(spec, 'start', where, 1)), int(_number(spec, 'step', where, 1)))
+        return lambda rng: next(counter)        # itertools.count is atomic under the GIL
+    if kind == 'string':
+        length = int(_number(spec, 'length', where, 10))
+        prefix = str(spec.get('prefix', ''))
+        return lambda rng: prefix + ''.join(rng.choices(_ALPHABET, k=length))
+    if kind == 'uuid':
+        return lambda rng: str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    raise WorkloadError(f"{where}: unknown parameter type {kind!r}")
+
+
+def _think_time(value: Any, where: str) -> Tuple[float, float]:
+    if value is None:
+        return 0.0, 0.0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        low = high = float(value)
+    elif isinstance(value, list) and len(value) == 2 and all(isinstance(v, (int, float)) for v in value):
+        low, high = float(value[0]), float(value[1])
+    else:
+        raise WorkloadError(f"{where}: 'think_time' must be seconds or [min, max]")
+    if low < 0 or low > high:
+        raise WorkloadError(f"{where}: invalid think_time range")
+    return low, high
+
+
+class Statement:
+    """One named statement of a workload"""
+
+    def __init__(self, name: str, sql: str, weight: float = 1.0, params: Sequence[Generator] = (),
+                 think_time: Tuple[float, float] = (0.0, 0.0)):
+        self.name = name
+        self.sql = sql
+        self.weight = weight
+        self.params = list(params)
+        self.think_time = think_time
+
+    def bind(self, rng: random.Random) -> List[Any]:
+        """Fresh parameter values for one execution"""
+        return [generate(rng) for generate in self.params]
+
+    def think(self, rng: random.Random) -> float:
+        """Seconds to pause after this statement"""
+        low, high = self.think_time
+        return low if low == high else rng.uniform(low, high)
+
+
+class Workload:
+    """Weighted set of statements"""
+
+    def __init__(self, statements: Sequence[Statement], name: str = 'workload'):
+        if not statements:
+            raise WorkloadError("A workload needs at least one statement")
+        names = [s.name for s in statements]
+        if len(set(names)) != len(names):
+            raise WorkloadError("Statement names must be unique")
+        if any(s.weight <= 0 for s in statements):
+            raise WorkloadError("Statement weights must be positive")
+        self.name = name
+        self.statements = list(statements)
+        self._cumulative = list(itertools.accumulate(s.weight for s in self.statements))
+
+    @classmethod
+    def single(cls, sql: str) -> 'Workload':
+        """A workload of one statement, for a plain --query"""
+        return cls([Statement('query', sql)], name='single query')
+
+    def choose(self, rng: random.Random) -> Statement:
+        """Pick a statement in proportion to the weights"""
+        if len(self.statements) == 1:
+            return self.statements[0]
+        index = bisect.bisect_right(self._cumulative, rng.random() * self._cumulative[-1])
+        return self.statements[min(index, len(self.statements) - 1)]
+
+    def describe(self) -> List[str]:
+        total = self._cumulative[-1]
+        lines = []
+        for s in self.statements:
+            low, high = s.think_time
+            think = f"{low:g}s" if low == high else f"{low:g}-{high:g}s"
+            lines.append(f"{s.name:<24} {s.weight / total:>6.1%}  {len(s.params)} params  think {think}")
+        return lines
+
+
+def parse_workload(data: Any, name: str = 'workload') -> Workload:
+    """Build a Workload from an already parsed workload document"""
+    if not isinstance(data, dict) or not isinstance(data.get('statements'), list):
+        raise WorkloadError("A workload must be an object with a 'statements' list")
+    statements = []
+    for i, entry in enumerate(data['statements']):
+        where = f"statement {i + 1}"
+        if not isinstance(entry, dict) or not isinstance(entry.get('sql'), str):
+            raise WorkloadError(f"{where}: needs an 'sql' string")
+        stmt_name = str(entry.get('name', f"statement_{i + 1}"))
+        where = f"statement '{stmt_name}'"
+        params = entry.get('params', [])
+        if not isinstance(params, list):
+            raise WorkloadError(f"{where}: 'params' must be a list")
+        if entry['sql'].count('?') != len(params):
+            raise WorkloadError(f"{where}: {entry['sql'].count('?')} placeholders but {len(params)} params")
+        statements.append(Statement(
+            stmt_name, entry['sql'],
+            weight=_number(entry, 'weight', where, 1),
+            params=[make_generator(p, f"{where} param {j + 1}") for j, p in enumerate(params)],
+            think_time=_think_time(entry.get('think_time'), where),
+        ))
+    return Workload(statements, name=str(data.get('name', name)))
+
+
+def load_workload(path: str) -> Workload:
+    """Read a JSON or YAML workload file"""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise WorkloadError("YAML workload files need PyYAML (pip install pyyaml); use JSON instead")
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise WorkloadError(f"{path}: {e}")
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise WorkloadError(f"{path}: {e}")
+    return parse_workload(data, name=path)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Validate and preview a workload file for the query runners',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Check a workload file and show the statement mix
+  python workload.py mixed.json
+
+  # Show 20 random picks with their bound parameters
+  python workload.py mixed.yaml --sample 20 --seed 1
+        """
+    )
+    parser.add_argument('path', help='Workload file (.json, .yaml or .yml)')
+    parser.add_argument('--sample', type=int, default=0, help='Number of random picks to show')
+    parser.add_argument('--seed', type=int, help='Random seed for --sample')
+    args = parser.parse_args()
+
+    try:
+        workload = load_workload(args.path)
+    except (OSError, WorkloadError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print("=" * 80)
+    print(f"Workload: {workload.name} ({len(workload.statements)} statements)")
+    print("=" * 80)
+    for line in workload.describe():
+        print(f"  {line}")
+    if args.sample > 0:
+        rng = random.Random(args.seed)
+        print("-" * 80)
+        for _ in range(args.sample):
+            statement = workload.choose(rng)
+            print(f"  {statement.name:<24} {statement.bind(rng)}")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())